@@ -8,12 +8,12 @@ from .prompt import map_prompt, combine_prompt
 text_splitter = RecursiveCharacterTextSplitter(separators=["\n\n", "\n"], chunk_size=2000, chunk_overlap=400)
 
 
-def get_summary_chain(model_name: str = "gpt-3.5-turbo", chain_type="map_reduce", verbose: bool = True, **kwargs):
+def get_summary_chain(model_name: str = "gpt-3.5-turbo", chain_type="map_reduce", verbose: bool = False, **kwargs):
     llm = ChatOpenAI(
         model=model_name,
         temperature=0,
         openai_api_key=ai_settings.OPENAI_API_KEY,
-        verbose=True,
+        verbose=verbose,
     )
     return load_summarize_chain(
         llm=llm,
@@ -33,7 +33,7 @@ class AiCoaching(TimestampMixin, Base):
     ai_coaching_likes: Mapped["AiCoachingLike"] = relationship("AiCoachingLike", back_populates="ai_coaching")
 
     is_liked: Mapped[int] = query_expression()
-    like_cnt: Mapped[int] = query_expression()
+    like_cnt: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
 
 
 class AiCoachingLike(TimestampMixin, Base):
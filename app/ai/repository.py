@@ -2,7 +2,7 @@ from pydantic import UUID4
 from app.ai.models import AiCoaching, AiCoachingLike
 from app.models.community import Post
 from app.session import Transactional
-from sqlalchemy import delete, select, func, case, and_, update
+from sqlalchemy import delete, select, func, update
 from sqlalchemy.orm import with_expression
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.ecs_log import logger
@@ -14,7 +14,7 @@ async def create_ai_coaching(result: dict, session: AsyncSession):
 
     session.add(ai_coaching_obj)
     await session.commit()
-    logger.debug(f"ai coaching created: {ai_coaching_obj}")
+    logger.debug("ai coaching created for post %s", ai_coaching_obj.post_id)
 
 
 @Transactional()
@@ -24,76 +24,30 @@ async def get_all_ai_coaching(session: AsyncSession):
     return ai_coachings.scalars().all()
 
 
+def is_liked_expression(user_id: UUID4):
+    """1: liked, 0: disliked, -1: not rated by user_id"""
+    return func.coalesce(
+        select(AiCoachingLike.is_liked)
+        .where(AiCoachingLike.ai_coaching_id == AiCoaching.id, AiCoachingLike.user_id == user_id)
+        .scalar_subquery(),
+        -1,
+    )
+
+
 @Transactional()
 async def get_ai_coaching_where_post_id(post_id: int, user_id: UUID4 | None, session: AsyncSession):
-    stmt = (
-        select(AiCoaching)
-        .join_from(AiCoaching, AiCoachingLike, isouter=True, onclause=AiCoaching.id == AiCoachingLike.ai_coaching_id)
-        .options(
-            with_expression(
-                AiCoaching.like_cnt,
-                func.count(
-                    case(
-                        (AiCoachingLike.is_liked == 1, AiCoachingLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
-        .group_by(AiCoaching.id)
-        .order_by(AiCoaching.created_at.desc())
-        .where(AiCoaching.post_id == post_id)
-    )
+    stmt = select(AiCoaching).order_by(AiCoaching.created_at.desc()).where(AiCoaching.post_id == post_id)
     if user_id is not None:
-        stmt = stmt.options(
-            with_expression(
-                AiCoaching.is_liked,
-                func.max(
-                    case(
-                        (and_(AiCoachingLike.user_id == user_id, AiCoachingLike.is_liked == 1), 1),
-                        (and_(AiCoachingLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
+        stmt = stmt.options(with_expression(AiCoaching.is_liked, is_liked_expression(user_id)))
     ai_coaching = await session.execute(stmt)
     return ai_coaching.scalar_one_or_none()
 
 
 @Transactional()
 async def get_ai_coaching_where_id(id: int, user_id: UUID4 | None, session: AsyncSession):
-    stmt = (
-        select(AiCoaching)
-        .join_from(AiCoaching, AiCoachingLike, isouter=True, onclause=AiCoaching.id == AiCoachingLike.ai_coaching_id)
-        .options(
-            with_expression(
-                AiCoaching.like_cnt,
-                func.count(
-                    case(
-                        (AiCoachingLike.is_liked == 1, AiCoachingLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
-        .group_by(AiCoaching.id)
-        .order_by(AiCoaching.created_at.desc())
-        .where(AiCoaching.id == id)
-    )
+    stmt = select(AiCoaching).where(AiCoaching.id == id)
     if user_id is not None:
-        stmt = stmt.options(
-            with_expression(
-                AiCoaching.is_liked,
-                func.max(
-                    case(
-                        (and_(AiCoachingLike.user_id == user_id, AiCoachingLike.is_liked == 1), 1),
-                        (and_(AiCoachingLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
+        stmt = stmt.options(with_expression(AiCoaching.is_liked, is_liked_expression(user_id)))
     ai_coaching = await session.execute(stmt)
     return ai_coaching.scalar_one()
 
@@ -127,11 +81,14 @@ async def create_or_update_like(ai_coaching_id: int, user_id: int, like: int, se
         # FIXME: mypy
         ai_coaching_like = AiCoachingLike(ai_coaching_id=ai_coaching_id, user_id=user_id, is_liked=like)  # type: ignore
         session.add(ai_coaching_like)
+        delta = int(like == 1)
     else:
         if ai_coaching_like.is_liked == like:
             return ai_coaching_like
+        delta = int(like == 1) - int(ai_coaching_like.is_liked == 1)
         ai_coaching_like.is_liked = like
 
+    await add_like_cnt(ai_coaching_id, delta, session=session)
     await session.commit()
     await session.refresh(ai_coaching_like)
 
@@ -140,9 +97,25 @@ async def create_or_update_like(ai_coaching_id: int, user_id: int, like: int, se
 
 @Transactional()
 async def delete_like_where_ai_coaching_id_and_user_id(ai_coaching_id: int, user_id: int, session: AsyncSession):
-    stmt = delete(AiCoachingLike).where(
-        AiCoachingLike.ai_coaching_id == ai_coaching_id,
-        AiCoachingLike.user_id == user_id,
+    stmt = (
+        delete(AiCoachingLike)
+        .where(
+            AiCoachingLike.ai_coaching_id == ai_coaching_id,
+            AiCoachingLike.user_id == user_id,
+        )
+        .returning(AiCoachingLike.is_liked)
     )
-    await session.execute(stmt)
+    res = await session.execute(stmt)
+    if res.scalar_one_or_none() == 1:
+        await add_like_cnt(ai_coaching_id, -1, session=session)
     return
+
+
+async def add_like_cnt(ai_coaching_id: int, delta: int, session: AsyncSession):
+    """apply delta to the like counter in the caller's transaction"""
+    if delta:
+        await session.execute(
+            update(AiCoaching)
+            .where(AiCoaching.id == ai_coaching_id)
+            .values(like_cnt=AiCoaching.like_cnt + delta, updated_at=AiCoaching.updated_at)
+        )
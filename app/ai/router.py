@@ -4,6 +4,7 @@ from pydantic import UUID4
 from app.ai import service as ai_service
 from app.ai.schema import AiCoachingResponse
 from app.core.fastapi.dependencies.premission import AllowAll, IsAuthenticated, PermissionDependency
+from app.core.helpers.cache import Cache, CacheTag
 from app.utils.user import get_user_id_from_request
 
 router = APIRouter(
@@ -30,6 +31,11 @@ async def get_all_ai_coaching():
         Depends(PermissionDependency([AllowAll])),
     ],
 )
+@Cache.cached(
+    prefix="get_ai_coaching",
+    ttl=60 * 10,
+    depends_on=lambda arguments, response: [CacheTag.POST.of(arguments["post_id"])],
+)
 async def get_ai_coaching_where_id(
     post_id: int = Query(..., ge=1),
     user_id: Annotated[UUID4, None] = Depends(get_user_id_from_request),
@@ -11,6 +11,7 @@ from app.ai import repository as ai_coaching_repository
 from app.ai.utils import calc_cost, transform_func
 from app.ai.config import ai_settings
 from app.core.exceptions.base import BadRequestException
+from app.core.helpers.cache import Cache, CacheTag
 from app.utils.ecs_log import logger
 from app.services import fcm_service
 from langchain.callbacks import get_openai_callback
@@ -24,11 +25,10 @@ async def make_ai_coaching(user_input: str, user_id: UUID4, post_id: UUID4, mode
     summary_chain = get_summary_chain(
         model_name=model_name,
         chain_type="map_reduce",
-        verbose=True,
     )
 
     processed_text = transform_func({"text": user_input})
-    logger.debug(processed_text)
+    logger.debug("processed ai coaching input: %d chars", len(processed_text["transformed_text"]))
     # count token length with tiktoken tokenizer
 
     encoding = tiktoken.encoding_for_model(model_name)
@@ -40,10 +40,10 @@ async def make_ai_coaching(user_input: str, user_id: UUID4, post_id: UUID4, mode
         if token_length > 1024 * 4:
             with get_openai_callback() as cb:
                 docs = text_splitter.create_documents([processed_text["transformed_text"]])
-                logger.debug(f"docs: {docs}")
+                logger.debug("summarizing %d docs", len(docs))
                 text = await summary_chain.arun(docs)
 
-                logger.debug(repr(cb))
+                logger.debug("summary tokens: %d, cost: %s", cb.total_tokens, cb.total_cost)
                 result = {
                     "response": text,
                     "prompt_tokens": cb.prompt_tokens,
@@ -71,6 +71,7 @@ async def make_ai_coaching(user_input: str, user_id: UUID4, post_id: UUID4, mode
                     post_id,
                     parsed_response["summary"][:200],
                 )
+            await Cache.invalidate(CacheTag.POST.of(post_id))
             if parsed_response["answer"] is not None:
                 await fcm_service.send_message_to_single_device_by_uid(
                     user_id=user_id,
@@ -86,7 +87,7 @@ async def openai_chat_completion(user_input: str, model_name="gpt-3.5-turbo"):
     openai.api_key = ai_settings.OPENAI_API_KEY
     messages = get_gpt_messages(model_name=model_name, user_input=user_input)
     response = await openai.ChatCompletion.acreate(model=model_name, messages=messages, temperature=0.1)
-    logger.debug(response)
+    logger.debug("chat completion %s: %s", response.get("id"), response["usage"])
     prompt_tokens = response["usage"]["prompt_tokens"]
     completion_tokens = response["usage"]["completion_tokens"]
     cost = calc_cost(prompt_tokens, completion_tokens, model_name)
@@ -129,7 +130,9 @@ async def get_ai_coaching_where_id(ai_coaching_id: int, user_id: UUID4) -> dict:
 async def create_or_update_ai_coaching_like(ai_coaching_id: int, user_id: UUID4, like: int):
     try:
         await ai_coaching_repository.create_or_update_like(ai_coaching_id, user_id, like)
-        return await get_ai_coaching_where_id(ai_coaching_id, user_id)
+        ai_coaching = await get_ai_coaching_where_id(ai_coaching_id, user_id)
+        await Cache.invalidate(CacheTag.POST.of(ai_coaching["post_id"]))
+        return ai_coaching
     except IntegrityError as e:
         raise BadRequestException(str(e.orig)) from e
 
@@ -137,6 +140,8 @@ async def create_or_update_ai_coaching_like(ai_coaching_id: int, user_id: UUID4,
 async def delete_ai_coaching_like(ai_coaching_id: int, user_id: UUID4):
     try:
         await ai_coaching_repository.delete_like_where_ai_coaching_id_and_user_id(ai_coaching_id, user_id)
-        return await get_ai_coaching_where_id(ai_coaching_id, user_id)
+        ai_coaching = await get_ai_coaching_where_id(ai_coaching_id, user_id)
+        await Cache.invalidate(CacheTag.POST.of(ai_coaching["post_id"]))
+        return ai_coaching
     except NoResultFound as e:
         raise NotFoundException("Like not found") from e
@@ -35,5 +35,5 @@ transform_chain = TransformChain(
     output_variables=["transformed_text"],
     transform=transform_func,
     atransform=None,
-    verbose=True,
+    verbose=False,
 )
@@ -10,6 +10,7 @@ from app.api.routers.workout_promise import workout_promise_router
 from app.api.routers.notification import notification_router
 from app.api.routers.voc import voc_router
 from app.api.routers.version import version_router
+from app.api.routers.metrics import metrics_router
 from app.api.routers.community import router as community_router
 from app.ai.router import router as ai_router
 
@@ -69,6 +70,12 @@ api_router.include_router(
     tags=["version"],
 )
 
+api_router.include_router(
+    metrics_router,
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
 api_router.include_router(
     ai_router,
 )
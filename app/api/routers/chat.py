@@ -1,5 +1,3 @@
-from datetime import datetime, timezone
-
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy import insert, select, update
@@ -31,11 +29,12 @@ from app.services.chat_service import (
     get_user_mem_with_ids,
     make_chat_room_member,
 )
+from app.services.chat_read_receipt_service import read_receipts
 from app.services.workout_promise_service import get_workout_promise_by_id, get_workout_promise_with_participants
 from app.session import get_db_transactional_session
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.helpers.cache import Cache
+from app.core.helpers.cache import Cache, CacheTag, Vary
 
 chat_router = APIRouter()
 
@@ -49,15 +48,21 @@ chat_router = APIRouter()
     description="Get chat rooms from latest to oldest",
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
-@Cache.cached(ttl=60)
+@Cache.cached(
+    tag=CacheTag.GET_CHAT_ROOMS,
+    ttl=60 * 10,
+    local_ttl=30,
+    stale_ttl=60,
+    depends_on=lambda arguments, response: [CacheTag.CHAT_ROOM.of(room.id) for room in response["items"]],
+)
 async def get_public_chat_rooms(
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(None, description="offset"),
+    offset: int = Query(None, description="Offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    # TODO: count
-    t, r = await get_public_chat_room_list(session, limit, offset)
-    return {"total": t, "items": r}
+    t, r, next_cursor = await get_public_chat_room_list(session, limit, offset, cursor)
+    return {"total": t, "items": r, "next_cursor": next_cursor}
 
 
 # Private chat rooms (user's chat rooms)
@@ -68,18 +73,30 @@ async def get_public_chat_rooms(
     description="Get My chat rooms from latest to oldest",
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
+# last messages of other members show up within ttl, they are delivered live over the websocket
+@Cache.cached(
+    ttl=15,
+    local_ttl=5,
+    vary=[Vary.user],
+    depends_on=lambda arguments, response: [
+        CacheTag.CHAT_ROOM_MEMBER.of(arguments["request"].user.id),
+        CacheTag.USER.of(arguments["request"].user.id),
+        *(CacheTag.CHAT_ROOM.of(room.id) for room in response["items"]),
+    ],
+)
 async def get_my_chat_rooms(
     request: Request,
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(None, description="offset"),
+    offset: int = Query(None, description="Offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    t, c = await get_chat_room_list_by_user_id(session, request.user.id, limit, offset)
+    t, c, next_cursor = await get_chat_room_list_by_user_id(session, request.user.id, limit, offset, cursor)
 
     return {
         "total": t,
         "items": c,
-        "next_cursor": offset + len(c) if t and t > offset + len(c) else None,
+        "next_cursor": next_cursor,
     }
 
 
@@ -133,6 +150,11 @@ async def create_chat_room(
             session.add(workout_promise)
 
         await session.commit()
+        if not chat_room_obj.is_private:
+            await Cache.remove_by_tag(CacheTag.GET_CHAT_ROOMS)
+        if chat_room.workout_promise_id:
+            await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(chat_room.workout_promise_id))
+        await Cache.invalidate(*(CacheTag.CHAT_ROOM_MEMBER.of(uid) for uid in chat_room.members_user_ids))
 
         return await get_chat_room_and_members_by_id(chat_room_obj.id, session)
     except Exception as e:
@@ -172,21 +194,25 @@ async def get_chat_room_messages(
     req: Request,
     chat_room_id: UUID,
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="Offset"),
+    offset: int = Query(0, description="Offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
     session: AsyncSession = Depends(get_db_transactional_session),
 ):
     chat_room_member = await get_user_mem_with_ids(req.user.id, chat_room_id, session)
     if not chat_room_member:
         raise HTTPException(status_code=403, detail="User is not in the room")
 
-    t, res = await get_chat_messages(session, chat_room_id, chat_room_member.created_at, limit, offset)
+    t, res, next_cursor = await get_chat_messages(
+        session, chat_room_id, chat_room_member.created_at, limit, offset, cursor
+    )
 
-    chat_room_member.last_read_at = datetime.now(timezone.utc)
-    await session.commit()
+    # the first page starts with the latest message
+    latest_message_id = res[0].id if res and not cursor and not offset else None
+    await read_receipts.mark_read(chat_room_id, req.user.id, latest_message_id)
     return {
         "total": t,
         "items": res,
-        "next_cursor": offset + len(res) if t and t > offset + len(res) else None,
+        "next_cursor": next_cursor,
     }
 
 
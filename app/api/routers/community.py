@@ -26,10 +26,18 @@ from app.core.fastapi.dependencies.premission import (
     PermissionDependency,
 )
 from app.ai import service as ai_service
+from app.core.helpers.cache import Cache, CacheTag
 
 router = APIRouter(prefix="/communities", tags=["community"])
 
 
+def post_dependencies(posts: list[dict]) -> list[str]:
+    """posts of a response and their authors (username and profile picture are shown)"""
+    dependencies = [CacheTag.POST.of(p["id"]) for p in posts]
+    dependencies.extend(CacheTag.USER.of(p["user_id"]) for p in posts)
+    return dependencies
+
+
 @router.get(
     "",
     status_code=200,
@@ -66,6 +74,11 @@ async def post_community(
         Depends(PermissionDependency([AllowAll])),
     ],
 )
+@Cache.cached(
+    tag=CacheTag.GET_POSTS,
+    ttl=60 * 5,
+    depends_on=lambda arguments, response: post_dependencies(response["items"]),
+)
 async def get_posts_where_community_id(
     community_id: int | None = Query(None, description="community id"),
     pagination: dict = Depends(limit_offset_query),
@@ -120,6 +133,11 @@ async def post_post(
         Depends(PermissionDependency([AllowAll])),
     ],
 )
+@Cache.cached(
+    prefix="get_post",
+    ttl=60 * 10,
+    depends_on=lambda arguments, response: post_dependencies([response]),
+)
 async def get_post(post_id: int, user_id: UUID4 | None = Depends(get_user_id_from_request)):
     post = await community_service.get_post_with_like_cnt_where_id(post_id, user_id=user_id)
 
@@ -195,6 +213,14 @@ async def post_post_unlike(
     response_model=GetCommentsResponse,
     summary="Get comments with pagination",
 )
+@Cache.cached(
+    prefix="get_comments",
+    ttl=60 * 5,
+    depends_on=lambda arguments, response: [
+        CacheTag.POST.of(arguments["post_id"]),
+        *(CacheTag.USER.of(c.user_id) for c in response["items"]),
+    ],
+)
 async def get_comments(
     post_id: Annotated[int, Query(..., description="post id")],
     user_id: Annotated[UUID4 | None, Depends(get_user_id_from_request)],
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.core.fastapi.dependencies.premission import IsAdmin, PermissionDependency
+from app.core.helpers.cache import cache_metrics
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    "/cache",
+    summary="Get cache metrics",
+    description="Hits, misses, errors, latency and value size per cached function of the worker serving the request",
+    dependencies=[Depends(PermissionDependency([IsAdmin]))],
+)
+async def get_cache_metrics(reset: bool = Query(False, description="reset counters after reading them")):
+    snapshot = cache_metrics.snapshot()
+    if reset:
+        cache_metrics.reset()
+    return snapshot
@@ -30,18 +30,17 @@ async def get_notifications_workout(
     req: Request,
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="offset"),
+    offset: int = Query(0, description="offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    total, n_list = await get_notification_workout_list(
-        session, req.user.id, limit, offset
+    total, n_list, next_cursor = await get_notification_workout_list(
+        session, req.user.id, limit, offset, cursor
     )
 
     return {
         "total": total,
         "items": n_list,
-        "next_cursor": offset + len(n_list)
-        if total and total > offset + len(n_list)
-        else None,
+        "next_cursor": next_cursor,
     }
 
 
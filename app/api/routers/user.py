@@ -21,7 +21,7 @@ from app.core.fastapi.dependencies.premission import (
     IsAuthenticated,
     PermissionDependency,
 )
-from app.core.helpers.cache import Cache
+from app.core.helpers.cache import Cache, CacheTag, Vary
 
 from app.schemas import ExceptionResponseSchema
 from app.schemas.user import (
@@ -36,6 +36,7 @@ from app.schemas.user import (
     LoginRequest,
 )
 from app.services.aws_service import upload_image_to_s3
+from app.services.mate_recommendation_service import get_recommended_mates
 from app.session import get_db_transactional_session
 from app.services.user_service import (
     UserService,
@@ -45,7 +46,6 @@ from app.services.user_service import (
     delete_user_by_id,
     get_my_blocked_list,
     get_my_info_by_id,
-    get_random_user_with_limit,
     unblock_user_by_id,
     update_my_info_by_id,
     update_my_profile_pic_by_id,
@@ -67,10 +67,11 @@ user_router = APIRouter()
 )
 async def get_user_list(
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(None, description="offset(= skip)"),
+    offset: int = Query(None, description="offset(= skip, deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    t, res = await UserService().get_user_list(limit=limit, offset=offset)
-    return {"total": t, "users": res}
+    t, res, next_cursor = await UserService().get_user_list(limit=limit, offset=offset, cursor=cursor)
+    return {"total": t, "users": res, "next_cursor": next_cursor}
 
 
 @user_router.get(
@@ -289,7 +290,7 @@ async def get_recommended_users(
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(3, description="Limit"),
 ):
-    users = await get_random_user_with_limit(session, req.user.id, limit)
+    users = await get_recommended_mates(session, req.user.id, limit)
 
     return users
 
@@ -301,7 +302,12 @@ async def get_recommended_users(
     description="Get user info with token",
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
-@Cache.cached(ttl=60 * 60)
+@Cache.cached(
+    ttl=60 * 60 * 6,
+    local_ttl=30,
+    vary=[Vary.user],
+    depends_on=lambda arguments, user: [CacheTag.USER.of(arguments["user_id"])],
+)
 async def get_user_info(
     req: Request,
     user_id: UUID,
@@ -1,3 +1,4 @@
+from datetime import datetime
 from uuid import UUID
 from fastapi import APIRouter, Body, Depends, Request, Query
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -6,7 +7,7 @@ from app.core.fastapi.dependencies.premission import (
     IsAuthenticated,
     PermissionDependency,
 )
-from app.core.helpers.cache import Cache
+from app.core.helpers.cache import Cache, CacheTag
 from app.schemas.workout_promise import (
     PromiseLocationBase,
     WorkoutParticipantBase,
@@ -14,14 +15,18 @@ from app.schemas.workout_promise import (
     WorkoutParticipantUpdate,
     WorkoutPromiseBase,
     WorkoutPromiseListResponse,
+    WorkoutPromiseNearListResponse,
     WorkoutPromiseRead,
+    WorkoutPromiseStatus,
     WorkoutPromiseUpdate,
 )
 from app.services.workout_promise_service import (
+    WorkoutPromiseFilter,
     create_workout_participant,
     create_workout_promise,
     delete_workout_participant,
     delete_workout_promise_by_id,
+    find_workout_promises_near,
     get_recruiting_workout_promise_list,
     get_workout_promise_by_id,
     get_workout_promise_list,
@@ -35,24 +40,43 @@ from app.session import get_db_transactional_session
 workout_promise_router = APIRouter()
 
 
+def workout_promise_dependencies(wp) -> list[str]:
+    """entities rendered in WorkoutPromiseRead"""
+    dependencies = [CacheTag.WORKOUT_PROMISE.of(wp.id), CacheTag.USER.of(wp.admin_user_id)]
+    if wp.chat_room_id:
+        dependencies.append(CacheTag.CHAT_ROOM.of(wp.chat_room_id))
+    dependencies.extend(CacheTag.USER.of(p.user_id) for p in wp.participants)
+    return dependencies
+
+
+def workout_promise_list_dependencies(arguments, response) -> list[str]:
+    return [dependency for wp in response["items"] for dependency in workout_promise_dependencies(wp)]
+
+
 # 운동 약속 정보 조회 엔드포인트
 @workout_promise_router.get(
     "",
     response_model=WorkoutPromiseListResponse,
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
-@Cache.cached(prefix="workout-promise-list", ttl=60)
+@Cache.cached(
+    prefix="workout-promise-list",
+    tag=CacheTag.GET_WORKOUT_PROMISES,
+    ttl=60 * 10,
+    depends_on=workout_promise_list_dependencies,
+)
 async def get_workout_promises(
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="offset"),
+    offset: int = Query(0, description="offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    total, wp_list = await get_workout_promise_list(session, limit, offset)
+    total, wp_list, next_cursor = await get_workout_promise_list(session, limit, offset, cursor)
 
     return {
         "total": total,
         "items": wp_list,
-        "next_cursor": offset + len(wp_list) if total and total > offset + len(wp_list) else None,
+        "next_cursor": next_cursor,
     }
 
 
@@ -62,17 +86,23 @@ async def get_workout_promises(
     response_model=WorkoutPromiseListResponse,
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
-@Cache.cached(prefix="workout-promise-recruiting-list", ttl=60)
+@Cache.cached(
+    prefix="workout-promise-recruiting-list",
+    tag=CacheTag.GET_WORKOUT_PROMISES,
+    ttl=60 * 10,
+    depends_on=workout_promise_list_dependencies,
+)
 async def get_recruiting_workout_promises(
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="offset"),
+    offset: int = Query(0, description="offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    total, wp_list = await get_recruiting_workout_promise_list(session, limit, offset)
+    total, wp_list, next_cursor = await get_recruiting_workout_promise_list(session, limit, offset, cursor)
     return {
         "total": total,
         "items": wp_list,
-        "next_cursor": offset + len(wp_list) if total and total > offset + len(wp_list) else None,
+        "next_cursor": next_cursor,
     }
 
 
@@ -85,19 +115,21 @@ async def get_workout_promises_written_by_me(
     req: Request,
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="offset"),
+    offset: int = Query(0, description="offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    total, wp_list = await get_workout_promise_list_written_by_me(
+    total, wp_list, next_cursor = await get_workout_promise_list_written_by_me(
         session,
         req.user.id,
         limit,
         offset,
+        cursor,
     )
 
     return {
         "total": total,
         "items": wp_list,
-        "next_cursor": offset + len(wp_list) if total and total > offset + len(wp_list) else None,
+        "next_cursor": next_cursor,
     }
 
 
@@ -110,28 +142,57 @@ async def get_workout_promises_joined_by_me(
     req: Request,
     session: AsyncSession = Depends(get_db_transactional_session),
     limit: int = Query(10, description="Limit"),
-    offset: int = Query(0, description="offset"),
+    offset: int = Query(0, description="offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
 ):
-    total, wp_list = await get_workout_promise_list_joined_by_me(
+    total, wp_list, next_cursor = await get_workout_promise_list_joined_by_me(
         session,
         req.user.id,
         limit,
         offset,
+        cursor,
     )
 
     return {
         "total": total,
         "items": wp_list,
-        "next_cursor": offset + len(wp_list) if total and total > offset + len(wp_list) else None,
+        "next_cursor": next_cursor,
     }
 
 
+# 내 주변 운동 약속 조회
+@workout_promise_router.get(
+    "/near",
+    response_model=WorkoutPromiseNearListResponse,
+    dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
+)
+async def get_workout_promises_near(
+    session: AsyncSession = Depends(get_db_transactional_session),
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius: float = Query(3000, gt=0, le=50000, description="Radius in meters"),
+    status: WorkoutPromiseStatus | None = Query(None),
+    promise_time_from: datetime | None = Query(None),
+    promise_time_to: datetime | None = Query(None),
+    limit: int = Query(10, ge=1, le=100, description="Nearest k"),
+):
+    promise_filter = WorkoutPromiseFilter(
+        status=status, promise_time_from=promise_time_from, promise_time_to=promise_time_to
+    )
+    wp_list = await find_workout_promises_near(session, promise_filter, latitude, longitude, radius, limit)
+    return {"items": wp_list}
+
+
 @workout_promise_router.get(
     "/{workout_promise_id}",
     response_model=WorkoutPromiseRead,
     dependencies=[Depends(PermissionDependency([IsAuthenticated]))],
 )
-@Cache.cached(prefix="workout-promise-detail", ttl=60)
+@Cache.cached(
+    prefix="workout-promise-detail",
+    ttl=60 * 10,
+    depends_on=lambda arguments, wp: workout_promise_dependencies(wp),
+)
 async def get_workout_promise(
     workout_promise_id: UUID,
     session: AsyncSession = Depends(get_db_transactional_session),
@@ -157,9 +218,6 @@ async def make_new_workout_promise(
     else:
         raise UnauthorizedException("You are not authenticated user")
 
-    await Cache.remove_by_prefix("workout-promise-detail")
-    await Cache.remove_by_prefix("workout-promise-list")
-    await Cache.remove_by_prefix("workout-promise-recruiting-list")
     return db_workout_promise
 
 
@@ -176,7 +234,6 @@ async def join_workout_promise(
     db: AsyncSession = Depends(get_db_transactional_session),
 ):
     db_w_pp = await create_workout_participant(db, workout_promise_id, req_body, req.user.id)
-    await Cache.remove_by_prefix("workout-promise-detail")
 
     return db_w_pp
 
@@ -191,8 +248,6 @@ async def delete_workout_promise(
     db: AsyncSession = Depends(get_db_transactional_session),
 ):
     msg = await delete_workout_promise_by_id(db, workout_promise_id)
-    await Cache.remove_by_prefix("workout-promise-list")
-    await Cache.remove_by_prefix("workout-promise-recruiting-list")
     return msg
 
 
@@ -204,9 +259,6 @@ async def leave_workout_promise(
     db: AsyncSession = Depends(get_db_transactional_session),
 ):
     msg = await delete_workout_participant(db, workout_promise_id, user_id)
-    await Cache.remove_by_prefix("workout-promise-detail")
-    await Cache.remove_by_prefix("workout-promise-list")
-    await Cache.remove_by_prefix("workout-promise-recruiting-list")
     return msg
 
 
@@ -223,9 +275,6 @@ async def update_workout_promise(
     db: AsyncSession = Depends(get_db_transactional_session),
 ):
     updated_w_p = await update_workout_promise_by_id(db, workout_promise_id, workout_promise, promise_location)
-    await Cache.remove_by_prefix("workout-promise-detail")
-    await Cache.remove_by_prefix("workout-promise-list")
-    await Cache.remove_by_prefix("workout-promise-recruiting-list")
     return updated_w_p
 
 
@@ -243,8 +292,5 @@ async def update_workout_participant(
     db: AsyncSession = Depends(get_db_transactional_session),
 ):
     updated_w_pp = await update_workout_participant_by_admin(db, req.user.id, workout_promise_id, user_id, update_req)
-    await Cache.remove_by_prefix("workout-promise-detail")
-    await Cache.remove_by_prefix("workout-promise-list")
-    await Cache.remove_by_prefix("workout-promise-recruiting-list")
 
     return updated_w_pp
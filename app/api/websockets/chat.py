@@ -1,18 +1,17 @@
-from datetime import datetime, timezone
 from uuid import UUID
 from fastapi import (
     APIRouter,
-    Depends,
     WebSocket,
     WebSocketDisconnect,
 )
 from app.core.exceptions.chat import UserNotInChatRoom
 from app.core.exceptions.websocket import WSUserNotInChatRoom
+from app.models.chat import ChatRoomMember
 from app.utils.ecs_log import logger
 
-from app.session import get_db_transactional_session
+from app.session import transactional_session_factory
+from app.services.chat_read_receipt_service import read_receipts
 from app.services.chat_service import ChatService, get_user_mem_with_ids
-from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.conn import conn_manager
 
 chat_ws_router = APIRouter(
@@ -24,6 +23,8 @@ chat_ws_router = APIRouter(
 # TODO: How to check user auth in websocket?
 # 일단은 헤더에 정보를 담을 수 없고, 쿼리 파라미터에 정보를 담을 수 없음.. FastAPI 자체 오류로 추정. 2023.03.15 해결 실패
 # 1. JWT token for websocket(small size)
+# NOTE: no session dependency here. A dependency session would stay checked out for the whole
+# lifetime of the socket, so db access uses short-lived sessions around each query instead.
 @chat_ws_router.websocket(
     "/{chat_room_id}/{user_id}",
 )
@@ -31,15 +32,16 @@ async def chat_websocket_endpoint(
     websocket: WebSocket,
     chat_room_id: UUID,
     user_id: UUID,
-    session: AsyncSession = Depends(get_db_transactional_session),
 ):
+    str_chat_room_id = chat_room_id.__str__()
+    str_user_id = user_id.__str__()
+    chat_room_member: ChatRoomMember | None = None
     try:
-        chat_room_member = await get_user_mem_with_ids(user_id, chat_room_id, session)
-        str_chat_room_id = chat_room_id.__str__()
-        str_user_id = user_id.__str__()
+        async with transactional_session_factory() as session:
+            chat_room_member = await get_user_mem_with_ids(user_id, chat_room_id, session)
 
         await conn_manager.connect(str_chat_room_id + str_user_id, websocket)
-        chat_service = ChatService(websocket, chat_room_id, user_id, session=session)
+        chat_service = ChatService(websocket, chat_room_id, user_id)
         await chat_service.run()
     except UserNotInChatRoom as e:
         raise WSUserNotInChatRoom
@@ -49,5 +51,5 @@ async def chat_websocket_endpoint(
         logger.debug(e)
     finally:
         await conn_manager.disconnect(str_chat_room_id + str_user_id)
-        chat_room_member.last_read_at = datetime.now(timezone.utc)
-        del chat_service
+        if chat_room_member is not None:
+            await read_receipts.mark_read(chat_room_id, user_id)
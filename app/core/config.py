@@ -60,6 +60,18 @@ class Settings(BaseSettings):
 
     DISCORD_WEBHOOK_URL: str
 
+    # LOGGING
+    LOG_LEVEL: str = "DEBUG" if environ.get("ENV", "LOCAL") in ["DEV", "LOCAL"] else "INFO"
+    # "json" (ECS) or "text"
+    LOG_FORMAT: str = "json"
+    # logger name -> level, e.g. {"wegogym.api.cache": "DEBUG"}
+    LOG_LEVELS: dict[str, str] = {}
+    # logger name -> share of its DEBUG records that are written
+    LOG_SAMPLE_RATES: dict[str, float] = {"wegogym.api.cache": 0.01}
+    # "off", "slow" (statements slower than SQL_SLOW_QUERY_MS) or "all"
+    SQL_LOG: str = "slow"
+    SQL_SLOW_QUERY_MS: int = 200
+
     # VALIDATORS
     @field_validator("BACKEND_CORS_ORIGINS")
     @classmethod
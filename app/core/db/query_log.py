@@ -0,0 +1,38 @@
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.utils.ecs_log import get_logger
+
+sql_logger = get_logger("sql")
+# long statements (batched inserts, large IN lists) are cut, parameters are never logged
+MAX_STATEMENT_LENGTH = 2000
+
+
+def install_query_log(engine: AsyncEngine, mode: str, slow_ms: int) -> None:
+    """
+    log statements through the app logger instead of `echo`: "all" logs every statement at INFO
+    and the slow ones at WARNING, "slow" only the slow ones, "off" nothing
+    """
+    if mode not in ("all", "slow"):
+        return
+    slow = slow_ms / 1000
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("query_start", time.perf_counter())
+        if elapsed < slow and mode == "slow":
+            return
+        sql_logger.log(
+            logging.WARNING if elapsed >= slow else logging.INFO,
+            "%.1f ms: %s",
+            elapsed * 1000,
+            statement[:MAX_STATEMENT_LENGTH],
+            extra={"event.duration": int(elapsed * 1e9)},
+        )
@@ -14,6 +14,7 @@ __all__ = [
     "UnauthorizedException",
     "DecodeTokenException",
     "ExpiredTokenException",
+    "RevokedTokenException",
     "PasswordDoesNotMatchException",
     "DuplicateEmailOrNicknameException",
     "UserNotFoundException",
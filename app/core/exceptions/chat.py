@@ -19,6 +19,12 @@ class ChatMemberNotFound(CustomException):
     message = "chat member not found"
 
 
+class InvalidChatMessage(CustomException):
+    code = 400
+    error_code = "CHAT__INVALID_MESSAGE"
+    message = "chat message text must be a string of at most 300 characters"
+
+
 class NoDirectChatRoom(CustomException):
     code = 404
     error_code = "NO_DIRECT_CHAT_ROOM"
@@ -11,3 +11,9 @@ class ExpiredTokenException(CustomException):
     code = 400
     error_code = "TOKEN__EXPIRE_TOKEN"
     message = "expired token"
+
+
+class RevokedTokenException(CustomException):
+    code = 401
+    error_code = "TOKEN__REVOKED_TOKEN"
+    message = "revoked token"
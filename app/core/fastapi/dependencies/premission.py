@@ -4,7 +4,7 @@ from fastapi import Request
 from fastapi.openapi.models import APIKey, APIKeyIn
 from fastapi.security.base import SecurityBase
 
-from app.services.user_service import UserService
+from app.services.role_service import ADMIN_ROLE, role_registry
 from app.core.exceptions import CustomException, UnauthorizedException
 
 
@@ -28,10 +28,13 @@ class IsAdmin(BasePermission):
 
     async def has_permission(self, request: Request) -> bool:
         user_id = request.user.id
-        is_superuser = await UserService().is_superuser(user_id=user_id)
+        if user_id is None:
+            return False
+        # the claim of the token, unless the registry has revoked it since
+        is_superuser = await role_registry.has_role(user_id, request.user.roles, ADMIN_ROLE)
 
         request.user.is_superuser = is_superuser
-        return user_id is not None and is_superuser
+        return is_superuser
 
 
 class AllowAll(BasePermission):
@@ -8,8 +8,8 @@ from starlette.middleware.authentication import (
 from starlette.requests import HTTPConnection
 
 from app.core.exceptions import ExpiredTokenException
-from app.core.exceptions.token import DecodeTokenException
-from app.utils.token_helper import TokenHelper
+from app.core.exceptions.token import DecodeTokenException, RevokedTokenException
+from app.core.helpers.token_cache import token_cache
 from ..schemas import CurrentUser
 
 
@@ -31,9 +31,8 @@ class AuthBackend(AuthenticationBackend):
             return False, current_user
 
         try:
-            payload = TokenHelper.decode(
-                credentials,
-            )
+            # verified once per token, later requests only check the revocations
+            payload = token_cache.verify(credentials)
             user_id: UUID | None = payload.get("user_id")
 
         except jwt.exceptions.PyJWTError:
@@ -42,9 +41,12 @@ class AuthBackend(AuthenticationBackend):
             return False, current_user
         except DecodeTokenException:
             return False, current_user
+        except RevokedTokenException:
+            return False, current_user
         if not user_id:
             return False, current_user
         current_user.id = user_id
+        current_user.roles = payload.get("roles", [])
         return True, current_user
 
 
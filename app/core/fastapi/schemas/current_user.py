@@ -5,6 +5,7 @@ from pydantic import BaseModel, ConfigDict, Field
 class CurrentUser(BaseModel):
     id: UUID | None = Field(None, description="ID")
     is_superuser: bool = Field(False, description="Is Superuser")
+    roles: list[str] = Field([], description="Role claims of the token")
 
     model_config = ConfigDict(
         validate_assignment=True,
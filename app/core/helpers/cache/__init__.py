@@ -1,11 +1,21 @@
 from .cache_manager import Cache
 from .cache_tag import CacheTag
+from .circuit_breaker import CircuitBreaker
+from .codec import MsgpackCodec
 from .custom_key_maker import CustomKeyMaker
+from .local_cache import LocalCache
+from .metrics import cache_metrics
 from .redis_backend import RedisBackend
+from .vary import Vary
 
 __all__ = [
     "Cache",
     "RedisBackend",
     "CustomKeyMaker",
     "CacheTag",
+    "LocalCache",
+    "MsgpackCodec",
+    "Vary",
+    "cache_metrics",
+    "CircuitBreaker",
 ]
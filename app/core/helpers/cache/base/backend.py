@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterable
 
 
 class BaseBackend(ABC):
@@ -14,3 +14,34 @@ class BaseBackend(ABC):
     @abstractmethod
     async def delete_startswith(self, value: str) -> None:
         ...
+
+    @abstractmethod
+    async def add_dependencies(self, key: str, dependencies: Iterable[str], ttl: int = 60) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidation_version(self) -> int:
+        """version of the last invalidation"""
+        ...
+
+    @abstractmethod
+    async def invalidated_since(self, dependencies: Iterable[str], version: int) -> bool:
+        """whether one of `dependencies` was invalidated after `version`"""
+        ...
+
+    @abstractmethod
+    async def delete_dependents(self, dependencies: Iterable[str]) -> list[str]:
+        """delete keys depending on one of `dependencies` and return them"""
+        ...
+
+    @abstractmethod
+    async def acquire_lock(self, key: str, ttl_ms: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def release_lock(self, key: str) -> None:
+        ...
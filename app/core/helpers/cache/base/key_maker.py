@@ -1,17 +1,31 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Type
+from typing import Any, Callable, Sequence, Type
 
 ArgType = Type[object]
+KeyFunction = Callable[..., str]
 
 
 class BaseKeyMaker(ABC):
     @abstractmethod
+    def compile(
+        self,
+        prefix: str | None,
+        ignore_arg_types: Sequence[ArgType],
+        function: Callable,
+        vary: Sequence[Callable[[Any], Any]] = (),
+    ) -> KeyFunction:
+        """
+        return a function building the cache key from the arguments of a call to `function`
+        and the values of `vary` for the request argument of that call
+        """
+        ...
+
     async def make(
         self,
         prefix: str | None,
-        ignore_arg_types: list[ArgType],
+        ignore_arg_types: Sequence[ArgType],
         function: Callable,
         *args,
         **kwargs
     ) -> str:
-        ...
+        return self.compile(prefix, ignore_arg_types, function)(*args, **kwargs)
@@ -1,62 +1,328 @@
+import asyncio
+import inspect
+import time
+import uuid
 from functools import wraps
-from typing import Any
+from typing import Any, Callable, Iterable, Mapping, Sequence
 
-from app.core.helpers.cache.custom_key_maker import CustomKeyMaker
+import ujson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.helpers.cache.base import BaseKeyMaker
+from app.core.helpers.cache.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.core.helpers.cache.local_cache import LocalCache
+from app.core.helpers.cache.metrics import cache_metrics, elapsed_ms
 
 from app.core.helpers.cache.redis_backend import RedisBackend
+from app.core.helpers.pubsub import chat_hub
+from app.session import transactional_session_factory
 
 from .cache_tag import CacheTag
-from app.utils.ecs_log import logger
+from .vary import VaryFunction
+from app.utils.ecs_log import get_logger
+
+logger = get_logger("cache")
+
+# (arguments of the cached call, response) -> dependencies of the cached response
+DependsOn = Callable[[Mapping[str, Any], Any], Iterable[str]]
+
+# keeps the local tier of every worker coherent with invalidations
+INVALIDATION_CHANNEL = "cache-invalidation"
+LISTENER_RETRY_INTERVAL = 5
+
+# cross-worker single-flight of cache misses
+LOCK_TTL_MS = 5000
+LOCK_WAIT_MS = 2000
+LOCK_POLL_MS = 50
+
+# invalidations may delete many keys
+BULK_OP_TIMEOUT = 2
 
 
 class CacheManager:
     def __init__(self):
         self.backend = None
         self.key_maker = None
+        self.local: LocalCache | None = None
+        self.origin = str(uuid.uuid4())
+        self.listener_task: asyncio.Task | None = None
+        # key -> computation in progress
+        self.inflight: dict[str, asyncio.Task] = {}
+        self.background_tasks: set[asyncio.Task] = set()
+        # stale keys a background refresh was started for, set before the refresh reaches `inflight`
+        self.revalidating: set[str] = set()
+        self.breaker = CircuitBreaker()
 
-    def init(self, backend: RedisBackend, key_maker: CustomKeyMaker) -> None:
+    def init(
+        self,
+        backend: RedisBackend,
+        key_maker: BaseKeyMaker,
+        local: LocalCache | None = None,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
         self.backend = backend
         self.key_maker = key_maker
+        self.local = local
+        if breaker is not None:
+            self.breaker = breaker
 
     def cached(
         self,
         prefix: str | None = None,
         tag: CacheTag | None = None,
         ttl: int = 60,
+        depends_on: DependsOn | None = None,
+        local_ttl: int | None = None,
+        stale_ttl: int | None = None,
+        vary: Sequence[VaryFunction] = (),
     ):
+        """
+        cache the response of an async function
+        `tag` and `depends_on` register the entities (CacheTag.of) the response was built from,
+        so `invalidate` drops exactly the keys affected by a write
+        `local_ttl` also keeps the response in the in-process tier for hot endpoints
+        `vary` adds attributes of the request argument (Vary.user, Vary.header) to the key,
+        for responses that depend on who is asking
+        `stale_ttl` keeps serving the response that long after `ttl` while one request refreshes it
+        concurrent misses of a key run the function once per process, and once across workers
+        as long as the first one finishes within LOCK_TTL_MS
+        backend calls go through a circuit breaker: when the backend is slow or down, responses come
+        from the local tier or the function itself instead of failing the request
+        """
+
         def _cached(function):
-            @wraps(function)
-            async def __cached(*args, **kwargs):
-                if not self.backend or not self.key_maker:
-                    raise Exception("backend or key_maker is None")
-                pf = prefix if prefix else tag.value if tag else None
-                ignore_arg_types = []
-                key = await self.key_maker.make(
-                    pf,
-                    ignore_arg_types,
-                    function,
-                    *args,
-                    **kwargs,
-                )
+            sig = inspect.signature(function)
+            l1_ttl = min(local_ttl, ttl) if local_ttl else None
+            store_ttl = ttl + (stale_ttl or 0)
+            has_dependencies = tag is not None or depends_on is not None
+            session_args = [name for name, param in sig.parameters.items() if param.annotation is AsyncSession]
+            # compiled on the first call, the key maker is only set by init()
+            make_key = None
 
-                cached_response = await self.backend.get(key=key)
+            async def load(key: str, local: LocalCache | None, count: bool = True) -> Any:
+                metrics = cache_metrics[key]
+                if local is not None:
+                    data = local.get(key)
+                    if data is not None:
+                        if count:
+                            metrics.local_hits += 1
+                        return self.backend.decode(key, data)
+                data = await self.call_backend(key, self.backend.get_encoded, key)
+                cached_response = self.backend.decode(key, data)
                 if cached_response:
-                    logger.debug(f"cache hit with redis_key: {key}")
-                    return cached_response
+                    if count:
+                        metrics.hits += 1
+                    if local is not None:
+                        self.set_local(local, key, data, l1_ttl)
+                return cached_response
+
+            async def compute(key: str, local: LocalCache | None, args: tuple, kwargs: dict) -> Any:
+                # None: unknown, the response is then not stored in redis when it has dependencies
+                version = await self.call_backend(key, self.backend.invalidation_version) if has_dependencies else 0
+                start = time.perf_counter()
                 response = await function(*args, **kwargs)
-                logger.debug(f"cache miss with redis_key: {key}")
-                await self.backend.set(response=response, key=key, ttl=ttl)
+                cache_metrics[key].origin_latency_ms.observe(elapsed_ms(start))
+                logger.debug("cache miss with redis_key: %s", key)
+                value = {"fresh_until": time.time() + ttl, "value": response} if stale_ttl else response
+                # both tiers keep the encoded value: hits decode the same data, never live objects of a session
+                try:
+                    data = self.backend.encode(key, value)
+                except Exception as e:
+                    cache_metrics[key].errors += 1
+                    logger.warning(f"Cache encoding failed for {key}, the response is not cached: {e!r}")
+                    return response
+                if local is not None:
+                    # also what keeps hot keys served while the backend is unavailable
+                    self.set_local(local, key, data, l1_ttl)
+
+                dependencies = {tag.of()} if tag else set()
+                if depends_on:
+                    bound = sig.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    dependencies.update(depends_on(bound.arguments, response))
+                if dependencies:
+                    if version is None:
+                        return response
+                    # registered before the value is stored, so an invalidation from now on deletes the key
+                    registered = await self.call_backend(
+                        key, self.backend.add_dependencies, key, dependencies, store_ttl, default=False
+                    )
+                    if registered is False:
+                        return response
+                stored = await self.call_backend(
+                    key, self.backend.set_encoded, data=data, key=key, ttl=store_ttl, default=False
+                )
+                # an invalidation since the computation started missed the key, the response may predate its write
+                if stored is not False and dependencies:
+                    invalidated = await self.call_backend(
+                        key, self.backend.invalidated_since, dependencies, version, default=True
+                    )
+                    if invalidated:
+                        await self.call_backend(key, self.backend.delete, key)
+                        if local is not None:
+                            local.delete([key])
                 return response
 
+            async def compute_once(key: str, local: LocalCache | None, args: tuple, kwargs: dict) -> Any:
+                """
+                single-flight: one computation per key in this process, guarded by a lock across workers
+                it runs in its own task so waiters are not affected when the first caller is cancelled
+                """
+                task = self.inflight.get(key)
+                if task is None:
+                    task = asyncio.create_task(compute_with_lock(key, local, args, kwargs))
+                    self.inflight[key] = task
+                    task.add_done_callback(lambda t: self.forget_inflight(key, t))
+                return await asyncio.shield(task)
+
+            async def compute_with_lock(key: str, local: LocalCache | None, args: tuple, kwargs: dict) -> Any:
+                # None: the backend is unavailable, compute without the lock
+                locked = await self.call_backend(key, self.backend.acquire_lock, key, LOCK_TTL_MS)
+                if locked is None:
+                    return await compute(key, local, args, kwargs)
+                if locked:
+                    try:
+                        return await compute(key, local, args, kwargs)
+                    finally:
+                        await self.call_backend(key, self.backend.release_lock, key)
+                # another worker is computing it: wait for its result, then give up and compute
+                deadline = time.monotonic() + LOCK_WAIT_MS / 1000
+                while time.monotonic() < deadline and self.breaker.state == "closed":
+                    await asyncio.sleep(LOCK_POLL_MS / 1000)
+                    cached_response = await load(key, local, count=False)
+                    if cached_response:
+                        return cached_response["value"] if stale_ttl else cached_response
+                return await compute(key, local, args, kwargs)
+
+            async def revalidate(key: str, local: LocalCache | None, args: tuple, kwargs: dict) -> None:
+                """refresh a stale key after the response was sent, with sessions of its own"""
+                try:
+                    async with transactional_session_factory() as session:
+                        kwargs = {**kwargs, **{name: session for name in session_args if name in kwargs}}
+                        await compute_once(key, local, args, kwargs)
+                except Exception as e:
+                    logger.warning(f"Cache revalidation failed for {key}: {e}")
+                finally:
+                    self.revalidating.discard(key)
+
+            @wraps(function)
+            async def __cached(*args, **kwargs):
+                nonlocal make_key
+                if make_key is None:
+                    if not self.backend or not self.key_maker:
+                        raise Exception("backend or key_maker is None")
+                    pf = prefix if prefix else tag.value if tag else None
+                    make_key = self.key_maker.compile(pf, (), function, vary)
+                key = make_key(*args, **kwargs)
+
+                local = self.local if l1_ttl else None
+                if local is not None:
+                    self.start_listener()
+                cached_response = await load(key, local)
+                if cached_response:
+                    logger.debug("cache hit with redis_key: %s", key)
+                    if not stale_ttl:
+                        return cached_response
+                    if cached_response["fresh_until"] < time.time():
+                        cache_metrics[key].stale_hits += 1
+                        if key not in self.inflight and key not in self.revalidating:
+                            self.revalidating.add(key)
+                            task = asyncio.create_task(revalidate(key, local, args, kwargs))
+                            self.background_tasks.add(task)
+                            task.add_done_callback(self.background_tasks.discard)
+                    return cached_response["value"]
+                cache_metrics[key].misses += 1
+                return await compute_once(key, local, args, kwargs)
+
             return __cached
 
         return _cached
 
+    def forget_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            # retrieved here so an error nobody waited for is not reported as unhandled
+            task.exception()
+
+    async def call_backend(self, key: str, function: Callable, /, *args, default: Any = None, **kwargs) -> Any:
+        """
+        call the backend through the circuit breaker, return `default` when it fails or the circuit is open
+        requests are then served by the local tier or the origin function
+        """
+        try:
+            return await self.breaker.call(function, *args, **kwargs)
+        except CircuitOpen:
+            cache_metrics[key].bypasses += 1
+        except Exception as e:
+            cache_metrics[key].errors += 1
+            logger.warning(f"Cache backend {function.__name__} failed for {key}: {e!r}")
+        return default
+
+    @staticmethod
+    def set_local(local: LocalCache, key: str, data: bytes, ttl: int) -> None:
+        local.set(key, data, ttl, size=len(data))
+
+    async def invalidate(self, *dependencies: str) -> None:
+        """drop every cached response that depends on one of `dependencies`"""
+        if not dependencies or not self.backend:
+            return
+        try:
+            keys = await self.breaker.call(self.backend.delete_dependents, dependencies, timeout=BULK_OP_TIMEOUT)
+        except Exception as e:
+            # the write already committed, stale entries still expire with their ttl
+            logger.warning(f"Cache invalidation failed for {dependencies}: {e}")
+            return
+        if self.local is not None and keys:
+            self.local.delete(keys)
+            await self.publish({"keys": keys})
+
     async def remove_by_tag(self, tag: CacheTag) -> None:
-        await self.backend.delete_startswith(value=tag.value)
+        await self.invalidate(tag.of())
 
     async def remove_by_prefix(self, prefix: str) -> None:
-        await self.backend.delete_startswith(value=prefix)
+        try:
+            await self.breaker.call(self.backend.delete_startswith, value=prefix, timeout=BULK_OP_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for prefix {prefix}: {e!r}")
+        if self.local is not None:
+            self.local.delete_startswith(prefix)
+            await self.publish({"prefix": prefix})
+
+    async def publish(self, message: dict) -> None:
+        try:
+            await chat_hub.publish(INVALIDATION_CHANNEL, ujson.dumps({**message, "origin": self.origin}))
+        except Exception as e:
+            logger.warning(f"Cache invalidation broadcast failed: {e}")
+
+    def start_listener(self) -> None:
+        if self.listener_task is None or self.listener_task.done():
+            self.listener_task = asyncio.create_task(self.listen())
+
+    async def listen(self) -> None:
+        """apply invalidations published by other workers to the local tier"""
+        try:
+            queue = await chat_hub.subscribe(INVALIDATION_CHANNEL)
+        except Exception as e:
+            # retried by the next call to start_listener once this task is done
+            logger.warning(f"Cache invalidation listener failed to subscribe: {e}")
+            await asyncio.sleep(LISTENER_RETRY_INTERVAL)
+            return
+        try:
+            while True:
+                message = ujson.loads(await queue.get())
+                if message.get("origin") == self.origin or self.local is None:
+                    continue
+                self.local.delete(message.get("keys", ()))
+                if message.get("prefix"):
+                    self.local.delete_startswith(message["prefix"])
+        finally:
+            await chat_hub.unsubscribe(INVALIDATION_CHANNEL, queue)
+
+    async def close(self) -> None:
+        if self.listener_task is not None:
+            self.listener_task.cancel()
+            self.listener_task = None
 
 
 Cache = CacheManager()
@@ -1,5 +1,20 @@
 from enum import Enum
+from typing import Any
 
 
 class CacheTag(Enum):
     GET_WORKOUT_PROMISES = "get_workout_promises"
+    GET_CHAT_ROOMS = "get_chat_rooms"
+    GET_POSTS = "get_posts"
+
+    # entities a cached response can depend on
+    USER = "user"
+    CHAT_ROOM = "chat-room"
+    POST = "post"
+    WORKOUT_PROMISE = "workout-promise"
+    # chat rooms a user is a member of, by user id
+    CHAT_ROOM_MEMBER = "chat-room-member"
+
+    def of(self, id: Any = None) -> str:
+        """return dependency name of one entity, or of the whole tag without id"""
+        return self.value if id is None else f"{self.value}:{id}"
@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from app.utils.ecs_log import logger
+
+CACHE_OP_TIMEOUT = 0.2
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 10
+
+
+class CircuitOpen(Exception):
+    """the backend is not called while the breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing backend for `reset_timeout` seconds after `failure_threshold`
+    consecutive failures or timeouts, then lets a single call through (half-open) to probe it.
+    """
+
+    def __init__(
+        self,
+        timeout: float = CACHE_OP_TIMEOUT,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ):
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    async def call(
+        self, function: Callable[..., Awaitable[Any]], *args, timeout: float | None = None, **kwargs
+    ) -> Any:
+        probe = False
+        if self.opened_at is not None:
+            if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpen
+            self.probing = probe = True
+        try:
+            result = await asyncio.wait_for(function(*args, **kwargs), timeout or self.timeout)
+        except Exception:
+            self.record_failure(probe)
+            raise
+        finally:
+            if probe:
+                self.probing = False
+        self.record_success()
+        return result
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Cache backend recovered, closing circuit")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, probe: bool) -> None:
+        self.failures += 1
+        if probe or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if not probe:
+                logger.warning(f"Cache backend failed {self.failures} times in a row, opening circuit")
+            self.opened_at = time.monotonic()
@@ -0,0 +1,70 @@
+import zlib
+from typing import Any, Callable
+
+import msgpack
+from fastapi.encoders import jsonable_encoder
+
+from app.core.helpers.cache.base import BaseCodec
+
+# header: format version, compression id
+FORMAT_VERSION = 1
+COMPRESS_THRESHOLD = 1024
+
+NONE, ZLIB, ZSTD, LZ4 = 0, 1, 2, 3
+
+# compression id -> (compress, decompress) for the libraries that are installed
+COMPRESSORS: dict[int, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    ZLIB: (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+try:
+    import zstandard
+
+    COMPRESSORS[ZSTD] = (zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress)
+except ImportError:
+    pass
+try:
+    import lz4.frame
+
+    COMPRESSORS[LZ4] = (lz4.frame.compress, lz4.frame.decompress)
+except ImportError:
+    pass
+
+
+def default_compression() -> int:
+    """fastest installed compressor, zlib is always available"""
+    for compression in (ZSTD, LZ4, ZLIB):
+        if compression in COMPRESSORS:
+            return compression
+    return NONE
+
+
+class MsgpackCodec(BaseCodec):
+    """
+    msgpack of the json-compatible response, compressed above `compress_threshold` bytes.
+    Values written by another version of the format, or that do not decode, are None (a cache miss).
+    """
+
+    def __init__(self, compression: int | None = None, compress_threshold: int = COMPRESS_THRESHOLD):
+        self.compression = default_compression() if compression is None else compression
+        self.compress_threshold = compress_threshold
+
+    def encode(self, value: Any) -> bytes:
+        data = msgpack.packb(jsonable_encoder(value))
+        compression = NONE
+        if self.compression != NONE and len(data) > self.compress_threshold:
+            compression = self.compression
+            data = COMPRESSORS[compression][0](data)
+        return bytes((FORMAT_VERSION, compression)) + data
+
+    def decode(self, data: bytes) -> Any:
+        if len(data) < 2 or data[0] != FORMAT_VERSION:
+            return None
+        compression = data[1]
+        if compression != NONE and compression not in COMPRESSORS:
+            return None
+        try:
+            payload = data[2:] if compression == NONE else COMPRESSORS[compression][1](data[2:])
+            return msgpack.unpackb(payload)
+        except Exception:
+            # every library raises its own errors on a truncated or corrupted value
+            return None
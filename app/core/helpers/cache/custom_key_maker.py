@@ -1,47 +1,112 @@
+import hashlib
 import inspect
-from typing import Any, Callable, OrderedDict
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Sequence
+from uuid import UUID
+
+import msgpack
 from fastapi import Request, Response
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.helpers.cache.base.key_maker import ArgType
+from app.core.helpers.cache.base.key_maker import ArgType, KeyFunction
 from .base import BaseKeyMaker
+from .vary import VaryFunction
+
+ALWAYS_IGNORE_ARG_TYPES = (Response, Request, AsyncSession)
+KEY_DIGEST_SIZE = 16
+# stands in for an argument of an ignored type, so the other arguments keep their position
+IGNORED = ("ignored",)
+MSGPACK_INT_MIN, MSGPACK_INT_MAX = -(2**63), 2**64 - 1
+# packed as they are, checked first since most arguments are one of them
+PLAIN_TYPES = frozenset((str, bytes, float, bool, type(None)))
+
 
-from inspect import Parameter, Signature
-from typing import Mapping, Type
+def encode_arg(value: Any) -> Any:
+    """
+    stable form of an argument, independent of object identity and dict order
+    msgpack scalars are kept as they are (their type is part of the packed bytes), anything
+    else becomes a (type, payload) pair, so no two different arguments pack to the same bytes
+    """
+    if type(value) in PLAIN_TYPES:
+        return value
+    if isinstance(value, UUID):
+        return ("uuid", value.bytes)
+    if isinstance(value, Enum):
+        return ("enum", encode_arg(value.value))
+    if isinstance(value, int) and not MSGPACK_INT_MIN <= value <= MSGPACK_INT_MAX:
+        return ("int", str(value))
+    if isinstance(value, (str, bytes, int, float)):
+        return value
+    if isinstance(value, datetime):
+        return ("datetime", value.isoformat())
+    if isinstance(value, date):
+        return ("date", value.isoformat())
+    if isinstance(value, (list, tuple)):
+        return ("list", [encode_arg(v) for v in value])
+    if isinstance(value, (set, frozenset)):
+        return ("set", sorted(pack(v) for v in value))
+    if isinstance(value, dict):
+        return ("dict", sorted(pack((k, v)) for k, v in value.items()))
+    if isinstance(value, BaseModel):
+        return ("model", value.model_dump_json())
+    return ("repr", repr(value))
 
-SigParameters = Mapping[str, Parameter]
-SigReturnType = Type[object]
-ALWAYS_IGNORE_ARG_TYPES = [Response, Request, AsyncSession]
+
+def pack(value: Any) -> bytes:
+    return msgpack.packb(encode_arg(value))
 
 
 class CustomKeyMaker(BaseKeyMaker):
-    async def make(self, prefix, ignore_arg_types, function: Callable, *args, **kwargs) -> str:
-        if not ignore_arg_types:
-            ignore_arg_types = []
-        ignore_arg_types.extend(ALWAYS_IGNORE_ARG_TYPES)
-        ignore_arg_types = list(set(ignore_arg_types))
-        prefix = f"{prefix}::" if prefix else ""
+    def compile(
+        self,
+        prefix: str | None,
+        ignore_arg_types: Sequence[ArgType],
+        function: Callable,
+        vary: Sequence[VaryFunction] = (),
+    ) -> KeyFunction:
+        # hash tag: every key of a prefix lives in one cluster slot, next to its index
+        prefix = f"{{{prefix}}}::" if prefix else ""
         path = f"{prefix}{function.__module__}.{function.__name__}"
 
         sig = inspect.signature(function)
-        sig_params = sig.parameters
-        func_args = self.get_func_args(sig, *args, **kwargs)
-        args_str = self.get_args_str(sig_params, func_args, ignore_arg_types)
-        return f"{path}({args_str})"
-
-    def get_func_args(self, sig: Signature, *args: list, **kwargs: dict) -> "OrderedDict[str, Any]":
-        """Return a dict object containing the name and value of all function arguments."""
-        func_args = sig.bind(*args, **kwargs)
-        func_args.apply_defaults()
-        return func_args.arguments
-
-    def get_args_str(
-        self,
-        sig_params: SigParameters,
-        func_args: "OrderedDict[str, Any]",
-        ignore_arg_types: list[ArgType],
-    ) -> str:
-        """Return a string with the name and value of all args whose type is not included in `ignore_arg_types`"""
-        return ",".join(
-            f"{arg}={val}" for arg, val in func_args.items() if sig_params[arg].annotation not in ignore_arg_types
-        )
+        ignored = (*ALWAYS_IGNORE_ARG_TYPES, *ignore_arg_types)
+        # (name, default) of every argument, in signature order
+        plan = [
+            (name, param.default)
+            for name, param in sig.parameters.items()
+            if param.kind not in (inspect.Parameter.VAR_POSITIONAL, inspect.Parameter.VAR_KEYWORD)
+        ]
+
+        request_arg = None
+        if vary:
+            request_arg = next(
+                (
+                    name
+                    for name, param in sig.parameters.items()
+                    if inspect.isclass(param.annotation) and issubclass(param.annotation, Request)
+                ),
+                None,
+            )
+            if request_arg is None:
+                raise ValueError(f"{function.__qualname__} has no Request argument to vary on")
+
+        def make_key(*args, **kwargs) -> str:
+            if args:
+                bound = sig.bind(*args, **kwargs)
+                bound.apply_defaults()
+                kwargs = bound.arguments
+            values = []
+            for name, default in plan:
+                value = kwargs.get(name, default)
+                if type(value) not in PLAIN_TYPES:
+                    value = IGNORED if isinstance(value, ignored) else encode_arg(value)
+                values.append(value)
+            if request_arg is not None:
+                request = kwargs[request_arg]
+                values.extend(encode_arg(vary_function(request)) for vary_function in vary)
+            digest = hashlib.blake2b(msgpack.packb(values), digest_size=KEY_DIGEST_SIZE).hexdigest()
+            return f"{path}:{digest}"
+
+        return make_key
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+LOCAL_CACHE_MAX_ENTRIES = 10000
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LocalCache:
+    """
+    In-process LRU in front of the shared backend.
+
+    Bounded by entry count and by the (serialized) size of the values. Every entry has its
+    own expiry, so a missed cross-worker invalidation is only visible until it expires.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, max_bytes: int = LOCAL_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # key -> (expires_at, value, size)
+        self.entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self.entries[key] = (time.monotonic() + ttl, value, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def pop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.pop(key)
+
+    def delete_startswith(self, value: str) -> None:
+        """drop every key of a prefix (keys look like "{prefix}::...")"""
+        start = f"{{{value}}}::"
+        self.delete([key for key in self.entries if key.startswith(start)])
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
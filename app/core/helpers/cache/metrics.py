@@ -0,0 +1,106 @@
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+# upper bounds of the histogram buckets, the last bucket is everything above
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+@dataclass(slots=True)
+class Histogram:
+    bounds: tuple[float, ...]
+    buckets: list[int] = field(init=False)
+    count: int = 0
+    sum: float = 0
+    max: float = 0
+
+    def __post_init__(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "avg": self.sum / self.count if self.count else 0,
+            "max": self.max,
+            "buckets": {
+                **{f"le_{bound}": n for bound, n in zip(self.bounds, self.buckets)},
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+@dataclass(slots=True)
+class FunctionMetrics:
+    local_hits: int = 0
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    errors: int = 0
+    # backend calls skipped while the circuit breaker is open
+    bypasses: int = 0
+    # round trips to the backend, without (de)serialization
+    backend_latency_ms: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_MS))
+    serialization_ms: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_MS))
+    # calls of the cached function on a miss
+    origin_latency_ms: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS_MS))
+    value_bytes: Histogram = field(default_factory=lambda: Histogram(SIZE_BUCKETS_BYTES))
+
+    def snapshot(self) -> dict:
+        lookups = self.local_hits + self.hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "bypasses": self.bypasses,
+            "hit_ratio": (self.local_hits + self.hits) / lookups if lookups else None,
+            "backend_latency_ms": self.backend_latency_ms.snapshot(),
+            "serialization_ms": self.serialization_ms.snapshot(),
+            "origin_latency_ms": self.origin_latency_ms.snapshot(),
+            "value_bytes": self.value_bytes.snapshot(),
+        }
+
+
+def metric_name(key: str) -> str:
+    """cached function of a key ("{prefix}::module.function:digest" -> "{prefix}::module.function")"""
+    return key.rpartition(":")[0] or key
+
+
+def elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+class CacheMetrics:
+    """in-process counters and histograms per cached function, each worker reports its own"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.functions: defaultdict[str, FunctionMetrics] = defaultdict(FunctionMetrics)
+
+    def __getitem__(self, key: str) -> FunctionMetrics:
+        return self.functions[metric_name(key)]
+
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "since": self.started_at,
+            "functions": {name: metrics.snapshot() for name, metrics in sorted(self.functions.items())},
+        }
+
+    def reset(self) -> None:
+        self.started_at = time.time()
+        self.functions.clear()
+
+
+cache_metrics = CacheMetrics()
@@ -1,28 +1,158 @@
-import pickle
-from typing import Any
-from fastapi.encoders import jsonable_encoder
+import time
+from typing import Any, Iterable
 
-import ujson
+from coredis.tokens import PureToken
 
-from app.core.helpers.cache.base import BaseBackend
+from app.core.helpers.cache.base import BaseBackend, BaseCodec
+from app.core.helpers.cache.codec import MsgpackCodec
+from app.core.helpers.cache.metrics import cache_metrics, elapsed_ms
 from app.core.helpers.redis import redis
 
+# sorted sets (member: cache key, score: expiry time) used instead of SCAN to find keys to delete
+INDEX_KEY_PREFIX = "cache-index"
+DEPENDENCY_KEY_PREFIX = "cache-deps"
+UNLINK_BATCH_SIZE = 500
+# every invalidation takes the next version and marks its dependencies with it, so a response computed
+# while one of its dependencies was invalidated can be told apart and dropped
+INVALIDATION_VERSION_KEY = "cache-invalidation-version"
+INVALIDATED_KEY_PREFIX = "cache-invalidated"
+# longer than any computation of a response
+INVALIDATION_MARK_TTL = 300
+
+
+def key_tag(key: str) -> str | None:
+    """return hash tag of a cache key ("{prefix}::..." -> "prefix")"""
+    if not key.startswith("{"):
+        return None
+    end = key.find("}")
+    return key[1:end] if end > 1 else None
+
+
+def index_key(tag: str) -> str:
+    """index of every key under a prefix, in the same slot as those keys"""
+    return f"{INDEX_KEY_PREFIX}:{{{tag}}}"
+
+
+def dependency_key(dependency: str) -> str:
+    return f"{DEPENDENCY_KEY_PREFIX}::{dependency}"
+
+
+def invalidated_key(dependency: str) -> str:
+    return f"{INVALIDATED_KEY_PREFIX}::{dependency}"
+
 
 class RedisBackend(BaseBackend):
+    def __init__(self, codec: BaseCodec | None = None):
+        self.codec = codec or MsgpackCodec()
+
     async def get(self, key: str) -> Any:
+        return self.decode(key, await self.get_encoded(key))
+
+    async def get_encoded(self, key: str) -> bytes | None:
+        """stored bytes of a key, for callers keeping them in another tier"""
+        metrics = cache_metrics[key]
+        start = time.perf_counter()
         result = await redis.get(key)
-        if not result:
-            return
-        try:
-            return ujson.loads(result.decode("utf8"))
-        except UnicodeDecodeError:
-            return pickle.loads(result)
+        metrics.backend_latency_ms.observe(elapsed_ms(start))
+        return result or None
+
+    def encode(self, key: str, response: Any) -> bytes:
+        metrics = cache_metrics[key]
+        start = time.perf_counter()
+        data = self.codec.encode(response)
+        metrics.serialization_ms.observe(elapsed_ms(start))
+        metrics.value_bytes.observe(len(data))
+        return data
+
+    def decode(self, key: str, data: bytes | None) -> Any:
+        if not data:
+            return None
+        start = time.perf_counter()
+        value = self.codec.decode(data)
+        cache_metrics[key].serialization_ms.observe(elapsed_ms(start))
+        return value
 
     async def set(self, response: Any, key: str, ttl: int = 60) -> None:
-        json_compatible_item_data = jsonable_encoder(response)
-        response = ujson.dumps(json_compatible_item_data)
-        await redis.set(key=key, value=response, ex=ttl)
+        await self.set_encoded(self.encode(key, response), key, ttl)
+
+    async def set_encoded(self, data: bytes, key: str, ttl: int = 60) -> None:
+        start = time.perf_counter()
+        tag = key_tag(key)
+        if tag is None:
+            await redis.set(key=key, value=data, ex=ttl)
+        else:
+            # value and index share a slot, so this is a single round trip
+            async with await redis.pipeline(transaction=False) as pipe:
+                await pipe.set(key=key, value=data, ex=ttl)
+                await self.index(pipe, index_key(tag), key, ttl)
+                await pipe.execute()
+        cache_metrics[key].backend_latency_ms.observe(elapsed_ms(start))
 
     async def delete_startswith(self, value: str) -> None:
-        async for key in redis.scan_iter(f"{value}::*"):
-            await redis.delete([key])
+        index = index_key(value)
+        keys = list(await redis.zrange(index, 0, -1))
+        keys.append(index)
+        # all keys live in the slot of the hash tag, so a multi-key UNLINK is allowed
+        for i in range(0, len(keys), UNLINK_BATCH_SIZE):
+            await redis.unlink(keys[i : i + UNLINK_BATCH_SIZE])
+
+    async def add_dependencies(self, key: str, dependencies: Iterable[str], ttl: int = 60) -> None:
+        async with await redis.pipeline(transaction=False) as pipe:
+            for dependency in dependencies:
+                await self.index(pipe, dependency_key(dependency), key, ttl)
+            await pipe.execute()
+
+    async def delete(self, key: str) -> None:
+        await redis.unlink([key])
+
+    async def invalidation_version(self) -> int:
+        return int(await redis.get(INVALIDATION_VERSION_KEY) or 0)
+
+    async def invalidated_since(self, dependencies: Iterable[str], version: int) -> bool:
+        async with await redis.pipeline(transaction=False) as pipe:
+            for dependency in dependencies:
+                await pipe.get(invalidated_key(dependency))
+            marks = await pipe.execute()
+        return any(int(mark) > version for mark in marks if mark)
+
+    async def delete_dependents(self, dependencies: Iterable[str]) -> list[str]:
+        dependencies = list(dependencies)
+        # marked before the keys are read, a response registered after that sees the mark
+        version = await redis.incr(INVALIDATION_VERSION_KEY)
+        async with await redis.pipeline(transaction=False) as pipe:
+            for dependency in dependencies:
+                await pipe.set(invalidated_key(dependency), version, ex=INVALIDATION_MARK_TTL)
+            await pipe.execute()
+
+        indexes = [dependency_key(dependency) for dependency in dependencies]
+        async with await redis.pipeline(transaction=False) as pipe:
+            for index in indexes:
+                await pipe.zrange(index, 0, -1)
+            members = await pipe.execute()
+
+        dependents = list({key.decode() for index_members in members for key in index_members})
+        keys = dependents + indexes
+        # dependents are spread over slots: one UNLINK per key, pipelined per node
+        for i in range(0, len(keys), UNLINK_BATCH_SIZE):
+            async with await redis.pipeline(transaction=False) as pipe:
+                for key in keys[i : i + UNLINK_BATCH_SIZE]:
+                    await pipe.unlink([key])
+                await pipe.execute()
+        return dependents
+
+    async def acquire_lock(self, key: str, ttl_ms: int) -> bool:
+        """short lock so only one worker recomputes an expired key"""
+        return bool(await redis.set(f"{key}:lock", b"1", px=ttl_ms, condition=PureToken.NX))
+
+    async def release_lock(self, key: str) -> None:
+        await redis.delete([f"{key}:lock"])
+
+    @staticmethod
+    async def index(pipe, index: str, key: str, ttl: int) -> None:
+        """queue adding key to index and dropping members that already expired"""
+        now = time.time()
+        await pipe.zadd(index, {key: now + ttl})
+        await pipe.zremrangebyscore(index, 0, now)
+        # the index lives as long as its longest-lived member
+        await pipe.expire(index, ttl, PureToken.NX)
+        await pipe.expire(index, ttl, PureToken.GT)
@@ -0,0 +1,24 @@
+from typing import Any, Callable
+
+from starlette.requests import Request
+
+# request -> value the cached response varies on
+VaryFunction = Callable[[Request], Any]
+
+
+class Vary:
+    """request attributes a cached response can vary on, added to the key next to the arguments"""
+
+    @staticmethod
+    def user(request: Request) -> Any:
+        """id of the authenticated user, None for anonymous requests"""
+        return request.user.id
+
+    @staticmethod
+    def header(name: str) -> VaryFunction:
+        name = name.lower()
+
+        def vary_header(request: Request) -> Any:
+            return request.headers.get(name)
+
+        return vary_header
@@ -0,0 +1,99 @@
+import asyncio
+
+from coredis import RedisCluster
+from coredis.commands import ShardedPubSub
+
+from app.core.helpers.redis import chat_redis
+from app.utils.ecs_log import logger
+
+LISTENER_QUEUE_SIZE = 256
+
+
+class ChatPubSubHub:
+    """
+    Process-wide sharded pubsub for chat rooms.
+
+    Holds one redis subscription per chat room per worker and fans every message
+    out to the local listeners (websockets) of that room through in-process queues.
+    """
+
+    def __init__(self, conn: RedisCluster):
+        self.conn = conn
+        self.pubsub: ShardedPubSub | None = None
+        self.listeners: dict[str, set[asyncio.Queue]] = {}
+        self.reader_task: asyncio.Task | None = None
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=LISTENER_QUEUE_SIZE)
+        async with self.lock:
+            if self.pubsub is None:
+                self.pubsub = self.conn.sharded_pubsub(ignore_subscribe_messages=True)
+            if channel not in self.listeners:
+                await self.pubsub.subscribe(channel)
+                self.listeners[channel] = set()
+            self.listeners[channel].add(queue)
+            if self.reader_task is None or self.reader_task.done():
+                self.reader_task = asyncio.create_task(self.reader())
+        return queue
+
+    async def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        async with self.lock:
+            queues = self.listeners.get(channel)
+            if queues is None:
+                return
+            queues.discard(queue)
+            if queues:
+                return
+            del self.listeners[channel]
+            if self.pubsub is not None:
+                try:
+                    await self.pubsub.unsubscribe(channel)
+                except Exception as e:
+                    logger.warning(f"Chat hub unsubscribe failed: {e}")
+
+    async def publish(self, channel: str, data: str) -> None:
+        await self.conn.spublish(channel, data)
+
+    async def reader(self) -> None:
+        while self.pubsub is not None:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Chat hub reader error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            if not message or message.get("type") not in ("message", "smessage"):
+                continue
+            data = message.get("data", None)
+            if not isinstance(data, str) or not data:
+                continue
+            self.fan_out(message.get("channel"), data)
+
+    def fan_out(self, channel, data: str) -> None:
+        for queue in list(self.listeners.get(channel, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # slow consumer: drop the oldest message instead of blocking the whole room
+                queue.get_nowait()
+                queue.put_nowait(data)
+
+    async def close(self) -> None:
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.reader_task = None
+        if self.pubsub is not None:
+            pubsub, self.pubsub = self.pubsub, None
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"Chat hub close failed: {e}")
+        self.listeners = {}
+
+
+# singleton pubsub hub (one redis subscription per chat room per worker)
+chat_hub = ChatPubSubHub(chat_redis)
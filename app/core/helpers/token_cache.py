@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import time
+import uuid
+
+import ujson
+from pydantic import UUID4
+
+from app.core.exceptions import RevokedTokenException
+from app.core.helpers.cache.local_cache import LocalCache
+from app.core.helpers.pubsub import chat_hub
+from app.core.helpers.redis import redis
+from app.utils.ecs_log import logger
+from app.utils.token_helper import REFRESH_TOKEN_EXPIRE_PERIOD, TokenHelper
+
+VERIFIED_MAX_ENTRIES = 50000
+VERIFIED_MAX_BYTES = 32 * 1024 * 1024
+
+# every revocation increments the version, a token carries the version current when it was issued
+# ("ver" claim) and a revocation with a later version revokes it. Worker clocks play no part.
+TOKEN_VERSION_KEY = "token-version"
+# "<user id>:<version>" of every revocation, scored by its time so old ones can be dropped
+REVOKED_USERS_KEY = "revoked-users"
+# revoked users can not refresh an expired token either, so revocations live as long as refresh tokens
+REVOCATION_TTL = REFRESH_TOKEN_EXPIRE_PERIOD
+REVOCATION_CHANNEL = "token-revocation"
+# reloads the revocations, covers broadcasts a worker missed while it was not subscribed
+SYNC_INTERVAL = 60
+LISTENER_RETRY_INTERVAL = 5
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Verified tokens and revocations of this worker.
+
+    A token is verified (signature, expiry) once and its claims are kept under its digest until it
+    expires. Revocations are stored in a redis sorted set, mirrored in a dict of every worker and
+    kept coherent by a broadcast on revoke plus a periodic reload, so a lookup never leaves the process.
+    """
+
+    def __init__(self, max_entries: int = VERIFIED_MAX_ENTRIES, max_bytes: int = VERIFIED_MAX_BYTES):
+        self.verified = LocalCache(max_entries=max_entries, max_bytes=max_bytes)
+        # user id -> version of the last revocation
+        self.revoked_users: dict[str, int] = {}
+        # highest token version seen
+        self.version = 0
+        # user id -> highest version known when a revocation of the user failed to reach redis,
+        # kept apart from the stored revocations until it is retried
+        self.pending: dict[str, int] = {}
+        self.origin = str(uuid.uuid4())
+        self.sync_task: asyncio.Task | None = None
+        self.listener_task: asyncio.Task | None = None
+
+    def verify(self, token: str) -> dict:
+        """claims of a valid token, raises like `TokenHelper.decode` or RevokedTokenException"""
+        digest = token_digest(token)
+        claims = self.verified.get(digest)
+        if claims is None:
+            claims = TokenHelper.decode(token)
+            ttl = claims.get("exp", 0) - time.time()
+            if ttl > 0:
+                self.verified.set(digest, claims, ttl, size=len(token))
+        if self.is_revoked(claims):
+            raise RevokedTokenException
+        return claims
+
+    def is_revoked(self, claims: dict) -> bool:
+        user_id, version = str(claims.get("user_id")), claims.get("ver", 0)
+        if version < self.revoked_users.get(user_id, 0):
+            return True
+        # a revocation that did not reach redis has no version, it revokes the tokens issued up to it
+        return user_id in self.pending and version <= self.pending[user_id]
+
+    async def token_version(self) -> int:
+        """version claim of a token issued now, it is revoked by any later revocation of its user"""
+        try:
+            # stored first, a pending revocation would revoke the new token too
+            await self.store_pending()
+            self.version = max(self.version, int(await redis.get(TOKEN_VERSION_KEY) or 0))
+        except Exception as e:
+            # a revocation this worker has not seen yet may revoke the token
+            logger.warning(f"Token version lookup failed: {e}")
+        return self.version
+
+    def apply(self, user_id: str, version: int) -> None:
+        self.revoked_users[user_id] = max(version, self.revoked_users.get(user_id, version))
+        self.version = max(self.version, version)
+
+    async def revoke_user(self, user_id: UUID4) -> None:
+        """revoke every token issued to a user so far, on every worker"""
+        user_id = str(user_id)
+        try:
+            await self.store_revocation(user_id)
+        except Exception as e:
+            # revoked on this worker, other workers keep accepting the tokens until the reload retries it
+            self.pending[user_id] = max(self.version, self.pending.get(user_id, 0))
+            logger.error(f"Token revocation of user {user_id} failed: {e}")
+
+    async def store_revocation(self, user_id: str) -> None:
+        version = await redis.incr(TOKEN_VERSION_KEY)
+        self.apply(user_id, version)
+        await redis.zadd(REVOKED_USERS_KEY, {f"{user_id}:{version}": time.time()})
+        self.pending.pop(user_id, None)
+        await chat_hub.publish(
+            REVOCATION_CHANNEL, ujson.dumps({"user_id": user_id, "version": version, "origin": self.origin})
+        )
+
+    async def store_pending(self) -> None:
+        for user_id in list(self.pending):
+            await self.store_revocation(user_id)
+
+    async def sync(self) -> None:
+        """reload the stored revocations, dropping those older than any token"""
+        await self.store_pending()
+        seen = dict(self.revoked_users)
+        cutoff = time.time() - REVOCATION_TTL
+        await redis.zremrangebyscore(REVOKED_USERS_KEY, "-inf", cutoff)
+        members = await redis.zrangebyscore(REVOKED_USERS_KEY, cutoff, "+inf")
+        version = int(await redis.get(TOKEN_VERSION_KEY) or 0)
+        revoked_users: dict[str, int] = {}
+        for member in members:
+            user_id, member_version = member.decode().split(":")
+            revoked_users[user_id] = max(int(member_version), revoked_users.get(user_id, 0))
+        # keeps revocations applied during the reload
+        for user_id, user_version in self.revoked_users.items():
+            if seen.get(user_id) != user_version:
+                revoked_users[user_id] = max(user_version, revoked_users.get(user_id, user_version))
+        self.revoked_users = revoked_users
+        self.version = max(self.version, version)
+
+    def start(self) -> None:
+        if self.sync_task is None or self.sync_task.done():
+            self.sync_task = asyncio.create_task(self.loop())
+        if self.listener_task is None or self.listener_task.done():
+            self.listener_task = asyncio.create_task(self.listen())
+
+    async def loop(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # the local revocations stay as they are until the next reload
+                logger.warning(f"Token revocation reload failed: {e}")
+            await asyncio.sleep(SYNC_INTERVAL)
+
+    async def listen(self) -> None:
+        """apply revocations published by other workers"""
+        while True:
+            try:
+                queue = await chat_hub.subscribe(REVOCATION_CHANNEL)
+            except Exception as e:
+                logger.warning(f"Token revocation listener failed to subscribe: {e}")
+                await asyncio.sleep(LISTENER_RETRY_INTERVAL)
+                continue
+            try:
+                while True:
+                    message = ujson.loads(await queue.get())
+                    if message.get("origin") == self.origin:
+                        continue
+                    self.apply(message["user_id"], message["version"])
+            finally:
+                await chat_hub.unsubscribe(REVOCATION_CHANNEL, queue)
+
+    async def close(self) -> None:
+        for task in (self.sync_task, self.listener_task):
+            if task is not None:
+                task.cancel()
+        self.sync_task = self.listener_task = None
+
+
+token_cache = TokenCache()
@@ -11,7 +11,15 @@ from app.api.api import api_router
 from app.core import conn
 from app.core.config import settings
 from app.core.exceptions.base import CustomException
-from app.core.helpers.cache import Cache, RedisBackend, CustomKeyMaker
+from app.core.helpers.cache import Cache, RedisBackend, CustomKeyMaker, LocalCache
+from app.core.helpers.pubsub import chat_hub
+from app.core.helpers.token_cache import token_cache
+from app.services.chat_message_buffer import message_buffer
+from app.services.chat_read_receipt_service import read_receipts
+from app.services.mate_recommendation_service import mate_recommender
+from app.services.role_service import role_registry
+from app.services.counter_service import counter_reconciler
+from app.services.fcm_service import fcm_dispatcher
 from app.api.websockets.chat import chat_ws_router
 from app.core.fastapi.middlewares import (
     AuthBackend,
@@ -25,7 +33,7 @@ def init_router(app_: FastAPI) -> None:
 
 
 def init_cache() -> None:
-    Cache.init(backend=RedisBackend(), key_maker=CustomKeyMaker())
+    Cache.init(backend=RedisBackend(), key_maker=CustomKeyMaker(), local=LocalCache())
 
 
 HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
@@ -57,11 +65,31 @@ def init_listeners(app_: FastAPI) -> None:
 
         return JSONResponse(content=jsonable_encoder(content), status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
+    @app_.on_event("startup")
+    async def startup_event():
+        # persists chat messages left in the write-behind WAL by crashed workers
+        message_buffer.start_recovery()
+        counter_reconciler.start()
+        mate_recommender.start()
+        token_cache.start()
+        role_registry.start()
+
     # Graceful shutdown
     @app_.on_event("shutdown")
     async def shutdown_event():
         print("Shutting down...")
         await conn.conn_manager.close_all()
+        # the final flushes still publish through the hub and invalidate the cache
+        await message_buffer.close()
+        print("Chat messages flushed.")
+        await read_receipts.close()
+        await fcm_dispatcher.close()
+        await counter_reconciler.close()
+        await mate_recommender.close()
+        await token_cache.close()
+        await role_registry.close()
+        await Cache.close()
+        await chat_hub.close()
         print("All connections closed.")
         print("Stop event loop...")
         loop = asyncio.get_running_loop()
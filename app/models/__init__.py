@@ -2,7 +2,7 @@
 
 from .base import Base
 from .audio import Audio
-from .user import User
+from .user import User, MateRecommendation
 from .chat import *
 from .guid import GUID
 from .workout_promise import *
@@ -13,6 +13,7 @@ __all__ = [
     "Base",
     "Audio",
     "User",
+    "MateRecommendation",
     "ChatRoom",
     "ChatRoomMember",
     "Message",
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import TYPE_CHECKING
 from pydantic import UUID4
-from sqlalchemy import Boolean, String, ForeignKey, DateTime, true
+from sqlalchemy import Boolean, Index, Integer, String, ForeignKey, DateTime, text, true
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from app.core.db.mixins.timestamp_mixin import TimestampMixin
 from app.models import Base
@@ -17,9 +17,11 @@ if TYPE_CHECKING:
 
 class ChatRoomMember(TimestampMixin, Base):
     __mapper_args__ = {"eager_defaults": True}
+    # room list of a user, also serves lookups by user_id alone
+    __table_args__ = (Index("ix_chat_room_member_user_id_chat_room_id", "user_id", "chat_room_id"),)
     id: Mapped[UUID4] = mapped_column(GUID, primary_key=True, index=True, default=uuid.uuid4)
 
-    user_id: Mapped[UUID4] = mapped_column(GUID, ForeignKey("user.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id: Mapped[UUID4] = mapped_column(GUID, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
     chat_room_id: Mapped[UUID4] = mapped_column(
         GUID, ForeignKey("chat_room.id", ondelete="CASCADE"), nullable=False, index=True
     )
@@ -28,6 +30,8 @@ class ChatRoomMember(TimestampMixin, Base):
     )
     last_read_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=utcnow(), nullable=False)
     last_read_message_id: Mapped[UUID4 | None] = mapped_column(GUID, nullable=True, default=None)
+    # inbox projection: messages of other members since last_read_at, maintained by the message writer
+    unread_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
 
     chat_room: Mapped["ChatRoom"] = relationship("ChatRoom", back_populates="members")
@@ -46,6 +50,10 @@ class ChatRoomMember(TimestampMixin, Base):
 # TODO: delete Created by ?
 class ChatRoom(TimestampMixin, Base):
     __mapper_args__ = {"eager_defaults": True}
+    # public room list, the predicate matches `is_private.is_(False)` of the queries
+    __table_args__ = (
+        Index("ix_chat_room_public_created_at", "created_at", "id", postgresql_where=text("is_private IS false")),
+    )
 
     id: Mapped[UUID4] = mapped_column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String(100), index=True, nullable=True)
@@ -57,6 +65,13 @@ class ChatRoom(TimestampMixin, Base):
     admin_user: Mapped["User"] = relationship("User", back_populates="admin_chat_rooms")
     is_group_chat: Mapped[bool] = mapped_column(Boolean, index=True, nullable=False, server_default=true())
 
+    # inbox projection: latest message of the room, maintained by the message writer
+    last_message_id: Mapped[UUID4 | None] = mapped_column(GUID, nullable=True, default=None)
+    last_message_text: Mapped[str | None] = mapped_column(String(300), nullable=True, default=None)
+    last_message_created_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, default=None
+    )
+
     members: Mapped[list[ChatRoomMember]] = relationship(
         "ChatRoomMember",
         back_populates="chat_room",
@@ -85,6 +100,8 @@ class ChatRoom(TimestampMixin, Base):
 # 유저 삭제 및 채팅방 삭제 시, text는 삭제되지 않음.
 class Message(TimestampMixin, Base):
     __mapper_args__ = {"eager_defaults": True}
+    # messages of a room paged on (created_at, id), scanned backward for newest first
+    __table_args__ = (Index("ix_message_chat_room_id_created_at", "chat_room_id", "created_at", "id"),)
 
     id: Mapped[UUID4] = mapped_column(GUID, primary_key=True, index=True, default=uuid.uuid4)
 
@@ -8,7 +8,9 @@ from sqlalchemy import (
     ForeignKey,
     UniqueConstraint,
     Boolean,
+    Index,
     TEXT,
+    text,
 )
 from sqlalchemy.orm import relationship, query_expression, Mapped, mapped_column
 from app.models.guid import GUID
@@ -44,11 +46,24 @@ class Post(TimestampMixin, Base):
     post_likes: Mapped[list["PostLike"]] = relationship("PostLike", back_populates="post")
     comments: Mapped[list["Comment"]] = relationship("Comment", back_populates="post")
     ai_coaching: Mapped[list["AiCoaching"]] = relationship("AiCoaching", back_populates="post")
-    like_cnt: Mapped[int] = query_expression()
-    comment_cnt: Mapped[int] = query_expression()
+    # maintained by like/comment create & delete, see app/services/counter_service.py
+    like_cnt: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
+    comment_cnt: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
 
     is_liked: Mapped[int] = query_expression()
 
+    # feeds paged on (created_at, id), only available posts are listed
+    __table_args__ = (
+        Index("ix_post_available_created_at", "created_at", "id", postgresql_where=text("available = true")),
+        Index(
+            "ix_post_available_community_id_created_at",
+            "community_id",
+            "created_at",
+            "id",
+            postgresql_where=text("available = true"),
+        ),
+    )
+
 
 class PostLike(TimestampMixin, Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -68,14 +83,17 @@ class Comment(TimestampMixin, Base):
     available: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="1")
     content: Mapped[str] = mapped_column(TEXT, nullable=False)
     user_id: Mapped[UUID4] = mapped_column(GUID, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False)
-    post_id: Mapped[int] = mapped_column(Integer, ForeignKey("post.id", ondelete="CASCADE"), index=True, nullable=False)
+    post_id: Mapped[int] = mapped_column(Integer, ForeignKey("post.id", ondelete="CASCADE"), nullable=False)
     user: Mapped[User] = relationship("User", back_populates="comments", uselist=False)
     post: Mapped[Post] = relationship("Post", back_populates="comments", uselist=False)
     comment_likes: Mapped[list["CommentLike"]] = relationship("CommentLike", back_populates="comment")
 
-    like_cnt: Mapped[int] = query_expression()
+    like_cnt: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0", default=0)
     is_liked: Mapped[int] = query_expression()
 
+    # comments of a post paged on (created_at, id), also serves lookups by post_id alone
+    __table_args__ = (Index("ix_comment_post_id_created_at", "post_id", "created_at", "id"),)
+
 
 class CommentLike(TimestampMixin, Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 import uuid
 from pydantic import UUID4
-from sqlalchemy import DateTime, String, ForeignKey
+from sqlalchemy import DateTime, Index, String, ForeignKey
 
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from app.core.db.mixins.timestamp_mixin import TimestampMixin
@@ -24,6 +24,11 @@ class Notification(TimestampMixin, Base):
     read_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=utcnow(), nullable=True)
 
 
+# notification lists are paged on (created_at, id); declared outside the class,
+# __table_args__ would be inherited by the joined NotificationWorkout table
+Index("ix_notification_created_at", Notification.created_at, Notification.id)
+
+
 # NotificationWorkout inherits from Notification
 class NotificationWorkout(Notification):
     # One to One relationship with Notification
@@ -45,7 +50,7 @@ class NotificationWorkout(Notification):
 
     # 알림을 수신하는 유저들(WorkoutParticipants) Many to One
     recipient_id: Mapped[UUID4] = mapped_column(
-        GUID, ForeignKey("workout_participant.id", ondelete="CASCADE"), nullable=False
+        GUID, ForeignKey("workout_participant.id", ondelete="CASCADE"), index=True, nullable=False
     )
     recipient: Mapped["WorkoutParticipant"] = relationship(
         "WorkoutParticipant",
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Integer,
     String,
@@ -184,3 +185,13 @@ class User(TimestampMixin, Base):  # type: ignore
         cascade="save-update, merge, delete",
         passive_deletes=True,
     )
+
+
+# top candidates of the workout-mate recommendation, rewritten by app/services/mate_recommendation_service.py
+class MateRecommendation(TimestampMixin, Base):
+    user_id: Mapped[UUID4] = mapped_column(GUID, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    rank: Mapped[int] = mapped_column(Integer, primary_key=True)
+    recommended_user_id: Mapped[UUID4] = mapped_column(
+        GUID, ForeignKey("user.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    score: Mapped[float] = mapped_column(Float, nullable=False)
@@ -10,15 +10,18 @@ from sqlalchemy import (
     Integer,
     ForeignKey,
     Boolean,
+    Index,
     Table,
+    text,
 )
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 from app.core.db.mixins.timestamp_mixin import TimestampMixin
 from app.models.base import Base
 from app.models.guid import GUID
 from app.schemas import ParticipantStatus
 from app.schemas.workout_promise import WorkoutPromiseStatus
 from app.utils.generics import utcnow
+from app.utils.geo import GEOHASH_PRECISION, geohash_encode
 
 if TYPE_CHECKING:
     # if the target of the relationship is in another module
@@ -28,6 +31,18 @@ if TYPE_CHECKING:
 
 class WorkoutPromise(TimestampMixin, Base):
     __mapper_args__ = {"eager_defaults": True}
+    # lists paged on (created_at, id), the predicate matches `is_private.is_(False)` of the queries
+    __table_args__ = (
+        Index("ix_workout_promise_public_created_at", "created_at", "id", postgresql_where=text("is_private IS false")),
+        Index(
+            "ix_workout_promise_public_status_created_at",
+            "status",
+            "created_at",
+            "id",
+            postgresql_where=text("is_private IS false"),
+        ),
+        Index("ix_workout_promise_admin_user_id_created_at", "admin_user_id", "created_at", "id"),
+    )
     id: Mapped[UUID4] = mapped_column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     title: Mapped[str] = mapped_column(String, index=True, nullable=False)
     description: Mapped[str] = mapped_column(String, index=True, nullable=False)
@@ -59,7 +74,7 @@ class WorkoutPromise(TimestampMixin, Base):
     chat_room: Mapped["ChatRoom"] = relationship("ChatRoom", back_populates="workout_promise", lazy="select")
 
     promise_location_id: Mapped[UUID4] = mapped_column(
-        GUID, ForeignKey("promise_location.id", ondelete="SET NULL"), nullable=True
+        GUID, ForeignKey("promise_location.id", ondelete="SET NULL"), index=True, nullable=True
     )
     promise_location: Mapped["PromiseLocation"] = relationship(
         "PromiseLocation", back_populates="workout_promises", lazy="select"
@@ -76,6 +91,7 @@ class WorkoutPromise(TimestampMixin, Base):
 
 class WorkoutParticipant(TimestampMixin, Base):
     __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (Index("ix_workout_participant_user_id_status", "user_id", "status"),)
     id: Mapped[UUID4] = mapped_column(GUID, primary_key=True, index=True, default=uuid.uuid4)
     name: Mapped[str] = mapped_column(String, index=True, nullable=True)
 
@@ -93,7 +109,7 @@ class WorkoutParticipant(TimestampMixin, Base):
 
     # ("Many" to one)
     workout_promise_id: Mapped[UUID4] = mapped_column(
-        GUID, ForeignKey("workout_promise.id", ondelete="CASCADE"), nullable=False
+        GUID, ForeignKey("workout_promise.id", ondelete="CASCADE"), index=True, nullable=False
     )
     workout_promise: Mapped[WorkoutPromise] = relationship("WorkoutPromise", back_populates="participants")
 
@@ -191,6 +207,11 @@ class PromiseLocation(TimestampMixin, Base):
     latitude: Mapped[float] = mapped_column(Float, nullable=False)
     # 경도
     longitude: Mapped[float] = mapped_column(Float, nullable=False)
+    # cell of the point for proximity search, see app/utils/geo.py
+    # "C" collation so prefix ranges of the cells are index ranges
+    geohash: Mapped[str | None] = mapped_column(
+        String(GEOHASH_PRECISION, collation="C"), index=True, nullable=True, default=None
+    )
     # 주소
     address: Mapped[str] = mapped_column(String, nullable=False)
 
@@ -200,3 +221,11 @@ class PromiseLocation(TimestampMixin, Base):
         cascade="save-update, merge, delete",
         passive_deletes=True,
     )
+
+    @validates("latitude", "longitude")
+    def _update_geohash(self, key: str, value: float) -> float:
+        latitude = value if key == "latitude" else self.latitude
+        longitude = value if key == "longitude" else self.longitude
+        if latitude is not None and longitude is not None:
+            self.geohash = geohash_encode(latitude, longitude)
+        return value
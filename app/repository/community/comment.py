@@ -4,59 +4,35 @@ from pydantic import UUID4
 from app.models.user import User
 from app.session import Transactional
 from app.models.community import Comment, CommentLike
-from sqlalchemy import delete, select, case, func, update, and_
+from app.repository.community import post
+from sqlalchemy import delete, select, func, update
 from sqlalchemy.orm import with_expression, selectinload, contains_eager
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.utils.keyset_pagination import paginate_stmt
+
+
+def is_liked_expression(user_id: UUID4):
+    """1: liked, 0: disliked, -1: not rated by user_id"""
+    return func.coalesce(
+        select(CommentLike.is_liked)
+        .where(CommentLike.comment_id == Comment.id, CommentLike.user_id == user_id)
+        .scalar_subquery(),
+        -1,
+    )
 
 
 @Transactional()
 async def get_list_with_like_cnt_where_post_id(
-    post_id: int, user_id: UUID4 | None, limit: int, offset: int, session: AsyncSession
+    post_id: int, user_id: UUID4 | None, limit: int, offset: int, session: AsyncSession, cursor: str | None = None
 ):
     stmt = (
         select(Comment)
-        .join_from(
-            Comment,
-            CommentLike,
-            onclause=CommentLike.comment_id == Comment.id,
-            isouter=True,
-        )
-        .options(
-            with_expression(
-                Comment.like_cnt,
-                func.count(
-                    case(
-                        (CommentLike.is_liked == 1, CommentLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
         .options(selectinload(Comment.user).load_only(User.id, User.username, User.profile_pic))
-        .group_by(Comment.id)
-        .order_by(Comment.created_at.desc())
         .where(Comment.post_id == post_id)
     )
     if user_id:
-        stmt = stmt.options(
-            with_expression(
-                Comment.is_liked,
-                func.max(
-                    case(
-                        (
-                            and_(
-                                CommentLike.user_id == user_id,
-                                CommentLike.is_liked == 1,
-                            ),
-                            1,
-                        ),
-                        (and_(CommentLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
-    stmt = stmt.limit(limit).offset(offset)
+        stmt = stmt.options(with_expression(Comment.is_liked, is_liked_expression(user_id)))
+    stmt = paginate_stmt(stmt, Comment.created_at, Comment.id, limit, cursor, offset)
     res = await session.execute(stmt)
     return res.scalars().all()
 
@@ -65,6 +41,8 @@ async def get_list_with_like_cnt_where_post_id(
 async def create(comment_data: dict, session: AsyncSession):
     comment = Comment(**comment_data)
     session.add(comment)
+    if comment_data.get("available", True):
+        await post.add_comment_cnt(comment_data["post_id"], 1, session=session)
     await session.commit()
     return await session.scalar(
         select(Comment)
@@ -91,46 +69,11 @@ async def get_with_like_cnt_where_id(id: int, user_id: UUID4 | None, session: As
         select(Comment)
         .join(Comment.user, isouter=True)
         .options(contains_eager(Comment.user).load_only(User.id, User.username, User.profile_pic))
-        .join_from(
-            Comment,
-            CommentLike,
-            onclause=CommentLike.comment_id == Comment.id,
-            isouter=True,
-        )
-        .options(
-            with_expression(
-                Comment.like_cnt,
-                func.count(
-                    case(
-                        (CommentLike.is_liked == 1, CommentLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
         .where(Comment.id == id)
-        .group_by(Comment.id, User.id)
     )
 
     if user_id:
-        stmt = stmt.options(
-            with_expression(
-                Comment.is_liked,
-                func.max(
-                    case(
-                        (
-                            and_(
-                                CommentLike.user_id == user_id,
-                                CommentLike.is_liked == 1,
-                            ),
-                            1,
-                        ),
-                        (and_(CommentLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
+        stmt = stmt.options(with_expression(Comment.is_liked, is_liked_expression(user_id)))
     res = await session.execute(stmt)
     return res.scalar_one()
 
@@ -152,8 +95,11 @@ async def update_where_id(comment_id, comment_data: dict, session: AsyncSession)
 
 @Transactional()
 async def delete_where_id(id, session: AsyncSession):
-    stmt = delete(Comment).where(Comment.id == id)
-    await session.execute(stmt)
+    stmt = delete(Comment).where(Comment.id == id).returning(Comment.post_id, Comment.available)
+    res = await session.execute(stmt)
+    deleted = res.one_or_none()
+    if deleted is not None and deleted.available:
+        await post.add_comment_cnt(deleted.post_id, -1, session=session)
     return
 
 
@@ -177,11 +123,14 @@ async def create_or_update_like(comment_id: int, user_id: int, is_like: int, ses
     if comment_like is None:
         comment_like = CommentLike(comment_id=comment_id, user_id=user_id, is_liked=is_like)
         session.add(comment_like)
+        delta = int(is_like == 1)
     else:
         if comment_like.is_liked == is_like:
             return comment_like.is_liked
+        delta = int(is_like == 1) - int(comment_like.is_liked == 1)
         comment_like.is_liked = is_like
 
+    await add_like_cnt(comment_id, delta, session=session)
     await session.commit()
     await session.refresh(comment_like)
     return comment_like.is_liked
@@ -189,9 +138,25 @@ async def create_or_update_like(comment_id: int, user_id: int, is_like: int, ses
 
 @Transactional()
 async def delete_like_where_comment_id_and_user_id(comment_id: int, user_id: int, session: AsyncSession):
-    stmt = delete(CommentLike).where(
-        (CommentLike.comment_id == comment_id),
-        (CommentLike.user_id == user_id),
+    stmt = (
+        delete(CommentLike)
+        .where(
+            (CommentLike.comment_id == comment_id),
+            (CommentLike.user_id == user_id),
+        )
+        .returning(CommentLike.is_liked)
     )
-    await session.execute(stmt)
+    res = await session.execute(stmt)
+    if res.scalar_one_or_none() == 1:
+        await add_like_cnt(comment_id, -1, session=session)
     return
+
+
+async def add_like_cnt(comment_id: int, delta: int, session: AsyncSession):
+    """apply delta to the like counter in the caller's transaction"""
+    if delta:
+        await session.execute(
+            update(Comment)
+            .where(Comment.id == comment_id)
+            .values(like_cnt=Comment.like_cnt + delta, updated_at=Comment.updated_at)
+        )
@@ -2,9 +2,20 @@ from pydantic import UUID4
 from app.models.user import User
 from app.session import Transactional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import and_, delete, select, func, case, update
+from sqlalchemy import delete, select, func, update
 from sqlalchemy.orm import with_expression, selectinload, contains_eager
-from app.models.community import Comment, Post, PostLike
+from app.models.community import Post, PostLike
+from app.utils.keyset_pagination import paginate_stmt
+
+
+def is_liked_expression(user_id: UUID4):
+    """1: liked, 0: disliked, -1: not rated by user_id"""
+    return func.coalesce(
+        select(PostLike.is_liked)
+        .where(PostLike.post_id == Post.id, PostLike.user_id == user_id)
+        .scalar_subquery(),
+        -1,
+    )
 
 
 @Transactional()
@@ -14,54 +25,19 @@ async def get_list_with_like_cnt_comment_cnt_where_community_id(
     offset: int,
     user_id: UUID4 | None,
     session: AsyncSession,
+    cursor: str | None = None,
 ):
     stmt = (
         select(Post)
-        .join_from(Post, PostLike, isouter=True, onclause=Post.id == PostLike.post_id)
-        .join_from(Post, Comment, isouter=True, onclause=Post.id == Comment.post_id)
         .options(selectinload(Post.user).load_only(User.id, User.username, User.profile_pic))
-        .options(
-            with_expression(
-                Post.like_cnt,
-                func.count(
-                    case(
-                        (PostLike.is_liked == 1, PostLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
-        .options(
-            with_expression(
-                Post.comment_cnt,
-                func.count(
-                    case(
-                        (Comment.available == True, Comment.id),
-                    ).distinct()
-                ),
-            )
-        )
-        .group_by(Post.id)
-        .order_by(Post.created_at.desc())
         .where(Post.available == True)
     )
 
     if community_id:
         stmt = stmt.where(Post.community_id == community_id)
     if user_id:
-        stmt = stmt.options(
-            with_expression(
-                Post.is_liked,
-                func.max(
-                    case(
-                        (and_(PostLike.user_id == user_id, PostLike.is_liked == 1), 1),
-                        (and_(PostLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
-    stmt = stmt.limit(limit).offset(offset)
+        stmt = stmt.options(with_expression(Post.is_liked, is_liked_expression(user_id)))
+    stmt = paginate_stmt(stmt, Post.created_at, Post.id, limit, cursor, offset)
     res = await session.execute(stmt)
     return res.scalars().all()
 
@@ -111,34 +87,10 @@ async def get_with_like_cnt_where_id(id: int, session: AsyncSession, user_id: UU
         select(Post)
         .join(Post.user, isouter=True)
         .options(contains_eager(Post.user).load_only(User.id, User.username, User.profile_pic))
-        .join_from(Post, PostLike, isouter=True, onclause=Post.id == PostLike.post_id)
-        .options(
-            with_expression(
-                Post.like_cnt,
-                func.count(
-                    case(
-                        (PostLike.is_liked == 1, PostLike.id),
-                        else_=None,
-                    ).distinct()
-                ),
-            )
-        )
         .where(Post.id == id)
-        .group_by(Post.id, User.id)
     )
     if user_id:
-        stmt = stmt.options(
-            with_expression(
-                Post.is_liked,
-                func.max(
-                    case(
-                        (and_(PostLike.user_id == user_id, PostLike.is_liked == 1), 1),
-                        (and_(PostLike.is_liked == 0), 0),
-                        else_=-1,
-                    ),
-                ),
-            )
-        )
+        stmt = stmt.options(with_expression(Post.is_liked, is_liked_expression(user_id)))
     res = await session.execute(stmt)
     return res.scalar_one()
 
@@ -161,11 +113,14 @@ async def create_or_update_like(post_id: int, user_id: int, like: int, session:
         # FIXME: mypy
         post_like = PostLike(post_id=post_id, user_id=user_id, is_liked=like)  # type: ignore
         session.add(post_like)
+        delta = int(like == 1)
     else:
         if post_like.is_liked == like:
             return post_like
+        delta = int(like == 1) - int(post_like.is_liked == 1)
         post_like.is_liked = like
 
+    await add_like_cnt(post_id, delta, session=session)
     await session.commit()
     await session.refresh(post_like)
 
@@ -174,9 +129,35 @@ async def create_or_update_like(post_id: int, user_id: int, like: int, session:
 
 @Transactional()
 async def delete_like_where_post_id_and_user_id(post_id: int, user_id: int, session: AsyncSession):
-    stmt = delete(PostLike).where(
-        PostLike.post_id == post_id,
-        PostLike.user_id == user_id,
+    stmt = (
+        delete(PostLike)
+        .where(
+            PostLike.post_id == post_id,
+            PostLike.user_id == user_id,
+        )
+        .returning(PostLike.is_liked)
     )
-    await session.execute(stmt)
+    res = await session.execute(stmt)
+    if res.scalar_one_or_none() == 1:
+        await add_like_cnt(post_id, -1, session=session)
     return
+
+
+async def add_like_cnt(post_id: int, delta: int, session: AsyncSession):
+    """apply delta to the like counter in the caller's transaction"""
+    if delta:
+        await session.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(like_cnt=Post.like_cnt + delta, updated_at=Post.updated_at)
+        )
+
+
+async def add_comment_cnt(post_id: int, delta: int, session: AsyncSession):
+    """apply delta to the comment counter in the caller's transaction"""
+    if delta:
+        await session.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(comment_cnt=Post.comment_cnt + delta, updated_at=Post.updated_at)
+        )
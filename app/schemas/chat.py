@@ -52,7 +52,8 @@ class ChatRoomReadWithLastMessageAndMembers(ChatRoomRead):
 
 
 class ChatRoomList(BaseModel):
-    total: int
+    total: int | None
+    next_cursor: str | None = None
     items: list[ChatRoomRead]
 
     model_config = ConfigDict(
@@ -62,7 +63,7 @@ class ChatRoomList(BaseModel):
 
 class MyChatRoomList(BaseModel):
     total: int | None
-    next_cursor: int | None
+    next_cursor: str | None
     items: list[ChatRoomReadWithLastMessageAndMembers]
 
     model_config = ConfigDict(
@@ -145,8 +146,8 @@ class MessageRead(BaseModel):
 
 
 class MessageListRead(BaseModel):
-    total: int
-    next_cursor: int | None
+    total: int | None
+    next_cursor: str | None
     items: list[MessageRead]
 
 
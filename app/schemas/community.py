@@ -143,12 +143,12 @@ class CommentResponse(CommentRead):
 
 
 class GetCommentsResponse(BaseModel):
-    total: int
+    total: int | None
     items: list[CommentResponse]
-    next_cursor: int | None
+    next_cursor: str | None
 
 
 class GetPostsResponse(BaseModel):
-    total: int
+    total: int | None
     items: list[PostResponse]
-    next_cursor: int | None
+    next_cursor: str | None
@@ -100,7 +100,7 @@ class BaseListResponse(BaseModel):
 
 class NotificationWorkoutListResponse(BaseListResponse):
     items: list[NotificationWorkoutRead]
-    next_cursor: int | None
+    next_cursor: str | None
 
     model_config = ConfigDict(
         from_attributes=True,
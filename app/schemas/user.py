@@ -37,8 +37,9 @@ class UserRead(CreateUpdateDictModel):
 
 
 class UserListRead(BaseModel):
-    total: int
+    total: int | None
     users: list[UserRead]
+    next_cursor: str | None = None
 
 
 class MyInfoRead(UserRead):
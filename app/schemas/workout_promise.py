@@ -206,12 +206,20 @@ class BaseListResponse(BaseModel):
 
 class WorkoutPromiseListResponse(BaseListResponse):
     items: list[WorkoutPromiseRead]
-    next_cursor: int | None
+    next_cursor: str | None
 
     model_config = ConfigDict(
         from_attributes=True,
     )
 
 
+class WorkoutPromiseNearRead(WorkoutPromiseRead):
+    distance_m: float
+
+
+class WorkoutPromiseNearListResponse(BaseModel):
+    items: list[WorkoutPromiseNearRead]
+
+
 WorkoutPromiseRead.model_rebuild()
 WorkoutParticipantRead.model_rebuild()
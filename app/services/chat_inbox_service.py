@@ -0,0 +1,73 @@
+from typing import Sequence
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat import ChatRoom, ChatRoomMember
+
+_chat_room = ChatRoom.__table__
+_chat_room_member = ChatRoomMember.__table__
+
+# executemany statements: parameter names must not be column names, those would be added to SET
+# updated_at is kept, the projection is not an edit of the room/member
+_advance_last_message = (
+    update(_chat_room)
+    .where(
+        _chat_room.c.id == bindparam("room_id"),
+        or_(
+            _chat_room.c.last_message_created_at.is_(None),
+            _chat_room.c.last_message_created_at < bindparam("message_created_at"),
+        ),
+    )
+    .values(
+        last_message_id=bindparam("message_id"),
+        last_message_text=bindparam("text"),
+        last_message_created_at=bindparam("message_created_at"),
+        updated_at=_chat_room.c.updated_at,
+    )
+)
+_increment_unread = (
+    update(_chat_room_member)
+    .where(
+        _chat_room_member.c.chat_room_id == bindparam("room_id"),
+        _chat_room_member.c.user_id != bindparam("sender_id"),
+        _chat_room_member.c.last_read_at < bindparam("message_created_at"),
+    )
+    .values(unread_count=_chat_room_member.c.unread_count + 1, updated_at=_chat_room_member.c.updated_at)
+)
+
+
+async def project_messages(session: AsyncSession, messages: Sequence[dict]) -> None:
+    """
+    advance the inbox projection with message rows inserted in the current transaction:
+    last message of each room, unread count of every other member that has not read past the message
+    """
+    if not messages:
+        return
+    latest: dict = {}
+    for message in messages:
+        current = latest.get(message["chat_room_id"])
+        if current is None or message["created_at"] > current["created_at"]:
+            latest[message["chat_room_id"]] = message
+
+    # rows are locked in room order so concurrent flushes cannot deadlock
+    conn = await session.connection()
+    await conn.execute(
+        _advance_last_message,
+        [
+            {
+                "room_id": m["chat_room_id"],
+                "message_id": m["id"],
+                "text": m["text"],
+                "message_created_at": m["created_at"],
+            }
+            for m in sorted(latest.values(), key=lambda m: str(m["chat_room_id"]))
+        ],
+    )
+    await conn.execute(
+        _increment_unread,
+        [
+            {"room_id": m["chat_room_id"], "sender_id": m["user_id"], "message_created_at": m["created_at"]}
+            for m in sorted(messages, key=lambda m: (str(m["chat_room_id"]), m["created_at"]))
+        ],
+    )
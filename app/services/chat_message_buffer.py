@@ -0,0 +1,251 @@
+import asyncio
+from datetime import datetime, timezone
+import time
+import uuid
+
+import ujson
+from coredis.tokens import PureToken
+from pydantic import UUID4
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions.chat import InvalidChatMessage
+from app.core.helpers.redis import redis
+from app.models.chat import Message
+from app.services.chat_inbox_service import project_messages
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+
+# redis hash per worker of messages accepted but not yet persisted (message id -> row json),
+# one key per worker spreads the writes over the cluster
+MESSAGE_WAL_KEY = "chat-message-wal"
+# WAL key -> last heartbeat of the worker that owns it
+MESSAGE_WAL_OWNERS_KEY = "chat-message-wal-owners"
+FLUSH_INTERVAL_MS = 200
+FLUSH_MAX_MESSAGES = 500
+HEARTBEAT_INTERVAL = 10
+# a WAL without heartbeat for this long belongs to a dead worker and is replayed by another one
+WAL_STALE_AFTER = 60
+RECOVERY_INTERVAL = 30
+# only one worker recovers per interval
+RECOVERY_LOCK_KEY = "chat-message-wal-recovery-lock"
+MESSAGE_MAX_LENGTH = Message.__table__.c.text.type.length
+# errors of the row itself, retrying can not fix them
+ROW_ERRORS = (DataError, IntegrityError)
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for chat messages.
+
+    `append` assigns the id and timestamps right away so the message can be published
+    before it reaches postgres. Buffered rows are written with one multi-row INSERT every
+    `flush_interval_ms` or as soon as `flush_max_messages` are pending.
+
+    Durability: a message is only acknowledged after it is recorded in the redis hash of this
+    worker (`wal_key`), and removed from it after its INSERT commits. The worker heartbeats
+    its hash in `MESSAGE_WAL_OWNERS_KEY`; `recover` runs periodically on one worker at a time
+    and replays the hashes whose owner stopped heartbeating, so the messages of a crashed
+    worker are persisted within a minute or two instead of at the next restart. Inserts use
+    ON CONFLICT DO NOTHING on the primary key, so replaying is idempotent. If redis is not
+    reachable the message is written synchronously instead.
+
+    The inbox projection (last message per room, unread count per member) is advanced in the
+    same transaction, with only the rows the INSERT added, so a replay does not count twice.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = FLUSH_INTERVAL_MS,
+        flush_max_messages: int = FLUSH_MAX_MESSAGES,
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_messages = flush_max_messages
+        self.rows: list[dict] = []
+        self.flush_lock = asyncio.Lock()
+        self.full = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.recovery_task: asyncio.Task | None = None
+        self.token = str(uuid.uuid4())
+        self.wal_key = f"{MESSAGE_WAL_KEY}:{self.token}"
+        self.last_heartbeat = 0.0
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.flush_loop())
+
+    def start_recovery(self) -> None:
+        if self.recovery_task is None or self.recovery_task.done():
+            self.recovery_task = asyncio.create_task(self.recovery_loop())
+
+    async def heartbeat(self) -> None:
+        """mark the WAL of this worker as alive, at most once per interval"""
+        now = time.time()
+        if now - self.last_heartbeat >= HEARTBEAT_INTERVAL:
+            await redis.zadd(MESSAGE_WAL_OWNERS_KEY, {self.wal_key: now})
+            self.last_heartbeat = now
+
+    async def append(self, user_id: UUID4, chat_room_id: UUID4, text: str) -> Message:
+        """raises InvalidChatMessage before anything is recorded if postgres would reject the text"""
+        # checked up front, the message is acknowledged and delivered long before it is inserted
+        if not isinstance(text, str) or len(text) > MESSAGE_MAX_LENGTH:
+            raise InvalidChatMessage
+        now = datetime.now(timezone.utc)
+        row = {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "chat_room_id": chat_room_id,
+            "text": text,
+            "created_at": now,
+            "updated_at": now,
+        }
+        try:
+            # registered before the first write, so a crash right after it is still recovered
+            await self.heartbeat()
+            await redis.hset(self.wal_key, {str(row["id"]): dump_row(row)})
+        except Exception as e:
+            logger.warning(f"Message WAL write failed, writing through: {e}")
+            await self.write([row])
+            return Message(**row)
+
+        self.start()
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_max_messages:
+            self.full.set()
+        return Message(**row)
+
+    async def flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            try:
+                if self.rows:
+                    await self.heartbeat()
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Message flush failed: {e}")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            if not self.rows:
+                return
+            rows, self.rows = self.rows, []
+            try:
+                await self.write(rows)
+            except Exception:
+                # keep the rows (they are still in the WAL) and retry on the next tick
+                self.rows = rows + self.rows
+                raise
+            try:
+                await redis.hdel(self.wal_key, [str(row["id"]) for row in rows])
+            except Exception as e:
+                logger.warning(f"Message WAL cleanup failed: {e}")
+
+    async def write(self, rows: list[dict]) -> None:
+        """
+        insert rows, dropping those postgres rejects (e.g. chat room deleted meanwhile); other
+        errors (connection, timeout) are raised and the rows are retried
+        """
+        async with transactional_session_factory() as session:
+            try:
+                await insert_messages(session, rows)
+                await session.commit()
+                return
+            except ROW_ERRORS as e:
+                await session.rollback()
+                if len(rows) == 1:
+                    logger.error(f"Dropping message {rows[0]['id']}: {e}")
+                    return
+                logger.warning(f"Batch message insert failed, retrying one by one: {e}")
+
+            # one bad row must not block the rest of the batch
+            for row in rows:
+                try:
+                    await insert_messages(session, [row])
+                    await session.commit()
+                except ROW_ERRORS as e:
+                    await session.rollback()
+                    logger.error(f"Dropping message {row['id']}: {e}")
+
+    async def recovery_loop(self) -> None:
+        while True:
+            try:
+                if await redis.set(RECOVERY_LOCK_KEY, self.token, ex=RECOVERY_INTERVAL, condition=PureToken.NX):
+                    await self.recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Message WAL recovery failed: {e}")
+            await asyncio.sleep(RECOVERY_INTERVAL)
+
+    async def recover(self) -> None:
+        """replay the WALs of workers that stopped heartbeating (crashed or shut down mid-flush)"""
+        stale = await redis.zrangebyscore(MESSAGE_WAL_OWNERS_KEY, "-inf", time.time() - WAL_STALE_AFTER)
+        for wal_key in (key.decode() for key in stale):
+            if wal_key != self.wal_key:
+                await self.replay(wal_key)
+
+    async def replay(self, wal_key: str) -> None:
+        pending = await redis.hgetall(wal_key)
+        if pending:
+            rows = [load_row(value) for value in pending.values()]
+            logger.info(f"Recovering {len(rows)} buffered chat messages of {wal_key}")
+            rows.sort(key=lambda row: row["created_at"])
+            for i in range(0, len(rows), self.flush_max_messages):
+                chunk = rows[i : i + self.flush_max_messages]
+                await self.write(chunk)
+                await redis.hdel(wal_key, [str(row["id"]) for row in chunk])
+        # an owner that was only stalled heartbeats again and is registered anew
+        if not await redis.hlen(wal_key):
+            await redis.zrem(MESSAGE_WAL_OWNERS_KEY, [wal_key])
+
+    async def close(self) -> None:
+        """flush everything that is buffered and stop the flush and recovery loops"""
+        for task in (self.task, self.recovery_task):
+            if task is not None:
+                task.cancel()
+        self.task = self.recovery_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # replayed by another worker once the heartbeat of this one is stale
+            logger.error(f"Message flush on shutdown failed, rows stay in WAL: {e}")
+
+
+async def insert_messages(session: AsyncSession, rows: list[dict]) -> None:
+    """insert message rows and advance the inbox projection with the ones that were not there yet"""
+    stmt = insert(Message).on_conflict_do_nothing(index_elements=[Message.id]).returning(Message.id)
+    inserted = set((await session.scalars(stmt, rows)).all())
+    await project_messages(session, [row for row in rows if row["id"] in inserted])
+
+
+def dump_row(row: dict) -> str:
+    return ujson.dumps(
+        {
+            **row,
+            "id": str(row["id"]),
+            "user_id": str(row["user_id"]),
+            "chat_room_id": str(row["chat_room_id"]),
+            "created_at": row["created_at"].isoformat(),
+            "updated_at": row["updated_at"].isoformat(),
+        }
+    )
+
+
+def load_row(value: str | bytes) -> dict:
+    row = ujson.loads(value)
+    return {
+        **row,
+        "id": uuid.UUID(row["id"]),
+        "user_id": uuid.UUID(row["user_id"]),
+        "chat_room_id": uuid.UUID(row["chat_room_id"]),
+        "created_at": datetime.fromisoformat(row["created_at"]),
+        "updated_at": datetime.fromisoformat(row["updated_at"]),
+    }
+
+
+message_buffer = MessageWriteBuffer()
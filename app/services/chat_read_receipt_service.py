@@ -0,0 +1,159 @@
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+import ujson
+from pydantic import UUID4
+from sqlalchemy import bindparam, func, select, update
+
+from app.core.helpers.cache import Cache, CacheTag
+from app.core.helpers.pubsub import chat_hub
+from app.models.chat import ChatRoomMember, Message
+from app.models.guid import GUID
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+
+FLUSH_INTERVAL_MS = 1000
+READ_RECEIPT_TYPE = "read_receipt"
+
+_chat_room_member = ChatRoomMember.__table__
+_message = Message.__table__
+
+# executemany statement, parameter names must not be column names (those would be added to SET)
+# read positions only move forward, so flushes of several workers can interleave
+_update_read_position = (
+    update(_chat_room_member)
+    .where(
+        _chat_room_member.c.chat_room_id == bindparam("room_id"),
+        _chat_room_member.c.user_id == bindparam("member_user_id"),
+        _chat_room_member.c.last_read_at < bindparam("read_at"),
+    )
+    .values(
+        last_read_at=bindparam("read_at"),
+        last_read_message_id=func.coalesce(
+            bindparam("message_id", type_=GUID), _chat_room_member.c.last_read_message_id
+        ),
+        # messages written after the read position was taken stay unread
+        unread_count=select(func.count())
+        .where(
+            _message.c.chat_room_id == _chat_room_member.c.chat_room_id,
+            _message.c.created_at > bindparam("read_at"),
+            _message.c.user_id.is_distinct_from(_chat_room_member.c.user_id),
+        )
+        .scalar_subquery(),
+        updated_at=_chat_room_member.c.updated_at,
+    )
+)
+
+
+@dataclass(slots=True)
+class ReadReceiptDataClass:
+    chat_room_id: str
+    user_id: str
+    message_id: str | None
+    read_at: str
+    type: str = READ_RECEIPT_TYPE
+
+
+@dataclass(slots=True)
+class ReadPosition:
+    read_at: datetime
+    message_id: UUID4 | None
+
+
+class ReadReceiptBuffer:
+    """
+    Coalesces read positions of chat room members in memory.
+
+    `mark_read` broadcasts the receipt to the room right away and keeps only the latest
+    position per member; positions are written with one batched UPDATE every
+    `flush_interval_ms`. A position lost with the process only makes a few messages
+    show as unread again.
+    """
+
+    def __init__(self, flush_interval_ms: int = FLUSH_INTERVAL_MS):
+        self.flush_interval = flush_interval_ms / 1000
+        # (chat room id, user id) -> latest read position
+        self.positions: dict[tuple[UUID4, UUID4], ReadPosition] = {}
+        self.flush_lock = asyncio.Lock()
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.flush_loop())
+
+    async def mark_read(
+        self,
+        chat_room_id: UUID4,
+        user_id: UUID4,
+        message_id: UUID4 | None = None,
+        read_at: datetime | None = None,
+    ) -> None:
+        read_at = read_at or datetime.now(timezone.utc)
+        key = (chat_room_id, user_id)
+        current = self.positions.get(key)
+        if current is None or current.read_at < read_at:
+            self.positions[key] = ReadPosition(read_at, message_id or (current.message_id if current else None))
+        self.start()
+
+        receipt = ReadReceiptDataClass(
+            chat_room_id=str(chat_room_id),
+            user_id=str(user_id),
+            message_id=str(message_id) if message_id else None,
+            read_at=read_at.isoformat(),
+        )
+        try:
+            await chat_hub.publish(str(chat_room_id), ujson.dumps(asdict(receipt)))
+        except Exception as e:
+            logger.warning(f"Read receipt broadcast failed: {e}")
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Read receipt flush failed: {e}")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            if not self.positions:
+                return
+            positions, self.positions = self.positions, {}
+            params = [
+                {
+                    "room_id": room_id,
+                    "member_user_id": user_id,
+                    "read_at": position.read_at,
+                    "message_id": position.message_id,
+                }
+                # rows are locked in a fixed order so concurrent flushes cannot deadlock
+                for (room_id, user_id), position in sorted(positions.items(), key=lambda item: str(item[0]))
+            ]
+            try:
+                async with transactional_session_factory() as session:
+                    conn = await session.connection()
+                    await conn.execute(_update_read_position, params)
+                    await session.commit()
+            except Exception:
+                # keep positions that were not overtaken meanwhile, retry on the next tick
+                for key, position in positions.items():
+                    current = self.positions.get(key)
+                    if current is None or current.read_at < position.read_at:
+                        self.positions[key] = position
+                raise
+        # unread counts of the members' room lists
+        await Cache.invalidate(*{CacheTag.CHAT_ROOM_MEMBER.of(user_id) for _, user_id in positions})
+
+    async def close(self) -> None:
+        """write pending read positions and stop the flush loop"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Read receipt flush on shutdown failed: {e}")
+
+
+read_receipts = ReadReceiptBuffer()
@@ -0,0 +1,150 @@
+import time
+from dataclasses import asdict, dataclass, field
+
+import ujson
+from pydantic import UUID4
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.helpers.redis import redis
+from app.models.chat import ChatRoomMember
+from app.models.user import User, user_block_list
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+
+ROSTER_KEY_PREFIX = "chat-roster"
+# incremented by every invalidation of a room, a roster loaded while it changed is not kept
+ROSTER_VERSION_KEY_PREFIX = "chat-roster-version"
+# redis copy is shared by every worker, the local copy only absorbs bursts in a busy room
+ROSTER_REDIS_TTL = 60 * 10
+ROSTER_LOCAL_TTL = 10
+ROSTER_LOCAL_MAX_SIZE = 10000
+
+
+@dataclass(slots=True)
+class RoomRoster:
+    """Members of a chat room with what is needed to fan out a message (usernames, push tokens, blocks)."""
+
+    member_ids: list[str]
+    usernames: dict[str, str] = field(default_factory=dict)
+    fcm_tokens: dict[str, str] = field(default_factory=dict)
+    # member id -> ids of other members that this member has blocked
+    blocked: dict[str, list[str]] = field(default_factory=dict)
+
+    def push_tokens(self, sender_id: UUID4 | str) -> list[str]:
+        """return push tokens of every member except the sender and members who blocked the sender"""
+        sender = str(sender_id)
+        return [
+            token
+            for member_id, token in self.fcm_tokens.items()
+            if member_id != sender and sender not in self.blocked.get(member_id, ())
+        ]
+
+
+_local_rosters: dict[str, tuple[float, RoomRoster]] = {}
+
+
+def _roster_key(room_id: UUID4 | str) -> str:
+    return f"{ROSTER_KEY_PREFIX}::{room_id}"
+
+
+def _roster_version_key(room_id: UUID4 | str) -> str:
+    return f"{ROSTER_VERSION_KEY_PREFIX}::{room_id}"
+
+
+async def load_room_roster(room_id: UUID4 | str, session: AsyncSession) -> RoomRoster:
+    """load roster of chat room from db"""
+    result = await session.execute(
+        select(User.id, User.username, User.fcm_token)
+        .join(ChatRoomMember, ChatRoomMember.user_id == User.id)
+        .where(ChatRoomMember.chat_room_id == room_id)
+    )
+    roster = RoomRoster(member_ids=[])
+    for user_id, username, fcm_token in result.all():
+        uid = str(user_id)
+        roster.member_ids.append(uid)
+        roster.usernames[uid] = username
+        if fcm_token:
+            roster.fcm_tokens[uid] = fcm_token
+
+    if len(roster.member_ids) > 1:
+        blocks = await session.execute(
+            select(user_block_list.c.user_id, user_block_list.c.blocked_user_id).where(
+                user_block_list.c.user_id.in_(roster.member_ids),
+                user_block_list.c.blocked_user_id.in_(roster.member_ids),
+            )
+        )
+        for user_id, blocked_user_id in blocks.all():
+            roster.blocked.setdefault(str(user_id), []).append(str(blocked_user_id))
+    return roster
+
+
+async def get_room_roster(room_id: UUID4 | str, session: AsyncSession | None = None) -> RoomRoster:
+    """
+    return roster of chat room from local cache, then redis, then db
+    without a session, a short-lived one is opened only on a cache miss
+    """
+    key = _roster_key(room_id)
+    now = time.monotonic()
+    local = _local_rosters.get(key)
+    if local and local[0] > now:
+        return local[1]
+
+    roster, version = None, None
+    try:
+        cached = await redis.get(key)
+        if cached:
+            roster = RoomRoster(**ujson.loads(cached))
+        else:
+            version = await redis.get(_roster_version_key(room_id))
+    except Exception as e:
+        logger.warning(f"Chat roster cache read failed: {e}")
+
+    if roster is None:
+        if session is None:
+            async with transactional_session_factory() as session:
+                roster = await load_room_roster(room_id, session)
+        else:
+            roster = await load_room_roster(room_id, session)
+        try:
+            await redis.set(key, ujson.dumps(asdict(roster)), ex=ROSTER_REDIS_TTL)
+            # checked after the write: an invalidation from now on deletes it, one before is seen here
+            if await redis.get(_roster_version_key(room_id)) != version:
+                await redis.delete([key])
+                return roster
+        except Exception as e:
+            logger.warning(f"Chat roster cache write failed: {e}")
+
+    if len(_local_rosters) >= ROSTER_LOCAL_MAX_SIZE:
+        for expired in [k for k, (expires_at, _) in _local_rosters.items() if expires_at <= now]:
+            del _local_rosters[expired]
+    _local_rosters[key] = (now + ROSTER_LOCAL_TTL, roster)
+    return roster
+
+
+async def invalidate_room_rosters(*room_ids: UUID4 | str) -> None:
+    keys = [_roster_key(room_id) for room_id in room_ids]
+    if not keys:
+        return
+    for key in keys:
+        _local_rosters.pop(key, None)
+    try:
+        # keys live in different slots, so delete them one by one
+        for room_id, key in zip(room_ids, keys):
+            # before the delete, so a roster loaded concurrently sees it
+            version_key = _roster_version_key(room_id)
+            await redis.incr(version_key)
+            await redis.expire(version_key, ROSTER_REDIS_TTL)
+            await redis.delete([key])
+    except Exception as e:
+        logger.warning(f"Chat roster cache invalidation failed: {e}")
+
+
+async def get_chat_room_ids_of_user(session: AsyncSession, user_id: UUID4) -> list[UUID4]:
+    result = await session.execute(select(ChatRoomMember.chat_room_id).where(ChatRoomMember.user_id == user_id))
+    return list(result.scalars().all())
+
+
+async def invalidate_rosters_of_user(session: AsyncSession, user_id: UUID4) -> None:
+    """invalidate rosters of every chat room the user is in"""
+    await invalidate_room_rosters(*await get_chat_room_ids_of_user(session, user_id))
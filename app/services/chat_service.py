@@ -1,5 +1,6 @@
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime
+from uuid import UUID
 from pydantic import UUID4
 from fastapi.websockets import WebSocketState
 
@@ -7,19 +8,22 @@ from sqlalchemy import delete, distinct, func, select, text
 from app.core.exceptions.chat import (
     ChatMemberNotFound,
     ChatRoomNotFound,
+    InvalidChatMessage,
     UserNotInChatRoom,
 )
 from app.models.chat import ChatRoom, ChatRoomMember, Message
 from app.models.user import User, user_block_list
 from app.services.fcm_service import send_message_to_multiple_devices_by_fcm_token_list
-from app.services.user_service import get_blocked_me_list
+from app.services.chat_message_buffer import message_buffer
+from app.services.chat_read_receipt_service import READ_RECEIPT_TYPE, ReadReceiptDataClass, read_receipts
+from app.services.chat_roster_service import get_room_roster, invalidate_room_rosters
 from app.utils.ecs_log import logger
+from app.utils.keyset_pagination import paginate_stmt, split_page
 import ujson
 from fastapi import HTTPException, WebSocket, WebSocketDisconnect
 
-from coredis import RedisCluster
-from coredis.commands import ShardedPubSub
-from app.core.helpers.redis import chat_redis as redis
+from app.core.helpers.cache import Cache, CacheTag
+from app.core.helpers.pubsub import ChatPubSubHub, chat_hub
 from dataclasses import asdict, dataclass
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -28,37 +32,49 @@ from app.core.conn import conn_manager
 
 
 # TODO: When Keyboard interrupt, close the connection. and task must be cancelled
+# ChatService holds no db session: a session is opened only for the query that needs it,
+# so idle websockets do not keep pooled connections checked out.
 class ChatService:
     def __init__(
         self,
         websocket: WebSocket,
         chat_room_id: UUID4,
         user_id: UUID4,
-        session: AsyncSession,
     ):
         super().__init__()
         self.ws: WebSocket = websocket
         self.chat_room_id = chat_room_id
         self.user_id = user_id
-        self.session = session
-        self.conn: RedisCluster = redis
-        self.pubsub: ShardedPubSub | None = None
+        self.hub: ChatPubSubHub = chat_hub
+        self.queue: asyncio.Queue | None = None
 
-    async def publish_handler(self, conn: RedisCluster):
+    async def publish_handler(self, hub: ChatPubSubHub):
         while True:
             try:
                 if self.ws.client_state == WebSocketState.CONNECTED:
                     m = await self.ws.receive_text()
                     message: dict = ujson.loads(m)
 
-                    if message:
-                        text = message["text"]
-                        msg = await post_chat_message(
-                            self.user_id,
-                            self.chat_room_id,
-                            text,
-                            self.session,
-                        )
+                    if message.get("type") == "read":
+                        # read receipt from the client: {"type": "read", "message_id": "..."}
+                        try:
+                            message_id = UUID(message["message_id"]) if message.get("message_id") else None
+                        except ValueError:
+                            continue
+                        await read_receipts.mark_read(self.chat_room_id, self.user_id, message_id)
+                    elif message:
+                        try:
+                            msg = await post_chat_message(
+                                self.user_id,
+                                self.chat_room_id,
+                                message.get("text"),
+                            )
+                        except InvalidChatMessage as e:
+                            # rejected to the sender only, nothing was recorded or published
+                            await self.ws.send_json(
+                                asdict(ChatErrorDataClass(error_code=e.error_code, message=e.message)), mode="text"
+                            )
+                            continue
 
                         msg_data = ChatMessageDataClass(
                             id=msg.id.__str__(),
@@ -69,29 +85,22 @@ class ChatService:
                             type="text_message",
                         )
 
-                        await conn.spublish(
+                        await hub.publish(
                             self.chat_room_id.__str__(),
                             ujson.dumps(asdict(msg_data)),
                         )
 
-                        banned_set = await get_blocked_me_list(
-                            self.session,
-                            self.user_id,
-                        )
-                        banned_set.add(self.user_id)
-
-                        db_chat_room = await get_chat_room_and_members_by_id(self.chat_room_id, self.session)
-
-                        fcm_tokens = [
-                            member.user.fcm_token
-                            for member in db_chat_room.members
-                            if member.user.fcm_token and member.user.id not in banned_set
-                        ]
-                        title = msg.user.username
+                        roster = await get_room_roster(self.chat_room_id)
+                        fcm_tokens = roster.push_tokens(self.user_id)
+                        title = roster.usernames.get(msg_data.user_id, "")
                         body = msg.text
 
                         await send_message_to_multiple_devices_by_fcm_token_list(
-                            fcm_tokens, title, body, data=asdict(msg_data)
+                            fcm_tokens,
+                            title,
+                            body,
+                            data=asdict(msg_data),
+                            collapse_key=msg_data.chat_room_id,
                         )
                     else:
                         logger.warning("Websocket Connection State Changed")
@@ -101,22 +110,18 @@ class ChatService:
                 e.args += ("ChatService subscribe_handler",)
                 raise e
 
-    async def subscribe_handler(self, pubsub: ShardedPubSub):
-        await pubsub.subscribe(self.chat_room_id.__str__())
+    async def subscribe_handler(self, queue: asyncio.Queue):
         while True:
-            # FIXME: asyncio gather로 묶어서 task cancel이 안되는 문제가 있음
             try:
-                message = await pubsub.get_message()
-                if message and message.get("type") == "message":
-                    data_in_message = message.get("data", None)
-                    if isinstance((data_in_message), str) and data_in_message:
-                        data = ujson.loads(data_in_message)
-                        chat_message = ChatMessageDataClass(**data)
-                        await self.ws.send_json(asdict(chat_message), mode="text")
+                data_in_message = await queue.get()
+                data = ujson.loads(data_in_message)
+                if data.get("type") == READ_RECEIPT_TYPE:
+                    await self.ws.send_json(asdict(ReadReceiptDataClass(**data)), mode="text")
+                    continue
+                chat_message = ChatMessageDataClass(**data)
+                await self.ws.send_json(asdict(chat_message), mode="text")
             except asyncio.CancelledError as e:
                 logger.debug(f"Subscribe handler cancelled: {e}")
-                await pubsub.unsubscribe(self.chat_room_id.__str__())
-                pubsub.close()
                 raise e
 
             except Exception as e:
@@ -124,9 +129,9 @@ class ChatService:
                 raise e
 
     async def run(self):
-        self.pubsub: ShardedPubSub = self.conn.sharded_pubsub()
-        task_1 = asyncio.create_task(self.publish_handler(self.conn))
-        task_2 = asyncio.create_task(self.subscribe_handler(self.pubsub))
+        self.queue = await self.hub.subscribe(self.chat_room_id.__str__())
+        task_1 = asyncio.create_task(self.publish_handler(self.hub))
+        task_2 = asyncio.create_task(self.subscribe_handler(self.queue))
         tasks = [task_1, task_2]
         try:
             done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
@@ -142,9 +147,9 @@ class ChatService:
             logger.debug(f"Run exception: {e}")
             raise e
         finally:
-            if self.pubsub:
-                await self.pubsub.close()
-                del self.pubsub
+            if self.queue:
+                await self.hub.unsubscribe(self.chat_room_id.__str__(), self.queue)
+                del self.queue
             if self.ws:
                 del self.ws
 
@@ -159,6 +164,13 @@ class ChatMessageDataClass:
     text: str = "text"
 
 
+@dataclass(slots=True)
+class ChatErrorDataClass:
+    error_code: str
+    message: str
+    type: str = "error"
+
+
 async def get_user_mem_with_ids(
     user_id: UUID4,
     room_id: UUID4,
@@ -209,127 +221,79 @@ async def get_chat_room_by_id(chat_room_id: UUID4, session: AsyncSession):
     return chat_room
 
 
-# TODO
 async def get_chat_room_list_by_user_id(
-    session: AsyncSession, user_id: UUID4, limit: int, offset: int | None = None
-) -> tuple[int | None, list[ChatRoom]]:
-    """return all chat room that user is in"""
-
-    chat_rooms = (
-        select(ChatRoomMember.chat_room_id, ChatRoomMember.last_read_at)
-        .where(ChatRoomMember.user_id == user_id)
-        .cte("chat_rooms")
-    )
-
-    last_msg_created_time = (
-        select(
-            Message.chat_room_id,
-            func.max(Message.created_at).label("last_message_created_at"),
-        )
-        .where(
-            Message.chat_room_id == chat_rooms.c.chat_room_id,
-        )
-        .group_by(Message.chat_room_id)
-        .subquery()
-    )
-    last_msg = (
-        select(
-            Message.text.label("last_message_text"),
-            Message.created_at.label("last_message_created_at"),
-            Message.chat_room_id,
-        )
-        .where(
-            Message.chat_room_id == last_msg_created_time.c.chat_room_id,
-            Message.created_at == last_msg_created_time.c.last_message_created_at,
-        )
-        .subquery()
+    session: AsyncSession,
+    user_id: UUID4,
+    limit: int,
+    offset: int | None = None,
+    cursor: str | None = None,
+) -> tuple[int | None, list[ChatRoom], str | None]:
+    """
+    return (total, chat rooms that user is in, next_cursor), latest activity first
+    last message and unread count come from the inbox projection (see chat_inbox_service)
+    total is only counted for the first page
+    """
+    not_blocked = ChatRoom.admin_user_id.notin_(
+        select(user_block_list.c.blocked_user_id).where(user_block_list.c.user_id == user_id)
     )
-
+    # rooms without messages yet are placed by their creation
+    last_activity_at = func.coalesce(ChatRoom.last_message_created_at, ChatRoom.created_at)
     stmt = (
-        select(ChatRoom)
+        select(ChatRoom, ChatRoomMember.unread_count)
+        .join(ChatRoomMember, ChatRoomMember.chat_room_id == ChatRoom.id)
         .options(
             selectinload(ChatRoom.members).options(
                 selectinload(ChatRoomMember.user).load_only(User.id, User.username, User.profile_pic),
             )
         )
-        .join(
-            last_msg,
-            ChatRoom.id == last_msg.c.chat_room_id,
-            isouter=True,
-        )
-        .add_columns(last_msg.c.last_message_text, last_msg.c.last_message_created_at)
-        .order_by(last_msg.c.last_message_created_at.desc())
-        .where(
-            ChatRoom.id == chat_rooms.c.chat_room_id,
-            ChatRoom.admin_user_id.notin_(
-                select(user_block_list.c.blocked_user_id).where(user_block_list.c.user_id == user_id)
-            ),
-        )
-    )
-
-    unread_count = (
-        select(
-            Message.chat_room_id,
-            func.count("*").label("unread_count"),
-        )
-        .where(
-            Message.chat_room_id == chat_rooms.c.chat_room_id,
-            Message.created_at > chat_rooms.c.last_read_at,
-        )
-        .group_by(Message.chat_room_id)
-        .cte("unread_count")
-    )
-
-    stmt = stmt.add_columns(unread_count.c.unread_count).join(
-        unread_count, ChatRoom.id == unread_count.c.chat_room_id, isouter=True
+        .where(ChatRoomMember.user_id == user_id, not_blocked)
     )
-
-    total_stmt = (
-        select(func.count(ChatRoomMember.id))
-        .select_from(ChatRoomMember)
-        .join(
-            ChatRoom,
-            ChatRoomMember.chat_room_id == ChatRoom.id,
-        )
-        .where(
-            ChatRoomMember.user_id == user_id,
-            ChatRoom.admin_user_id.notin_(
-                select(user_block_list.c.blocked_user_id).where(user_block_list.c.user_id == user_id)
-            ),
+    stmt = paginate_stmt(stmt, last_activity_at, ChatRoom.id, limit, cursor, offset)
+
+    total = None
+    if not cursor:
+        total_stmt = (
+            select(func.count(ChatRoomMember.id))
+            .select_from(ChatRoomMember)
+            .join(
+                ChatRoom,
+                ChatRoomMember.chat_room_id == ChatRoom.id,
+            )
+            .where(ChatRoomMember.user_id == user_id, not_blocked)
         )
-    )
-
-    if offset:
-        stmt = stmt.offset(offset)
-    if limit:
-        stmt = stmt.limit(limit)
+        total = (await session.execute(total_stmt)).scalar_one()
 
-    total = await session.execute(total_stmt)
     result = await session.execute(stmt)
 
     out = []
     for row in result:
-        row.ChatRoom.last_message_text = row.last_message_text
-        row.ChatRoom.last_message_created_at = row.last_message_created_at
         row.ChatRoom.unread_count = row.unread_count
         out.append(row.ChatRoom)
 
-    return total.scalars().first(), out
+    items, next_cursor = split_page(
+        out, limit, key=lambda room: (room.last_message_created_at or room.created_at, room.id)
+    )
+    return total, items, next_cursor
 
 
 # public
-async def get_public_chat_room_list(session: AsyncSession, limit: int, offset: int | None = None):
-    """return all chat room that user is in"""
-    stmt = select(ChatRoom).order_by(ChatRoom.created_at.desc()).where(ChatRoom.is_private.is_(False))
-    total_stmt = select(func.count(ChatRoom.id)).select_from(ChatRoom).where(ChatRoom.is_private.is_(False))
-    if offset:
-        stmt = stmt.offset(offset)
-    if limit:
-        stmt = stmt.limit(limit)
-    total = await session.execute(total_stmt)
+async def get_public_chat_room_list(
+    session: AsyncSession,
+    limit: int,
+    offset: int | None = None,
+    cursor: str | None = None,
+) -> tuple[int | None, list[ChatRoom], str | None]:
+    """return (total, public chat rooms, next_cursor), latest first, total is only counted for the first page"""
+    stmt = select(ChatRoom).where(ChatRoom.is_private.is_(False))
+    stmt = paginate_stmt(stmt, ChatRoom.created_at, ChatRoom.id, limit, cursor, offset)
+    total = None
+    if not cursor:
+        total_stmt = select(func.count(ChatRoom.id)).select_from(ChatRoom).where(ChatRoom.is_private.is_(False))
+        total = (await session.execute(total_stmt)).scalar_one()
 
     result = await session.execute(stmt)
-    return total.scalars().first(), result.scalars().all()
+    items, next_cursor = split_page(result.scalars().all(), limit)
+    return total, items, next_cursor
 
 
 async def get_chat_room_member_by_user_and_room_id(
@@ -347,6 +311,8 @@ async def make_chat_room_member(user_id: UUID4, room_id: UUID4, session: AsyncSe
     chat_room_member = ChatRoomMember(user_id=user_id, chat_room_id=room_id)  # type: ignore
     session.add(chat_room_member)
     await session.commit()
+    await invalidate_room_rosters(room_id)
+    await Cache.invalidate(CacheTag.CHAT_ROOM_MEMBER.of(user_id), CacheTag.CHAT_ROOM.of(room_id))
     return chat_room_member
 
 
@@ -362,6 +328,8 @@ async def delete_chat_room_member_by_user_and_room_id(
     except Exception as e:
         logger.debug(f"Chat mem delete failed: {e}")
         raise ChatMemberNotFound
+    await invalidate_room_rosters(room_id)
+    await Cache.invalidate(CacheTag.CHAT_ROOM_MEMBER.of(user_id), CacheTag.CHAT_ROOM.of(room_id))
 
 
 async def delete_chat_room_by_id(room_id: str, session: AsyncSession):
@@ -369,6 +337,7 @@ async def delete_chat_room_by_id(room_id: str, session: AsyncSession):
 
     await session.execute(stmt, {"room_id": room_id})
     await session.commit()
+    await Cache.invalidate(CacheTag.CHAT_ROOM.of(room_id), CacheTag.GET_CHAT_ROOMS.of())
 
 
 async def get_chat_room_members(room_id: str, session: AsyncSession):
@@ -394,12 +363,9 @@ async def get_user_by_id(user_id: UUID4, session: AsyncSession) -> User:
     return usr
 
 
-async def post_chat_message(user_id: UUID4, room_id: UUID4, message: str, session: AsyncSession):
-    msg = Message(user_id=user_id, chat_room_id=room_id, text=message)  # type: ignore
-    session.add(msg)
-
-    await session.commit()
-    return msg
+async def post_chat_message(user_id: UUID4, room_id: UUID4, message: str) -> Message:
+    """return message with id and created_at assigned, it is persisted by the write-behind buffer"""
+    return await message_buffer.append(user_id, room_id, message)
 
 
 async def get_chat_messages(
@@ -408,37 +374,25 @@ async def get_chat_messages(
     created_at: datetime | None = None,
     limit: int = 10,
     offset: int = 0,
-):
+    cursor: str | None = None,
+) -> tuple[int | None, list[Message], str | None]:
+    """return (total, messages, next_cursor), total is only counted for the first page"""
     # last_read_at = None인 경우는 처음 메시지를 읽는 경우
-    stmt = (
-        select(Message)
-        .where(
-            Message.chat_room_id == room_id,
-            Message.created_at > created_at,
-        )
-        .order_by(Message.created_at.desc(), Message.id.desc())
+    stmt = select(Message).where(
+        Message.chat_room_id == room_id,
+        Message.created_at > created_at,
     )
-    total_stmt = select(func.count(Message.id)).where(Message.chat_room_id == room_id, Message.created_at > created_at)
-    total = await session.execute(total_stmt)
-    if offset:
-        stmt = stmt.offset(offset)
-    if limit:
-        stmt = stmt.limit(limit)
-
-    result = await session.execute(stmt)
-    return total.scalars().first(), result.scalars().all()
-
+    stmt = paginate_stmt(stmt, Message.created_at, Message.id, limit, cursor, offset)
+    total = None
+    if not cursor:
+        total_stmt = select(func.count(Message.id)).where(
+            Message.chat_room_id == room_id, Message.created_at > created_at
+        )
+        total = (await session.execute(total_stmt)).scalar_one()
 
-async def update_last_read_at_by_mem_id(session: AsyncSession, chat_room_member_id: str):
-    stmt = select(ChatRoomMember).where(ChatRoomMember.id == chat_room_member_id)
     result = await session.execute(stmt)
-    chat_room_member_obj = result.scalars().first()
-    if not chat_room_member_obj:
-        raise HTTPException(status_code=404, detail="Chat room member not found")
-
-    chat_room_member_obj.last_read_at = datetime.now(timezone.utc)
-
-    await session.commit()
+    items, next_cursor = split_page(result.scalars().all(), limit)
+    return total, items, next_cursor
 
 
 async def delete_chat_room_member_by_id(session: AsyncSession, chat_room_member_id: str, user_id: str):
@@ -449,12 +403,21 @@ async def delete_chat_room_member_by_id(session: AsyncSession, chat_room_member_
     #     stmt, {"chat_room_member_id": chat_room_member_id, "user_id": user_id}
     # )
     # await session.commit()
-    stmt = delete(ChatRoomMember).where(ChatRoomMember.id == chat_room_member_id, ChatRoomMember.user_id == user_id)
+    stmt = (
+        delete(ChatRoomMember)
+        .where(ChatRoomMember.id == chat_room_member_id, ChatRoomMember.user_id == user_id)
+        .returning(ChatRoomMember.chat_room_id)
+    )
     try:
-        await session.execute(stmt)
+        result = await session.execute(stmt)
+        room_ids = result.scalars().all()
         await session.commit()
     except NoResultFound:
         raise ChatMemberNotFound
+    await invalidate_room_rosters(*room_ids)
+    await Cache.invalidate(
+        CacheTag.CHAT_ROOM_MEMBER.of(user_id), *(CacheTag.CHAT_ROOM.of(room_id) for room_id in room_ids)
+    )
 
 
 async def delete_chat_room_member_admin_by_id(
@@ -464,9 +427,13 @@ async def delete_chat_room_member_admin_by_id(
     if not admin_mem.is_admin:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    stmt = text("DELETE FROM chat_room_members WHERE id = :chat_room_member_id")
-    await session.execute(stmt, {"chat_room_member_id": chat_room_member_id})
+    stmt = delete(ChatRoomMember).where(ChatRoomMember.id == chat_room_member_id).returning(ChatRoomMember.user_id)
+    user_ids = (await session.scalars(stmt)).all()
     await session.commit()
+    await invalidate_room_rosters(chat_room_id)
+    await Cache.invalidate(
+        CacheTag.CHAT_ROOM.of(chat_room_id), *(CacheTag.CHAT_ROOM_MEMBER.of(user_id) for user_id in user_ids)
+    )
 
 
 async def get_chat_message_by_id(session: AsyncSession, message_id: UUID4) -> Message:
@@ -8,12 +8,14 @@ from app.core.exceptions.base import (
     NotFoundException,
 )
 from app.core.exceptions.community import PostNotFound
+from app.core.helpers.cache import Cache, CacheTag
 from app.models.community import Comment, Post
 from app.schemas.community import CommentCreate, CommentUpdate, PostCreate, PostUpdate
 from app.repository.community import community, post, comment
 from sqlalchemy.exc import NoResultFound, IntegrityError
 
 from app.utils import aws
+from app.utils.keyset_pagination import split_page
 
 
 async def get_all_communities():
@@ -28,17 +30,24 @@ async def create_community(community_data: dict):
     return await community.create(community_data)
 
 
-async def get_posts_where_community_id(community_id: int | None, limit: int, offset: int, user_id: UUID4 | None):
+async def get_posts_where_community_id(
+    community_id: int | None, limit: int, offset: int, user_id: UUID4 | None, cursor: str | None = None
+):
     try:
-        total, posts = await asyncio.gather(
-            post.count_where_community_id(community_id),
-            post.get_list_with_like_cnt_comment_cnt_where_community_id(community_id, limit, offset, user_id),
-        )
+        if cursor:
+            total, posts = None, await post.get_list_with_like_cnt_comment_cnt_where_community_id(
+                community_id, limit, offset, user_id, cursor=cursor
+            )
+        else:
+            total, posts = await asyncio.gather(
+                post.count_where_community_id(community_id),
+                post.get_list_with_like_cnt_comment_cnt_where_community_id(community_id, limit, offset, user_id),
+            )
 
     except NoResultFound as e:
         raise NotFoundException("Community not found") from e
 
-    next_cursor = offset + len(posts) if total and total > offset + len(posts) else None
+    posts, next_cursor = split_page(posts, limit)
     return total, posts, next_cursor
 
 
@@ -59,6 +68,7 @@ async def create_post(user_id: UUID4, post_data: PostCreate, images: list[Upload
 
             post_obj = await post.update_where_id(post_obj.id, {"image": image_urls})
 
+        await Cache.remove_by_tag(CacheTag.GET_POSTS)
         return post_obj
     except IntegrityError as e:
         raise BadRequestException(str(e.orig)) from e
@@ -109,7 +119,7 @@ async def update_post_where_id(id: int, user_id: UUID4, post_data: PostUpdate, i
         id,
         post_dict,
     )
-    new_post_obj.like_cnt = post_obj.like_cnt
+    await Cache.invalidate(CacheTag.POST.of(id))
     return new_post_obj
 
 
@@ -122,32 +132,42 @@ async def delete_post_where_id(id: int, user_id: UUID4):
         raise ForbiddenException("You are not authorized to delete this post")
 
     await post.delete_where_id(id)
+    await Cache.invalidate(CacheTag.POST.of(id), CacheTag.GET_POSTS.of())
 
 
 async def create_or_update_post_like(post_id: int, user_id: UUID4, like: int):
     await post.create_or_update_like(post_id, user_id, like)
+    await Cache.invalidate(CacheTag.POST.of(post_id))
     return await get_post_with_like_cnt_where_id(post_id, user_id)
 
 
 async def delete_post_like(post_id: int, user_id: UUID4):
     try:
         await post.delete_like_where_post_id_and_user_id(post_id, user_id)
+        await Cache.invalidate(CacheTag.POST.of(post_id))
         return await get_post_with_like_cnt_where_id(post_id, user_id)
     except NoResultFound as e:
         raise PostNotFound from e
 
 
-async def get_comments_where_post_id(post_id: int, user_id: UUID4 | None, limit: int, offset: int):
+async def get_comments_where_post_id(
+    post_id: int, user_id: UUID4 | None, limit: int, offset: int, cursor: str | None = None
+):
     try:
-        total, comments = await asyncio.gather(
-            comment.count_where_post_id(post_id),
-            comment.get_list_with_like_cnt_where_post_id(post_id, user_id, limit, offset),
-        )
+        if cursor:
+            total, comments = None, await comment.get_list_with_like_cnt_where_post_id(
+                post_id, user_id, limit, offset, cursor=cursor
+            )
+        else:
+            total, comments = await asyncio.gather(
+                comment.count_where_post_id(post_id),
+                comment.get_list_with_like_cnt_where_post_id(post_id, user_id, limit, offset),
+            )
 
     except NoResultFound as e:
         raise NotFoundException("Post not found") from e
 
-    next_cursor = offset + len(comments) if total and total > offset + len(comments) else None
+    comments, next_cursor = split_page(comments, limit)
     return total, comments, next_cursor
 
 
@@ -156,6 +176,7 @@ async def create_comment(user_id: UUID4, comment_data: CommentCreate):
     comment_["user_id"] = user_id
     try:
         cmt_obj = await comment.create(comment_)
+        await Cache.invalidate(CacheTag.POST.of(cmt_obj.post_id))
         return cmt_obj
     except IntegrityError as e:
         raise BadRequestException(str(e.orig)) from e
@@ -174,12 +195,14 @@ async def update_comment_where_id(id: int, user_id: UUID4, comment_data: Comment
     if comment_obj.user_id != user_id:
         raise ForbiddenException("You are not authorized to update this comment")
 
-    return await comment.update_where_id(
+    comment_obj = await comment.update_where_id(
         id,
         comment_data.dict(
             exclude_unset=True,
         ),
     )
+    await Cache.invalidate(CacheTag.POST.of(comment_obj.post_id))
+    return comment_obj
 
 
 async def delete_comment_where_id(id: int, user_id: UUID4):
@@ -191,12 +214,15 @@ async def delete_comment_where_id(id: int, user_id: UUID4):
         raise ForbiddenException("You are not authorized to delete this post")
 
     await comment.delete_where_id(id)
+    await Cache.invalidate(CacheTag.POST.of(comment_obj.post_id))
 
 
 async def create_or_update_comment_like(comment_id: int, user_id: UUID4, like: int):
     try:
         await comment.create_or_update_like(comment_id, user_id, like)
-        return await get_comment_with_like_cnt_where_id(comment_id, user_id)
+        comment_obj = await get_comment_with_like_cnt_where_id(comment_id, user_id)
+        await Cache.invalidate(CacheTag.POST.of(comment_obj.post_id))
+        return comment_obj
     except IntegrityError as e:
         raise BadRequestException(str(e.orig)) from e
 
@@ -204,6 +230,8 @@ async def create_or_update_comment_like(comment_id: int, user_id: UUID4, like: i
 async def delete_comment_like(comment_id: int, user_id: UUID4):
     try:
         await comment.delete_like_where_comment_id_and_user_id(comment_id, user_id)
-        return await get_comment_with_like_cnt_where_id(comment_id, user_id)
+        comment_obj = await get_comment_with_like_cnt_where_id(comment_id, user_id)
+        await Cache.invalidate(CacheTag.POST.of(comment_obj.post_id))
+        return comment_obj
     except NoResultFound as e:
         raise NotFoundException("Like not found") from e
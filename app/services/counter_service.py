@@ -0,0 +1,122 @@
+import asyncio
+import uuid
+
+from coredis.tokens import PureToken
+from sqlalchemy import ColumnElement, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.models.community import Comment, CommentLike, Post, PostLike
+from app.ai.models import AiCoaching, AiCoachingLike
+from app.core.helpers.redis import redis
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+
+RECONCILE_INTERVAL = 60 * 60
+RECONCILE_BATCH_SIZE = 10000
+# only one worker reconciles per interval
+RECONCILE_LOCK_KEY = "counter-reconcile-lock"
+
+
+def _counters() -> list[tuple[InstrumentedAttribute, InstrumentedAttribute, ColumnElement]]:
+    """(pk, counter column, correlated expression of the true count)"""
+    return [
+        (
+            Post.id,
+            Post.like_cnt,
+            select(func.count(PostLike.id))
+            .where(PostLike.post_id == Post.id, PostLike.is_liked == 1)
+            .scalar_subquery(),
+        ),
+        (
+            Post.id,
+            Post.comment_cnt,
+            select(func.count(Comment.id))
+            .where(Comment.post_id == Post.id, Comment.available == True)
+            .scalar_subquery(),
+        ),
+        (
+            Comment.id,
+            Comment.like_cnt,
+            select(func.count(CommentLike.id))
+            .where(CommentLike.comment_id == Comment.id, CommentLike.is_liked == 1)
+            .scalar_subquery(),
+        ),
+        (
+            AiCoaching.id,
+            AiCoaching.like_cnt,
+            select(func.count(AiCoachingLike.id))
+            .where(AiCoachingLike.ai_coaching_id == AiCoaching.id, AiCoachingLike.is_liked == 1)
+            .scalar_subquery(),
+        ),
+    ]
+
+
+async def reconcile_counter(
+    session: AsyncSession,
+    pk: InstrumentedAttribute,
+    counter: InstrumentedAttribute,
+    actual: ColumnElement,
+    batch_size: int = RECONCILE_BATCH_SIZE,
+) -> int:
+    """
+    rewrite counter where it drifted from the true count, one pk range per transaction
+    return number of fixed rows
+    """
+    max_id = (await session.execute(select(func.max(pk)))).scalar_one_or_none()
+    fixed = 0
+    for start in range(0, (max_id or 0) + 1, batch_size):
+        stmt = (
+            update(pk.class_)
+            .where(pk >= start, pk < start + batch_size, counter != actual)
+            .values({counter.key: actual, "updated_at": pk.class_.updated_at})
+            .execution_options(synchronize_session=False)
+        )
+        res = await session.execute(stmt)
+        await session.commit()
+        fixed += res.rowcount
+    return fixed
+
+
+async def reconcile_counters() -> dict[str, int]:
+    """fix drift of every denormalized like/comment counter"""
+    result = {}
+    async with transactional_session_factory() as session:
+        for pk, counter, actual in _counters():
+            name = f"{pk.class_.__tablename__}.{counter.key}"
+            result[name] = await reconcile_counter(session, pk, counter, actual)
+            if result[name]:
+                logger.warning(f"Reconciled {result[name]} rows of {name}")
+    return result
+
+
+class CounterReconciler:
+    """Runs `reconcile_counters` every `interval` seconds on whichever worker takes the redis lock."""
+
+    def __init__(self, interval: int = RECONCILE_INTERVAL):
+        self.interval = interval
+        self.token = str(uuid.uuid4())
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.loop())
+
+    async def loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await redis.set(RECONCILE_LOCK_KEY, self.token, ex=self.interval, condition=PureToken.NX):
+                    await reconcile_counters()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Counter reconciliation failed: {e}")
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+counter_reconciler = CounterReconciler()
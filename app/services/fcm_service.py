@@ -1,6 +1,9 @@
+import asyncio
+from dataclasses import dataclass, field
+import random
 import uuid
 import firebase_admin
-from firebase_admin import messaging
+from firebase_admin import exceptions as firebase_exceptions, messaging
 from pydantic import UUID4
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -23,9 +26,9 @@ async def subscribe_fcm_token_to_topic(db: AsyncSession, user_id: uuid.UUID, top
 
     try:
         response = messaging.subscribe_to_topic(user.fcm_token, topic)
-        logger.debug("Successfully subscribed to topic:", response)
+        logger.debug("Successfully subscribed to topic: %s", response)
     except Exception as e:
-        logger.debug("Error subscribing to topic:", e)
+        logger.debug("Error subscribing to topic: %s", e)
 
 
 async def send_message_to_single_device_by_fcm_token(
@@ -170,10 +173,31 @@ async def send_message_to_multiple_devices_by_fcm_token_list(
     title: str,
     body: str,
     data: dict[str, str] | None = None,
+    collapse_key: str | None = None,
 ):
+    """Enqueue a multicast push. Delivery happens in the background (see `FCMDispatcher`)."""
     if len(tokens) == 0:
         return
 
+    fcm_dispatcher.enqueue(tokens, title, body, data, collapse_key=collapse_key)
+
+
+# FCM multicast 한 번에 보낼 수 있는 최대 토큰 수
+FCM_MULTICAST_LIMIT = 500
+RETRYABLE_FCM_ERRORS = (
+    firebase_exceptions.UnavailableError,
+    firebase_exceptions.InternalError,
+    firebase_exceptions.DeadlineExceededError,
+    messaging.QuotaExceededError,
+)
+
+
+def build_multicast_message(
+    tokens: list[str],
+    title: str,
+    body: str,
+    data: dict[str, str] | None = None,
+) -> messaging.MulticastMessage:
     apns = messaging.APNSConfig(
         headers={"apns-priority": "10"},
         payload=messaging.APNSPayload(
@@ -196,18 +220,169 @@ async def send_message_to_multiple_devices_by_fcm_token_list(
     if data is None:
         data = {}
 
-    message = messaging.MulticastMessage(
+    return messaging.MulticastMessage(
         notification=messaging.Notification(title=title, body=body),
         tokens=tokens,
         data=data,
         apns=apns,
         android=android,
     )
-    try:
-        response = messaging.send_multicast(message)
-        logger.debug(f"Successfully sent message: {response}")
-    except Exception as e:
-        logger.debug(f"Error sending message: {e}")
+
+
+@dataclass(slots=True)
+class PushJob:
+    tokens: list[str]
+    title: str
+    body: str
+    data: dict[str, str] = field(default_factory=dict)
+    # pushes with the same collapse key replace each other per recipient (e.g. chat room id)
+    collapse_key: str | None = None
+    attempt: int = 0
+
+
+class FCMDispatcher:
+    """
+    In-process push pipeline.
+
+    Pushes are put on an asyncio queue and sent by a small worker pool so request/websocket
+    handlers never wait on Firebase. Each worker drains what is queued, coalesces pushes per
+    recipient (latest push per recipient and collapse key wins), batches tokens up to the
+    multicast limit, calls the blocking SDK in a thread pool and retries transient failures
+    with exponential backoff. `backend` only needs a `send_multicast(message)` method, so a
+    fake can be injected in tests.
+    """
+
+    def __init__(
+        self,
+        backend=messaging,
+        workers: int = 4,
+        max_batch_jobs: int = 100,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        max_queue_size: int = 10000,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.max_batch_jobs = max_batch_jobs
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_queue_size = max_queue_size
+        self.queue: asyncio.Queue[PushJob] | None = None
+        self.tasks: list[asyncio.Task] = []
+        self.retry_tasks: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    def enqueue(
+        self,
+        tokens: list[str],
+        title: str,
+        body: str,
+        data: dict[str, str] | None = None,
+        collapse_key: str | None = None,
+    ) -> None:
+        if not tokens:
+            return
+        self.start()
+        self.put(PushJob(list(tokens), title, body, data or {}, collapse_key))
+
+    def put(self, job: PushJob) -> None:
+        assert self.queue is not None
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning(f"FCM queue is full, dropping push to {len(job.tokens)} devices")
+
+    async def worker(self) -> None:
+        # close() drops self.queue while cancelled workers are still finishing
+        queue = self.queue
+        assert queue is not None
+        while True:
+            jobs = [await queue.get()]
+            while len(jobs) < self.max_batch_jobs and not queue.empty():
+                jobs.append(queue.get_nowait())
+            try:
+                await self.dispatch(jobs)
+            except Exception as e:
+                logger.error(f"FCM dispatch failed: {e}")
+            finally:
+                for _ in jobs:
+                    queue.task_done()
+
+    @staticmethod
+    def coalesce(jobs: list[PushJob]) -> list[PushJob]:
+        """Keep only the latest job per (recipient, collapse key) and regroup recipients per job."""
+        latest: dict[tuple[str, str | int], PushJob] = {}
+        for job in jobs:
+            key = job.collapse_key if job.collapse_key is not None else id(job)
+            for token in job.tokens:
+                latest[(token, key)] = job
+
+        grouped: dict[int, PushJob] = {}
+        for (token, _), job in latest.items():
+            if id(job) not in grouped:
+                grouped[id(job)] = PushJob([], job.title, job.body, job.data, job.collapse_key, job.attempt)
+            grouped[id(job)].tokens.append(token)
+        return list(grouped.values())
+
+    async def dispatch(self, jobs: list[PushJob]) -> None:
+        loop = asyncio.get_running_loop()
+        for job in self.coalesce(jobs):
+            for i in range(0, len(job.tokens), FCM_MULTICAST_LIMIT):
+                tokens = job.tokens[i : i + FCM_MULTICAST_LIMIT]
+                message = build_multicast_message(tokens, job.title, job.body, job.data)
+                try:
+                    response = await loop.run_in_executor(None, self.backend.send_multicast, message)
+                except Exception as e:
+                    logger.debug(f"Error sending message: {e}")
+                    if isinstance(e, RETRYABLE_FCM_ERRORS):
+                        self.retry(job, tokens)
+                    continue
+
+                logger.debug(f"Successfully sent message: {response.success_count}/{len(tokens)}")
+                if response.failure_count:
+                    failed = [
+                        token
+                        for token, res in zip(tokens, response.responses)
+                        if not res.success and isinstance(res.exception, RETRYABLE_FCM_ERRORS)
+                    ]
+                    self.retry(job, failed)
+
+    def retry(self, job: PushJob, tokens: list[str]) -> None:
+        if not tokens:
+            return
+        if job.attempt >= self.max_retries:
+            logger.warning(f"FCM push to {len(tokens)} devices dropped after {job.attempt} retries")
+            return
+        retry_job = PushJob(tokens, job.title, job.body, job.data, job.collapse_key, job.attempt + 1)
+        delay = self.backoff_base * (2**job.attempt) * (1 + random.random())
+        task = asyncio.create_task(self.requeue_later(retry_job, delay))
+        self.retry_tasks.add(task)
+        task.add_done_callback(self.retry_tasks.discard)
+
+    async def requeue_later(self, job: PushJob, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self.put(job)
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Flush queued pushes (best effort within `timeout`) and stop the workers."""
+        if self.queue is not None and self.tasks:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"FCM queue not drained on shutdown: {self.queue.qsize()} pushes left")
+        for task in [*self.tasks, *self.retry_tasks]:
+            task.cancel()
+        self.tasks = []
+        self.retry_tasks = set()
+        self.queue = None
+
+
+fcm_dispatcher = FCMDispatcher()
 
 
 # topic 으로 메시지를 보내는 함수
@@ -1,11 +1,13 @@
 from app.schemas.jwt import RefreshTokenSchema
-from app.core.exceptions.token import DecodeTokenException, ExpiredTokenException
-from app.utils.token_helper import TokenHelper
+from app.core.exceptions.token import DecodeTokenException, ExpiredTokenException, RevokedTokenException
+from app.core.helpers.token_cache import token_cache
+from app.services.role_service import role_registry
+from app.utils.token_helper import REFRESH_TOKEN_EXPIRE_PERIOD, TokenHelper
 
 
 class JwtService:
     async def verify_token(self, token: str) -> None:
-        TokenHelper.decode(token=token)
+        token_cache.verify(token)
 
     async def create_refresh_token(
         self,
@@ -22,8 +24,18 @@ class JwtService:
 
         if dec_refresh_token.get("sub") != "refresh":
             raise DecodeTokenException("Invalid refresh token")
+        # read first, a revocation between the check and the new token still revokes the new token
+        version = await token_cache.token_version()
+        # logged out or unregistered users can not refresh their old token
+        if token_cache.is_revoked(dec_token):
+            raise RevokedTokenException
+
+        user_id = dec_token.get("user_id")
+        if not user_id:
+            raise DecodeTokenException("Invalid token")
+        roles = await role_registry.roles_of(user_id)
 
         return RefreshTokenSchema(
-            token=TokenHelper.encode(payload={"user_id": dec_token.get("user_id")}),
-            refresh_token=TokenHelper.encode(payload={"sub": "refresh"}, expire_period=60 * 60 * 24 * 30),
+            token=TokenHelper.encode(payload={"user_id": user_id, "roles": roles, "ver": version}),
+            refresh_token=TokenHelper.encode(payload={"sub": "refresh"}, expire_period=REFRESH_TOKEN_EXPIRE_PERIOD),
         )
@@ -0,0 +1,319 @@
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, Mapping, Sequence
+
+import numpy as np
+from coredis.tokens import PureToken
+from pydantic import UUID4
+from sqlalchemy import ColumnElement, Row, delete, exists, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.helpers.redis import redis
+from app.models.user import MateRecommendation, User, user_block_list
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+from app.utils.generics import utcnow
+
+REFRESH_INTERVAL = 60 * 60
+# only one worker refreshes per interval
+REFRESH_LOCK_KEY = "mate-recommendation-lock"
+TOP_N = 30
+# users whose recommendations are rewritten per transaction
+WRITE_BATCH_SIZE = 1000
+
+# weights of matching profile attributes, candidates are always from the same city
+W_GYM = 4.0
+W_DISTRICT = 3.0
+W_LEVEL = 2.0
+W_TIME_PERIOD = 2.0
+# partner gender preference, applied both ways; preferences that are not a gender ("무관") are neutral
+W_GENDER_MATCH = 1.0
+W_GENDER_MISMATCH = -3.0
+# decays with days since last activity
+W_ACTIVE = 1.0
+ACTIVE_HALF_LIFE_DAYS = 14
+
+_profile_columns = (
+    User.id,
+    User.city,
+    User.district,
+    User.gym_info_id,
+    User.workout_level,
+    User.workout_time_period,
+    User.gender,
+    User.workout_partner_gender,
+    User.last_active_at,
+)
+
+
+# columns of MateFeatures.profiles
+DISTRICT, LEVEL, TIME_PERIOD, GENDER, PARTNER_GENDER = range(5)
+
+
+@dataclass(slots=True)
+class MateFeatures:
+    """profile attributes of users as integer codes, -1 where unset (unset never matches)"""
+
+    ids: list[UUID4]
+    gym: np.ndarray
+    activity: np.ndarray
+    # distinct (district, level, time period, gender, preferred partner gender) combinations,
+    # the preference is in the codes of gender and -1 when it is not one of the genders
+    profiles: np.ndarray
+    # index into `profiles` of every user
+    profile: np.ndarray
+
+
+def _codes(values: Sequence, vocabulary: dict) -> np.ndarray:
+    return np.fromiter(
+        (-1 if v is None else vocabulary.setdefault(v, len(vocabulary)) for v in values), np.int32, len(values)
+    )
+
+
+def build_features(rows: Sequence[Row], now: datetime) -> MateFeatures:
+    columns = list(zip(*rows)) if rows else [()] * len(_profile_columns)
+    genders: dict = {}
+    gender = _codes(columns[6], genders)
+    partner_gender = np.fromiter((genders.get(v, -1) for v in columns[7]), np.int32, len(rows))
+    idle_days = np.fromiter(
+        ((now - v).total_seconds() / 86400 if v else np.inf for v in columns[8]), np.float64, len(rows)
+    )
+    # districts are only compared inside a city
+    attributes = np.stack(
+        [_codes(columns[2], {}), _codes(columns[4], {}), _codes(columns[5], {}), gender, partner_gender], axis=1
+    ).reshape(len(rows), 5)
+    profiles, profile = np.unique(attributes, axis=0, return_inverse=True)
+    return MateFeatures(
+        ids=list(columns[0]),
+        gym=_codes(columns[3], {}),
+        activity=(W_ACTIVE * np.exp2(-idle_days / ACTIVE_HALF_LIFE_DAYS)).astype(np.float32),
+        profiles=profiles,
+        profile=profile.reshape(-1),
+    )
+
+
+def profile_scores(profiles: np.ndarray) -> np.ndarray:
+    """scores of every pair of profile combinations, everything but the gym and activity"""
+
+    def same(column: int) -> np.ndarray:
+        a = profiles[:, column][:, None]
+        return (a == profiles[:, column][None, :]) & (a >= 0)
+
+    def preference(wants: np.ndarray, gender: np.ndarray) -> np.ndarray:
+        return np.where(wants >= 0, np.where(wants == gender, W_GENDER_MATCH, W_GENDER_MISMATCH), 0.0)
+
+    gender, wants = profiles[:, GENDER], profiles[:, PARTNER_GENDER]
+    score = (
+        W_DISTRICT * same(DISTRICT)
+        + W_LEVEL * same(LEVEL)
+        + W_TIME_PERIOD * same(TIME_PERIOD)
+        + preference(wants[:, None], gender[None, :])
+        + preference(wants[None, :], gender[:, None])
+    )
+    return score.astype(np.float32)
+
+
+def rank_mates(
+    f: MateFeatures,
+    block: np.ndarray,
+    users: np.ndarray | None = None,
+    top_n: int = TOP_N,
+    blocked: Mapping[int, np.ndarray] | None = None,
+) -> Iterator[tuple[int, list[tuple[int, float]]]]:
+    """
+    (user index, [(candidate index, score)] best first) of the `users` of a block (all by default),
+    candidates are the other users of the block but the ones `blocked` by the user (user index ->
+    indexes)
+
+    apart from the gym and the activity of the candidate, a score only depends on the two profile
+    combinations: the best candidates of a user are among the best of a pool made of the n+1 most
+    active users of every combination, or among their gym mates. Pool scores are one matrix of
+    combinations x pool instead of users x block. The pool is deeper by the longest block list,
+    so it still holds n candidates of every user once the blocked ones are left out.
+    """
+    blocked = blocked or {}
+    n = min(top_n, len(block) - 1)
+    users = np.arange(len(block)) if users is None else users
+    if n <= 0:
+        yield from ((int(block[i]), []) for i in users)
+        return
+    depth = n + max((len(blocked.get(int(block[i]), ())) for i in users), default=0)
+
+    present, local = np.unique(f.profile[block], return_inverse=True)
+    local = local.reshape(-1)
+    table = profile_scores(f.profiles[present])
+    activity, gym = f.activity[block], f.gym[block]
+
+    # pool: the depth + 1 most active users of every combination (one of them may be the user)
+    by_profile = np.lexsort((-activity, local))
+    first = np.searchsorted(local[by_profile], np.arange(len(present)))
+    pool = by_profile[np.arange(len(block)) - first[local[by_profile]] <= depth]
+    pool_score = table[:, local[pool]] + activity[pool]
+    k = min(depth + 1, len(pool))
+    pool_best = pool[np.argpartition(-pool_score, k - 1, axis=1)[:, :k]]
+
+    gym_order = np.argsort(gym, kind="stable")
+    gym_first = np.searchsorted(gym[gym_order], gym, side="left")
+    gym_last = np.searchsorted(gym[gym_order], gym, side="right")
+
+    for i in users:
+        candidates = pool_best[local[i]]
+        if gym[i] >= 0:
+            candidates = np.union1d(candidates, gym_order[gym_first[i] : gym_last[i]])
+        candidates = candidates[candidates != i]
+        if int(block[i]) in blocked:
+            candidates = candidates[~np.isin(block[candidates], blocked[int(block[i])])]
+        score = table[local[i], local[candidates]] + activity[candidates]
+        score += W_GYM * ((gym[candidates] == gym[i]) & (gym[i] >= 0))
+        top = np.argsort(-score, kind="stable")[:n]
+        yield int(block[i]), [(int(block[c]), float(s)) for c, s in zip(candidates[top], score[top])]
+
+
+def blocked_indexes(f: MateFeatures, blocks: Sequence[Row]) -> dict[int, np.ndarray]:
+    """user index -> indexes of the users they blocked, from (user_id, blocked_user_id) rows"""
+    index = {user_id: i for i, user_id in enumerate(f.ids)}
+    blocked: dict[int, list[int]] = {}
+    for user_id, blocked_user_id in blocks:
+        if user_id in index and blocked_user_id in index:
+            blocked.setdefault(index[user_id], []).append(index[blocked_user_id])
+    return {i: np.asarray(indexes) for i, indexes in blocked.items()}
+
+
+def rank_all(
+    rows: Sequence[Row], now: datetime, blocks: Sequence[Row] = ()
+) -> list[tuple[UUID4, list[tuple[UUID4, float]]]]:
+    """(user id, [(candidate id, score)]) of every user, candidates come from the same city"""
+    f = build_features(rows, now)
+    blocked = blocked_indexes(f, blocks)
+    cities: dict = {}
+    for i, row in enumerate(rows):
+        cities.setdefault(row.city, []).append(i)
+    out = []
+    for members in cities.values():
+        for user, mates in rank_mates(f, np.asarray(members), blocked=blocked):
+            out.append((f.ids[user], [(f.ids[c], s) for c, s in mates]))
+    return out
+
+
+async def load_profiles(session: AsyncSession, *conditions: ColumnElement[bool]) -> Sequence[Row]:
+    stmt = select(*_profile_columns).where(User.blocked.is_(False), *conditions)
+    return (await session.execute(stmt)).all()
+
+
+async def load_blocks(session: AsyncSession, *conditions: ColumnElement[bool]) -> Sequence[Row]:
+    stmt = select(user_block_list.c.user_id, user_block_list.c.blocked_user_id).where(*conditions)
+    return (await session.execute(stmt)).all()
+
+
+async def store_recommendations(
+    session: AsyncSession, recommendations: Sequence[tuple[UUID4, list[tuple[UUID4, float]]]]
+) -> None:
+    """
+    replace the stored recommendations of the given users, one transaction per batch
+    ranks are upserted: a concurrent writer of the same user (two first requests, or a request
+    during the periodic refresh) waits for the other one instead of failing on the primary key
+    """
+    stmt = insert(MateRecommendation)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MateRecommendation.user_id, MateRecommendation.rank],
+        set_={
+            "recommended_user_id": stmt.excluded.recommended_user_id,
+            "score": stmt.excluded.score,
+            "updated_at": utcnow(),
+        },
+    )
+    for start in range(0, len(recommendations), WRITE_BATCH_SIZE):
+        batch = recommendations[start : start + WRITE_BATCH_SIZE]
+        await session.execute(
+            delete(MateRecommendation).where(MateRecommendation.user_id.in_([user_id for user_id, _ in batch]))
+        )
+        values = [
+            {"user_id": user_id, "rank": rank, "recommended_user_id": mate_id, "score": score}
+            for user_id, mates in batch
+            for rank, (mate_id, score) in enumerate(mates)
+        ]
+        if values:
+            await session.execute(stmt, values)
+        await session.commit()
+
+
+async def refresh_recommendations() -> int:
+    """recompute the recommendations of every user, return number of users"""
+    async with transactional_session_factory() as session:
+        rows = await load_profiles(session)
+        blocks = await load_blocks(session)
+        loop = asyncio.get_running_loop()
+        # the scoring pass is CPU bound, keep it off the event loop
+        recommendations = await loop.run_in_executor(None, rank_all, rows, datetime.now(timezone.utc), blocks)
+        await store_recommendations(session, recommendations)
+    return len(recommendations)
+
+
+async def refresh_user_recommendations(session: AsyncSession, user_id: UUID4) -> None:
+    """compute the recommendations of one user, for users that joined after the last refresh"""
+    city = (await session.execute(select(User.city).where(User.id == user_id))).scalar_one_or_none()
+    rows = await load_profiles(session, User.city.is_not_distinct_from(city))
+    f = build_features(rows, datetime.now(timezone.utc))
+    if user_id not in f.ids:
+        return
+    blocked = blocked_indexes(f, await load_blocks(session, user_block_list.c.user_id == user_id))
+    _, mates = next(rank_mates(f, np.arange(len(rows)), np.asarray([f.ids.index(user_id)]), blocked=blocked))
+    await store_recommendations(session, [(user_id, [(f.ids[c], s) for c, s in mates])])
+
+
+async def get_recommended_mates(db: AsyncSession, user_id: UUID4, limit: int = 3):
+    """best precomputed mates of a user, without the users they blocked"""
+    stmt = (
+        select(User.id, User.profile_pic, User.username)
+        .join(MateRecommendation, MateRecommendation.recommended_user_id == User.id)
+        .where(
+            MateRecommendation.user_id == user_id,
+            User.blocked.is_(False),
+            ~exists().where(user_block_list.c.user_id == user_id, user_block_list.c.blocked_user_id == User.id),
+        )
+        .order_by(MateRecommendation.rank)
+        .limit(limit)
+    )
+    rows = (await db.execute(stmt)).all()
+    # computed on demand only for users the last refresh did not see, not when every mate is blocked
+    if not rows and not await db.scalar(select(exists().where(MateRecommendation.user_id == user_id))):
+        await refresh_user_recommendations(db, user_id)
+        rows = (await db.execute(stmt)).all()
+    return [row._mapping for row in rows]
+
+
+class MateRecommender:
+    """Runs `refresh_recommendations` every `interval` seconds on whichever worker takes the redis lock."""
+
+    def __init__(self, interval: int = REFRESH_INTERVAL):
+        self.interval = interval
+        self.token = str(uuid.uuid4())
+        self.task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.loop())
+
+    async def loop(self) -> None:
+        while True:
+            try:
+                # the lock outlives restarts within the interval, deploys do not recompute every time
+                if await redis.set(REFRESH_LOCK_KEY, self.token, ex=self.interval, condition=PureToken.NX):
+                    count = await refresh_recommendations()
+                    logger.info(f"Refreshed workout-mate recommendations of {count} users")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Workout-mate recommendation refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+mate_recommender = MateRecommender()
@@ -16,6 +16,7 @@ from sqlalchemy.orm import selectinload
 from app.services.workout_promise_service import (
     get_workout_participant_id_list_by_user_id,
 )
+from app.utils.keyset_pagination import paginate_stmt, split_page
 
 
 # 내 운동 알림 정보 조회
@@ -24,12 +25,12 @@ async def get_notification_workout_list(
     user_id: UUID,
     limit: int = 10,
     offset: int | None = 0,
+    cursor: str | None = None,
 ):
     workout_participant_id_list_by_user_id = await get_workout_participant_id_list_by_user_id(db, user_id)
 
     stmt = (
         select(NotificationWorkout)
-        .order_by(NotificationWorkout.created_at.desc())
         .options(
             selectinload(NotificationWorkout.sender).options(
                 selectinload(WorkoutParticipant.user).load_only(
@@ -49,16 +50,12 @@ async def get_notification_workout_list(
         .select_from(NotificationWorkout)
     )
 
-    if offset:
-        stmt = stmt.offset(offset)
-
-    if limit:
-        stmt = stmt.limit(limit)
-
-    total = await db.execute(t_stmt)
+    stmt = paginate_stmt(stmt, NotificationWorkout.created_at, NotificationWorkout.id, limit, cursor, offset)
+    total = (await db.execute(t_stmt)).scalar_one() if not cursor else None
     result = await db.execute(stmt)
+    items, next_cursor = split_page(result.scalars().all(), limit)
 
-    return total.scalars().first(), result.scalars().all()
+    return total, items, next_cursor
 
 
 async def update_notification_workout_by_id(
@@ -0,0 +1,72 @@
+import asyncio
+import uuid
+
+from pydantic import UUID4
+from sqlalchemy import select
+
+from app.models import User
+from app.session import transactional_session_factory
+from app.utils.ecs_log import logger
+
+ADMIN_ROLE = "admin"
+# a demoted admin keeps the claim in their token, the registry drops it within the interval
+RELOAD_INTERVAL = 60
+
+
+def role_claims(user: User) -> dict:
+    """role claims of the tokens issued to a user"""
+    return {"roles": [ADMIN_ROLE] if user.is_superuser else []}
+
+
+class RoleRegistry:
+    """
+    Users that currently hold a role, reloaded from the database every `interval` seconds.
+
+    Roles are read from the token claims, the registry only revokes claims that no longer
+    hold, so a permission check never queries the database.
+    """
+
+    def __init__(self, interval: int = RELOAD_INTERVAL):
+        self.interval = interval
+        # None until the first load
+        self.admins: frozenset[str] | None = None
+        self.task: asyncio.Task | None = None
+
+    async def roles_of(self, user_id: UUID4 | str) -> list[str]:
+        if self.admins is not None:
+            return [ADMIN_ROLE] if str(user_id) in self.admins else []
+        # not loaded yet
+        async with transactional_session_factory() as session:
+            user = await session.get(User, uuid.UUID(str(user_id)))
+            return role_claims(user)["roles"] if user else []
+
+    async def has_role(self, user_id: UUID4, claimed_roles: list[str], role: str) -> bool:
+        return role in claimed_roles and role in await self.roles_of(user_id)
+
+    async def reload(self) -> None:
+        async with transactional_session_factory() as session:
+            result = await session.execute(select(User.id).where(User.is_superuser.is_(True)))
+            self.admins = frozenset(str(user_id) for user_id in result.scalars())
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.loop())
+
+    async def loop(self) -> None:
+        while True:
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # keeps the last loaded roles, or checks the database until the first load
+                logger.warning(f"Role registry reload failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def close(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+role_registry = RoleRegistry()
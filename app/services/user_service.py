@@ -4,6 +4,8 @@ from pydantic import UUID4
 
 from sqlalchemy import delete, func, insert, or_, select, and_
 from app.core.exceptions.user import UserAlreadyExistsException, UserBlockedException
+from app.core.helpers.cache import Cache, CacheTag
+from app.core.helpers.token_cache import token_cache
 
 from app.models import User
 from app.models.user import user_block_list
@@ -14,7 +16,14 @@ from app.core.exceptions import (
     UserNotFoundException,
 )
 from app.schemas.user import UserUpdate
-from app.utils.token_helper import TokenHelper
+from app.services.chat_roster_service import (
+    get_chat_room_ids_of_user,
+    invalidate_room_rosters,
+    invalidate_rosters_of_user,
+)
+from app.services.role_service import role_claims
+from app.utils.keyset_pagination import paginate_stmt, split_page
+from app.utils.token_helper import REFRESH_TOKEN_EXPIRE_PERIOD, TokenHelper
 from app.session import Transactional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, raiseload
@@ -29,18 +38,15 @@ class UserService:
         session: AsyncSession,
         limit: int = 10,
         offset: int | None = None,
+        cursor: str | None = None,
     ):
-        query = select(User).order_by(User.created_at.desc())
-        total = select(func.count()).select_from(User)
-
-        if offset:
-            query = query.offset(offset)
-
-        if limit:
-            query = query.limit(limit)
-        total_res = await session.execute(total)
+        query = paginate_stmt(select(User), User.created_at, User.id, limit, cursor, offset)
+        total = None
+        if not cursor:
+            total = (await session.execute(select(func.count()).select_from(User))).scalar_one()
         result = await session.execute(query)
-        return total_res.scalars().first(), result.scalars().all()
+        items, next_cursor = split_page(result.scalars().all(), limit)
+        return total, items, next_cursor
 
     @Transactional()
     async def create_user(self, phone_number: str, username: str, session: AsyncSession, **kwargs) -> User:
@@ -63,18 +69,6 @@ class UserService:
             await session.close()
             raise e
 
-    @Transactional()
-    async def is_superuser(self, user_id: UUID4, session: AsyncSession) -> bool:
-        result = await session.execute(select(User).where(User.id == user_id))
-        user = result.scalars().first()
-        if not user:
-            return False
-
-        if user.is_superuser is False:
-            return False
-
-        return True
-
     @Transactional()
     async def login(self, phone_number: str, session: AsyncSession) -> LoginResponse:
         result = await session.execute(select(User).where(and_(User.phone_number == phone_number)))
@@ -84,8 +78,10 @@ class UserService:
             raise UserNotFoundException("User not found")
 
         response = LoginResponse(
-            token=TokenHelper.encode(payload={"user_id": str(user.id)}),
-            refresh_token=TokenHelper.encode(payload={"sub": "refresh"}, expire_period=60 * 60 * 24 * 30),
+            token=TokenHelper.encode(
+                payload={"user_id": str(user.id), **role_claims(user), "ver": await token_cache.token_version()}
+            ),
+            refresh_token=TokenHelper.encode(payload={"sub": "refresh"}, expire_period=REFRESH_TOKEN_EXPIRE_PERIOD),
             user_id=user.id,
         )
         return response
@@ -98,6 +94,8 @@ class UserService:
             raise UserNotFoundException("User not found")
         user.fcm_token = None
         await session.commit()
+        await token_cache.revoke_user(user_id)
+        await invalidate_rosters_of_user(session, user_id)
 
 
 async def delete_user_by_id(user_id: UUID4, session: AsyncSession, bg: BackgroundTasks) -> User:
@@ -107,8 +105,12 @@ async def delete_user_by_id(user_id: UUID4, session: AsyncSession, bg: Backgroun
     if user.phone_number:
         bg.add_task(delete_user_in_firebase, user.phone_number)
 
+    room_ids = await get_chat_room_ids_of_user(session, user_id)
     await session.delete(user)
     await session.commit()
+    await token_cache.revoke_user(user_id)
+    await invalidate_room_rosters(*room_ids)
+    await Cache.invalidate(CacheTag.USER.of(user_id))
     return user
 
 
@@ -135,6 +137,7 @@ async def update_my_profile_pic_by_id(user_id: UUID4, profile_pic: str, session:
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    await Cache.invalidate(CacheTag.USER.of(user_id))
     return user
 
 
@@ -144,6 +147,7 @@ async def update_my_info_by_id(user_id: UUID4, update_req: UserUpdate, session:
     if update_req.fcm_token is not None:
         if user.fcm_token != update_req.fcm_token:
             old_fcm_token = user.fcm_token
+    old_roster_fields = (user.fcm_token, user.username)
 
     for k, v in update_req.update_dict().items():
         if v is not None:
@@ -161,9 +165,13 @@ async def update_my_info_by_id(user_id: UUID4, update_req: UserUpdate, session:
             else:
                 setattr(user, k, v)
 
+    roster_changed = (user.fcm_token, user.username) != old_roster_fields
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    if roster_changed:
+        await invalidate_rosters_of_user(session, user_id)
+    await Cache.invalidate(CacheTag.USER.of(user_id))
     return user
 
 
@@ -183,25 +191,6 @@ async def get_my_info_by_id(user_id: UUID4, session: AsyncSession, req_user_id:
     return user
 
 
-async def get_random_user_with_limit(db: AsyncSession, user_id: UUID4, limit: int = 3):
-    # exclude myself and blocked user
-    result = await db.execute(
-        select(User.id, User.profile_pic, User.username)
-        .order_by(func.random())
-        .limit(limit)
-        .where(
-            User.id != user_id,
-            User.id.not_in(select(user_block_list.c.blocked_user_id).where(user_block_list.c.user_id == user_id)),
-        )
-    )
-
-    out = []
-
-    for row in result.all():
-        out.append(row._mapping)
-    return out
-
-
 async def get_others_info_by_id(user_id: UUID4, session: AsyncSession) -> User:
     result = await session.execute(
         select(User).options(selectinload(User.gym_info), raiseload("*")).where(User.id == user_id)
@@ -298,6 +287,8 @@ async def add_block_list(session: AsyncSession, user_id: UUID4, blocked_user_id:
     stmt = insert(user_block_list).values(user_id=user_id, blocked_user_id=blocked_user_id)
     await session.execute(stmt)
     await session.commit()
+    await invalidate_rosters_of_user(session, user_id)
+    await Cache.invalidate(CacheTag.USER.of(user_id), CacheTag.USER.of(blocked_user_id))
 
 
 async def delete_block_list(session: AsyncSession, user_id: UUID4, blocked_user_id: UUID4):
@@ -307,6 +298,8 @@ async def delete_block_list(session: AsyncSession, user_id: UUID4, blocked_user_
     )
     await session.execute(stmt)
     await session.commit()
+    await invalidate_rosters_of_user(session, user_id)
+    await Cache.invalidate(CacheTag.USER.of(user_id), CacheTag.USER.of(blocked_user_id))
 
 
 async def get_minimal_info_by_ids(
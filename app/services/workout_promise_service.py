@@ -1,8 +1,13 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime
 from uuid import UUID
-from sqlalchemy import select, func
+from sqlalchemy import ColumnElement, Select, and_, or_, select, func
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.exceptions.workout_promise import NotAdminOfWorkoutPromiseException
+from app.core.helpers.cache import Cache, CacheTag
+from app.models.chat import ChatRoom
 from app.models.notification import NotificationWorkout
 from app.models.user import User
 from app.models.workout_promise import (
@@ -32,9 +37,11 @@ from app.core.exceptions import (
     AlreadyJoinedWorkoutPromiseException,
 )
 
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from app.services.fcm_service import send_notification_workout
 from app.services.user_service import get_my_info_by_id
+from app.utils.geo import EARTH_RADIUS_M, bounding_box, covering_cells
+from app.utils.keyset_pagination import paginate_stmt, split_page
 
 
 async def get_gym_info_by_id(db: AsyncSession, gym_info_id: UUID) -> GymInfo:
@@ -113,137 +120,188 @@ async def get_promise_location_or_create(db: AsyncSession, promise_location: Pro
         return await create_promise_location(db, promise_location)
 
 
-async def get_workout_promise_list(
+@dataclass(slots=True)
+class WorkoutPromiseFilter:
+    """filters of the workout promise lists, unset ones are not applied"""
+
+    status: WorkoutPromiseStatus | None = None
+    admin_user_id: UUID | None = None
+    # promises the user joined as an accepted participant, not as their admin
+    participant_user_id: UUID | None = None
+    promise_time_from: datetime | None = None
+    promise_time_to: datetime | None = None
+    promise_location_id: UUID | None = None
+    include_private: bool = False
+
+
+# minimal eager-load plan of WorkoutPromiseRead:
+# many-to-one relations are joined into the page query, participants and their users come in one batched query
+_list_user_columns = (User.id, User.username, User.profile_pic)
+WORKOUT_PROMISE_LIST_OPTIONS = (
+    joinedload(WorkoutPromise.chat_room).load_only(
+        ChatRoom.id,
+        ChatRoom.name,
+        ChatRoom.description,
+        ChatRoom.is_private,
+        ChatRoom.is_group_chat,
+        ChatRoom.created_at,
+        ChatRoom.updated_at,
+    ),
+    joinedload(WorkoutPromise.promise_location),
+    joinedload(WorkoutPromise.admin_user).load_only(*_list_user_columns),
+    selectinload(WorkoutPromise.participants).joinedload(WorkoutParticipant.user).load_only(*_list_user_columns),
+)
+
+
+def workout_promise_conditions(filter: WorkoutPromiseFilter) -> list[ColumnElement[bool]]:
+    conditions = []
+    if not filter.include_private:
+        # matches the partial indexes of the lists
+        conditions.append(WorkoutPromise.is_private.is_(False))
+    if filter.status:
+        conditions.append(WorkoutPromise.status == filter.status)
+    if filter.admin_user_id:
+        conditions.append(WorkoutPromise.admin_user_id == filter.admin_user_id)
+    if filter.participant_user_id:
+        conditions.append(
+            WorkoutPromise.participants.any(
+                and_(
+                    WorkoutParticipant.user_id == filter.participant_user_id,
+                    WorkoutParticipant.status == ParticipantStatus.ACCEPTED,
+                    WorkoutParticipant.is_admin.is_(False),
+                )
+            )
+        )
+    if filter.promise_time_from:
+        conditions.append(WorkoutPromise.promise_time >= filter.promise_time_from)
+    if filter.promise_time_to:
+        conditions.append(WorkoutPromise.promise_time < filter.promise_time_to)
+    if filter.promise_location_id:
+        conditions.append(WorkoutPromise.promise_location_id == filter.promise_location_id)
+    return conditions
+
+
+def workout_promise_list_stmt(
+    filter: WorkoutPromiseFilter,
+    limit: int | None,
+    offset: int | None = None,
+    cursor: str | None = None,
+) -> tuple[Select, Select]:
+    """return (page, total) statements of the workout promises matching `filter`, newest first"""
+    conditions = workout_promise_conditions(filter)
+    stmt = select(WorkoutPromise).options(*WORKOUT_PROMISE_LIST_OPTIONS).where(*conditions)
+    stmt = paginate_stmt(stmt, WorkoutPromise.created_at, WorkoutPromise.id, limit, cursor, offset)
+    t_stmt = select(func.count("*")).where(*conditions).select_from(WorkoutPromise)
+    return stmt, t_stmt
+
+
+async def find_workout_promises(
     db: AsyncSession,
+    filter: WorkoutPromiseFilter,
     limit: int = 10,
     offset: int | None = None,
+    cursor: str | None = None,
 ):
-    stmt = (
-        select(WorkoutPromise)
-        .order_by(WorkoutPromise.created_at.desc())
-        .options(
-            selectinload(WorkoutPromise.chat_room),
-            selectinload(WorkoutPromise.participants).options(
-                selectinload(WorkoutParticipant.user).load_only(
-                    User.id,
-                    User.username,
-                    User.profile_pic,
-                )
-            ),
-            selectinload(WorkoutPromise.promise_location),
-            selectinload(WorkoutPromise.admin_user).load_only(
-                User.id,
-                User.username,
-                User.profile_pic,
-            ),
-        )
-        .where(WorkoutPromise.is_private.is_(False))
-    )
-    t_stmt = select(func.count("*")).where(WorkoutPromise.is_private.is_(False)).select_from(WorkoutPromise)
+    """
+    return (total, workout promises, next_cursor) of one page, total is only counted for the first page
+    a page takes two queries, the promises with their many-to-one relations and the participants with their users
+    """
+    stmt, t_stmt = workout_promise_list_stmt(filter, limit, offset, cursor)
+    total = (await db.execute(t_stmt)).scalar_one() if not cursor else None
+    result = await db.execute(stmt)
+    items, next_cursor = split_page(result.scalars().all(), limit)
 
-    if offset:
-        stmt = stmt.offset(offset)
+    return total, items, next_cursor
 
-    if limit:
-        stmt = stmt.limit(limit)
 
-    total = await db.execute(t_stmt)
-    result = await db.execute(stmt)
+def distance_m_expr(latitude: float, longitude: float) -> ColumnElement[float]:
+    """great-circle distance in meters from a point to the promise location (spherical law of cosines)"""
+    lat, lng = func.radians(PromiseLocation.latitude), func.radians(PromiseLocation.longitude)
+    phi, lmb = math.radians(latitude), math.radians(longitude)
+    cos_angle = math.cos(phi) * func.cos(lat) * func.cos(lng - lmb) + math.sin(phi) * func.sin(lat)
+    return EARTH_RADIUS_M * func.acos(func.least(func.greatest(cos_angle, -1.0), 1.0))
 
-    return total.scalars().first(), result.scalars().all()
 
+def near_conditions(latitude: float, longitude: float, radius_m: float) -> list[ColumnElement[bool]]:
+    """index conditions of the locations that may be within `radius_m`, the distance is checked separately"""
+    cells = covering_cells(latitude, longitude, radius_m)
+    conditions = []
+    if cells != [""]:
+        # "~" sorts after every geohash character, so each cell is one range of the geohash index
+        conditions.append(
+            or_(*(and_(PromiseLocation.geohash >= cell, PromiseLocation.geohash < cell + "~") for cell in cells))
+        )
+    box = bounding_box(latitude, longitude, radius_m)
+    if box:
+        min_lat, max_lat, min_lng, max_lng = box
+        conditions.append(PromiseLocation.latitude.between(min_lat, max_lat))
+        conditions.append(PromiseLocation.longitude.between(min_lng, max_lng))
+    return conditions
 
-async def get_recruiting_workout_promise_list(
+
+async def find_workout_promises_near(
     db: AsyncSession,
+    filter: WorkoutPromiseFilter,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
     limit: int = 10,
-    offset: int | None = None,
-):
+) -> list[WorkoutPromise]:
+    """
+    return the `limit` nearest workout promises within `radius_m` of a point, nearest first
+    `distance_m` is set on each promise; the geohash cells covering the circle narrow the candidates
+    down with the index before distances are computed
+    """
+    distance = distance_m_expr(latitude, longitude)
     stmt = (
-        select(WorkoutPromise)
-        .order_by(WorkoutPromise.created_at.desc())
-        .options(
-            selectinload(WorkoutPromise.chat_room),
-            selectinload(WorkoutPromise.participants).options(
-                selectinload(WorkoutParticipant.user).load_only(
-                    User.id,
-                    User.username,
-                    User.profile_pic,
-                )
-            ),
-            selectinload(WorkoutPromise.promise_location),
-            selectinload(WorkoutPromise.admin_user).load_only(
-                User.id,
-                User.username,
-                User.profile_pic,
-            ),
+        select(WorkoutPromise, distance.label("distance_m"))
+        .join(PromiseLocation, WorkoutPromise.promise_location_id == PromiseLocation.id)
+        .options(*WORKOUT_PROMISE_LIST_OPTIONS)
+        .where(
+            *workout_promise_conditions(filter),
+            *near_conditions(latitude, longitude, radius_m),
+            distance <= radius_m,
         )
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(WorkoutPromise.status == WorkoutPromiseStatus.RECRUITING)
-    )
-    t_stmt = (
-        select(func.count("*"))
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(WorkoutPromise.status == WorkoutPromiseStatus.RECRUITING)
-        .select_from(WorkoutPromise)
+        .order_by(distance, WorkoutPromise.id)
+        .limit(limit)
     )
-
-    if offset:
-        stmt = stmt.offset(offset)
-
-    if limit:
-        stmt = stmt.limit(limit)
-
-    total = await db.execute(t_stmt)
     result = await db.execute(stmt)
 
-    return total.scalars().first(), result.scalars().all()
+    out = []
+    for row in result:
+        row.WorkoutPromise.distance_m = row.distance_m
+        out.append(row.WorkoutPromise)
+    return out
 
 
-async def get_workout_promise_list_written_by_me(
+async def get_workout_promise_list(
     db: AsyncSession,
-    user_id: UUID,
     limit: int = 10,
     offset: int | None = None,
+    cursor: str | None = None,
 ):
-    stmt = (
-        select(WorkoutPromise)
-        .order_by(WorkoutPromise.created_at.desc())
-        .options(
-            selectinload(WorkoutPromise.chat_room),
-            selectinload(WorkoutPromise.participants).options(
-                selectinload(WorkoutParticipant.user).load_only(
-                    User.id,
-                    User.username,
-                    User.profile_pic,
-                )
-            ),
-            selectinload(WorkoutPromise.promise_location),
-            selectinload(WorkoutPromise.admin_user).load_only(
-                User.id,
-                User.username,
-                User.profile_pic,
-            ),
-        )
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(WorkoutPromise.admin_user_id == user_id)
-    )
-    t_stmt = (
-        select(func.count("*"))
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(WorkoutPromise.admin_user_id == user_id)
-        .select_from(WorkoutPromise)
-    )
+    return await find_workout_promises(db, WorkoutPromiseFilter(), limit, offset, cursor)
 
-    if offset:
-        stmt = stmt.offset(offset)
 
-    if limit:
-        stmt = stmt.limit(limit)
+async def get_recruiting_workout_promise_list(
+    db: AsyncSession,
+    limit: int = 10,
+    offset: int | None = None,
+    cursor: str | None = None,
+):
+    return await find_workout_promises(
+        db, WorkoutPromiseFilter(status=WorkoutPromiseStatus.RECRUITING), limit, offset, cursor
+    )
 
-    total = await db.execute(t_stmt)
-    result = await db.execute(stmt)
 
-    return total.scalars().first(), result.scalars().all()
+async def get_workout_promise_list_written_by_me(
+    db: AsyncSession,
+    user_id: UUID,
+    limit: int = 10,
+    offset: int | None = None,
+    cursor: str | None = None,
+):
+    return await find_workout_promises(db, WorkoutPromiseFilter(admin_user_id=user_id), limit, offset, cursor)
 
 
 async def get_workout_promise_list_joined_by_me(
@@ -251,44 +309,9 @@ async def get_workout_promise_list_joined_by_me(
     user_id: UUID,
     limit: int = 10,
     offset: int | None = None,
+    cursor: str | None = None,
 ):
-    stmt = (
-        select(WorkoutPromise)
-        .order_by(WorkoutPromise.created_at.desc())
-        .options(selectinload(WorkoutPromise.chat_room))
-        .options(
-            selectinload(WorkoutPromise.participants).options(selectinload(WorkoutParticipant.user)),
-        )
-        .options(selectinload(WorkoutPromise.promise_location))
-        .options(selectinload(WorkoutPromise.admin_user))
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(
-            WorkoutPromise.participants.any(WorkoutParticipant.user_id == user_id)
-            .where(WorkoutParticipant.status == ParticipantStatus.ACCEPTED)
-            .where(WorkoutParticipant.is_admin.is_(False)),
-        )
-    )
-    t_stmt = (
-        select(func.count("*"))
-        .where(WorkoutPromise.is_private.is_(False))
-        .where(
-            WorkoutPromise.participants.any(WorkoutParticipant.user_id == user_id)
-            .where(WorkoutParticipant.status == ParticipantStatus.ACCEPTED)
-            .where(WorkoutParticipant.is_admin.is_(False)),
-        )
-        .select_from(WorkoutPromise)
-    )
-
-    if offset:
-        stmt = stmt.offset(offset)
-
-    if limit:
-        stmt = stmt.limit(limit)
-
-    total = await db.execute(t_stmt)
-    result = await db.execute(stmt)
-
-    return total.scalars().first(), result.scalars().all()
+    return await find_workout_promises(db, WorkoutPromiseFilter(participant_user_id=user_id), limit, offset, cursor)
 
 
 async def get_workout_promise_with_participants(db: AsyncSession, workout_promise_id: UUID) -> WorkoutPromise:
@@ -355,6 +378,7 @@ async def create_workout_promise(
 
     db.add(new_workout_promise)
     await db.commit()
+    await Cache.remove_by_tag(CacheTag.GET_WORKOUT_PROMISES)
     return new_workout_promise
 
 
@@ -362,6 +386,7 @@ async def delete_workout_promise_by_id(db: AsyncSession, workout_promise_id: UUI
     workout_promise = await get_workout_promise_by_id(db, workout_promise_id)
     await db.delete(workout_promise)
     await db.commit()
+    await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(workout_promise_id), CacheTag.GET_WORKOUT_PROMISES.of())
     return {"message": "Workout Promise is Successfully deleted"}
 
 
@@ -382,6 +407,8 @@ async def update_workout_promise_by_id(
         setattr(db_workout_promise, k, v)
     await db.commit()
     await db.refresh(db_workout_promise)
+    # status changes move the promise in or out of the recruiting list
+    await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(workout_promise_id), CacheTag.GET_WORKOUT_PROMISES.of())
 
     return db_workout_promise
 
@@ -465,6 +492,7 @@ async def create_workout_participant(
     # send notification to admin with fcm service
     db.add(new_notification_workout)
     await db.commit()
+    await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(workout_promise_id))
 
     # SEND FCM NOTIFICATION
     await send_notification_workout(db, new_notification_workout)
@@ -487,6 +515,7 @@ async def delete_workout_participant(
         raise WorkoutParticipantNotFoundException
     await db.delete(participant)
     await db.commit()
+    await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(workout_promise_id))
     return {"message": "Successfully deleted"}
 
 
@@ -535,6 +564,7 @@ async def update_workout_participant_by_admin(
 
     await db.commit()
     await db.refresh(db_workout_participant)
+    await Cache.invalidate(CacheTag.WORKOUT_PROMISE.of(workout_promise_id))
 
     # SEND FCM NOTIFICATION
     await send_notification_workout(db, new_notification_workout)
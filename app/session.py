@@ -2,17 +2,19 @@ from functools import wraps
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from typing import AsyncGenerator
 from app.core import config
+from app.core.db.query_log import install_query_log
 from sqlalchemy import exc
 from app.utils.ecs_log import logger
 
 sqlalchemy_database_uri = config.settings.DEFAULT_SQLALCHEMY_DATABASE_URI
 async_engine = create_async_engine(
     sqlalchemy_database_uri,
-    echo=True,
+    echo=False,
     pool_pre_ping=True,
     pool_size=20,
     max_overflow=30,
 )
+install_query_log(async_engine, config.settings.SQL_LOG, config.settings.SQL_SLOW_QUERY_MS)
 
 transactional_session_factory = async_sessionmaker(
     async_engine,
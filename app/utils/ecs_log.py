@@ -1,27 +1,140 @@
+"""
+Logging of the app.
+
+Records are put on a bounded queue by the calling thread and written as ECS JSON lines to
+stdout by a background thread, so a request never waits on the output. When the writer falls
+behind, records are dropped (and counted) instead of blocking the event loop.
+
+Levels are per logger (settings.LOG_LEVELS), and high-volume DEBUG loggers are sampled
+(settings.LOG_SAMPLE_RATES). Modules log through `logger` or a child from `get_logger`.
+"""
+import atexit
 import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Mapping
+
+import ujson
+
+from app.core.config import settings
+
+APP_LOGGER = "wegogym.api"
+LOG_QUEUE_SIZE = 10000
+ECS_VERSION = "1.6.0"
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] [%(process)d] > %(message)s"
+# attributes of every LogRecord, anything else was passed with `extra`
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
 
 
-class ECSLoggingHandler(logging.Handler):
+class ECSFormatter(logging.Formatter):
+    """one ECS JSON object per record, fields passed with `extra` are added as they are"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        document = {
+            "@timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "log.level": record.levelname.lower(),
+            "message": record.getMessage(),
+            "ecs": {"version": ECS_VERSION},
+            "log": {
+                "logger": record.name,
+                "origin": {
+                    "file": {"name": record.filename, "line": record.lineno},
+                    "function": record.funcName,
+                },
+            },
+            "process": {"pid": record.process, "thread": {"name": record.threadName}},
+        }
+        if record.exc_info:
+            exc_type, exc, _ = record.exc_info
+            document["error"] = {
+                "type": exc_type.__name__ if exc_type else None,
+                "message": str(exc),
+                "stack_trace": self.formatException(record.exc_info),
+            }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                document[key] = value
+        return ujson.dumps(document, ensure_ascii=False, default=str)
+
+
+class ECSLoggingHandler(logging.StreamHandler):
+    """writes to stdout, runs on the writer thread"""
+
     def __init__(self):
-        super(ECSLoggingHandler, self).__init__()
+        super(ECSLoggingHandler, self).__init__(sys.stdout)
+
 
-    def emit(self, record):
-        msg = str(self.format(record))
-        print(msg)
+class DroppingQueueHandler(QueueHandler):
+    """hands records to the writer thread, drops them instead of blocking when the queue is full"""
 
+    def __init__(self, queue_: queue.Queue):
+        super().__init__(queue_)
+        self.dropped = 0
 
-def get_ecs_logger():
-    ecs_formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] [%(process)d] > %(message)s"
-    )
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # arguments may change once the call returns, the message is bound now and formatted by the writer
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped:
+                message = f"Dropped {self.dropped} log records, the log writer fell behind"
+                self.queue.put_nowait(
+                    logging.getLogger(APP_LOGGER).makeRecord(
+                        APP_LOGGER, logging.WARNING, __file__, 0, message, None, None
+                    )
+                )
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """keeps a share of the DEBUG records of the given loggers and their children"""
+
+    def __init__(self, rates: Mapping[str, float]):
+        super().__init__()
+        # the most specific logger name first
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(f"{name}."):
+                return random.random() < rate
+        return True
+
+
+def get_ecs_logger() -> logging.Logger:
     ecs_handler = ECSLoggingHandler()
-    ecs_handler.setLevel(logging.DEBUG)
-    ecs_handler.setFormatter(ecs_formatter)
-    ecs_logger = logging.getLogger("wegogym.api")
-    ecs_logger.addHandler(ecs_handler)
+    ecs_handler.setFormatter(ECSFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    listener = QueueListener(queue.Queue(LOG_QUEUE_SIZE), ecs_handler)
+    listener.start()
+    # writes what is still queued when the process exits
+    atexit.register(listener.stop)
+
+    queue_handler = DroppingQueueHandler(listener.queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+    ecs_logger = logging.getLogger(APP_LOGGER)
+    ecs_logger.addHandler(queue_handler)
     ecs_logger.propagate = False
-    ecs_logger.setLevel(logging.DEBUG)
+    ecs_logger.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
     return ecs_logger
 
 
+def get_logger(name: str) -> logging.Logger:
+    """child of the app logger, for a category with its own level or sampling rate"""
+    return logger.getChild(name)
+
+
 logger = get_ecs_logger()
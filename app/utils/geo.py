@@ -0,0 +1,162 @@
+import math
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+GEOHASH_PRECISION = 12
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """geohash of a point, cells sharing a prefix are inside the cell of that prefix"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (rng[0] + rng[1]) / 2
+        if coordinate >= middle:
+            value = value << 1 | 1
+            rng[0] = middle
+        else:
+            value <<= 1
+            rng[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash: str) -> tuple[float, float, float, float]:
+    """(min latitude, max latitude, min longitude, max longitude) of a geohash cell"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _BASE32_INDEX[c]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            middle = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = middle
+            else:
+                rng[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(latitude, longitude) extent in degrees of the cells of a precision"""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_m: float) -> tuple[float, float, float, float] | None:
+    """
+    (min latitude, max latitude, min longitude, max longitude) around a circle,
+    None when the circle reaches a pole or crosses the antimeridian (no simple box)
+    """
+    d_lat = radius_m / METERS_PER_DEGREE
+    if abs(latitude) + d_lat >= 90:
+        return None
+    d_lng = d_lat / math.cos(math.radians(abs(latitude) + d_lat))
+    if abs(longitude) + d_lng >= 180:
+        return None
+    return latitude - d_lat, latitude + d_lat, longitude - d_lng, longitude + d_lng
+
+
+def covering_cells(latitude: float, longitude: float, radius_m: float) -> list[str]:
+    """
+    geohash prefixes of the cells that cover a circle: the cell of the center and its neighbours,
+    at the finest precision whose cells are still larger than the radius
+    [""] (every point) when no precision is coarse enough
+    """
+    d_lat = radius_m / METERS_PER_DEGREE
+    d_lng = d_lat / max(math.cos(math.radians(min(abs(latitude) + d_lat, 90))), 1e-9)
+    precision = 0
+    while precision < GEOHASH_PRECISION:
+        lat_size, lng_size = cell_size(precision + 1)
+        if lat_size < d_lat or lng_size < d_lng:
+            break
+        precision += 1
+    if precision == 0:
+        return [""]
+
+    lat_size, lng_size = cell_size(precision)
+    min_lat, max_lat, min_lng, max_lng = geohash_bbox(geohash_encode(latitude, longitude, precision))
+    center_lat, center_lng = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+    cells = set()
+    for dy in (-1, 0, 1):
+        lat = center_lat + dy * lat_size
+        if not -90 < lat < 90:
+            continue
+        for dx in (-1, 0, 1):
+            lng = (center_lng + dx * lng_size + 180) % 360 - 180
+            cells.add(geohash_encode(lat, lng, precision))
+    return sorted(cells)
+
+
+class GeoGridIndex(Generic[K]):
+    """
+    In-memory counterpart of the geohash search of the database: points bucketed by their cell,
+    a query scans the cells of `covering_cells` and filters by exact distance.
+    For code without a database (tests, scripts) and for keeping a hot set of points in process.
+    """
+
+    def __init__(self, precision: int = 6):
+        self.precision = precision
+        self.cells: dict[str, dict[K, tuple[float, float]]] = {}
+        self.points: dict[K, tuple[str, float, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, key: K, latitude: float, longitude: float) -> None:
+        self.remove(key)
+        cell = geohash_encode(latitude, longitude, self.precision)
+        self.cells.setdefault(cell, {})[key] = (latitude, longitude)
+        self.points[key] = (cell, latitude, longitude)
+
+    def remove(self, key: K) -> None:
+        point = self.points.pop(key, None)
+        if point is not None:
+            bucket = self.cells[point[0]]
+            del bucket[key]
+            if not bucket:
+                del self.cells[point[0]]
+
+    def within(self, latitude: float, longitude: float, radius_m: float) -> list[tuple[K, float]]:
+        """(key, distance) of the points within `radius_m`, nearest first"""
+        cells = set()
+        for prefix in covering_cells(latitude, longitude, radius_m):
+            if len(prefix) >= self.precision:
+                cells.add(prefix[: self.precision])
+            else:
+                cells.update(cell for cell in self.cells if cell.startswith(prefix))
+        found = []
+        for cell in cells:
+            for key, (lat, lng) in self.cells.get(cell, {}).items():
+                distance = haversine_m(latitude, longitude, lat, lng)
+                if distance <= radius_m:
+                    found.append((key, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, latitude: float, longitude: float, k: int, max_radius_m: float) -> list[tuple[K, float]]:
+        """(key, distance) of the `k` nearest points within `max_radius_m`"""
+        return self.within(latitude, longitude, max_radius_m)[:k]
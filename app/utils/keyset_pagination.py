@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+from typing import Any, Callable, Sequence, TypeVar
+
+import ujson
+from sqlalchemy import ColumnElement, Select, tuple_
+from sqlalchemy.orm import InstrumentedAttribute
+
+from app.core.exceptions.base import BadRequestException
+
+T = TypeVar("T")
+
+
+def encode_cursor(created_at: datetime, id: Any) -> str:
+    """return opaque cursor pointing at (created_at, id) of the last row of a page"""
+    raw = ujson.dumps([created_at.isoformat(), id if isinstance(id, int) else str(id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = ujson.loads(raw)
+        return datetime.fromisoformat(created_at), id
+    except Exception as e:
+        raise BadRequestException("Invalid cursor") from e
+
+
+def paginate_stmt(
+    stmt: Select,
+    created_at_col: InstrumentedAttribute | ColumnElement,
+    id_col: InstrumentedAttribute,
+    limit: int | None,
+    cursor: str | None = None,
+    offset: int | None = None,
+) -> Select:
+    """
+    Order `stmt` newest first on (created_at, id) and seek past `cursor`.
+    One extra row is fetched to know whether there is a next page without counting.
+    `offset` is only used by legacy clients that do not send a cursor.
+    """
+    stmt = stmt.order_by(created_at_col.desc(), id_col.desc())
+    if cursor:
+        stmt = stmt.where(tuple_(created_at_col, id_col) < decode_cursor(cursor))
+    elif offset:
+        stmt = stmt.offset(offset)
+    if limit:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
+
+def split_page(
+    rows: Sequence[T],
+    limit: int | None,
+    key: Callable[[T], tuple[datetime, Any]] = lambda row: (row.created_at, row.id),  # type: ignore
+) -> tuple[list[T], str | None]:
+    """return items of the page and cursor of the next page (None on the last page)"""
+    items = list(rows)
+    if not limit or len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(*key(items[-1]))
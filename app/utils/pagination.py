@@ -3,6 +3,7 @@ from fastapi import Query
 
 async def limit_offset_query(
     limit: int = Query(10, ge=1, description="Limit"),
-    offset: int = Query(0, ge=0, description="Offset"),
-) -> dict[str, int]:
-    return {"limit": limit, "offset": offset}
+    offset: int = Query(0, ge=0, description="Offset (deprecated, use cursor)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+) -> dict[str, int | str | None]:
+    return {"limit": limit, "offset": offset, "cursor": cursor}
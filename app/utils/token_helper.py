@@ -5,10 +5,13 @@ import jwt
 from app.core.config import settings as config
 from app.core.exceptions import DecodeTokenException, ExpiredTokenException
 
+ACCESS_TOKEN_EXPIRE_PERIOD = 60 * 60
+REFRESH_TOKEN_EXPIRE_PERIOD = 60 * 60 * 24 * 30
+
 
 class TokenHelper:
     @staticmethod
-    def encode(payload: dict, expire_period: int = 3600) -> str:
+    def encode(payload: dict, expire_period: int = ACCESS_TOKEN_EXPIRE_PERIOD) -> str:
         token = jwt.encode(
             payload={
                 **payload,
@@ -0,0 +1,62 @@
+"""Add like and comment counters
+
+Revision ID: 6d0f3b2a9c51
+Revises: 21278b7ccec3
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d0f3b2a9c51'
+down_revision = '21278b7ccec3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('post', sa.Column('like_cnt', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('post', sa.Column('comment_cnt', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('comment', sa.Column('like_cnt', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('ai_coaching', sa.Column('like_cnt', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from the like/comment tables
+    op.execute(
+        """
+        UPDATE post SET like_cnt = s.cnt
+        FROM (SELECT post_id, count(*) AS cnt FROM post_like WHERE is_liked = 1 GROUP BY post_id) s
+        WHERE post.id = s.post_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE post SET comment_cnt = s.cnt
+        FROM (SELECT post_id, count(*) AS cnt FROM comment WHERE available GROUP BY post_id) s
+        WHERE post.id = s.post_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE comment SET like_cnt = s.cnt
+        FROM (SELECT comment_id, count(*) AS cnt FROM comment_like WHERE is_liked = 1 GROUP BY comment_id) s
+        WHERE comment.id = s.comment_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE ai_coaching SET like_cnt = s.cnt
+        FROM (
+            SELECT ai_coaching_id, count(*) AS cnt FROM ai_coaching_like WHERE is_liked = 1 GROUP BY ai_coaching_id
+        ) s
+        WHERE ai_coaching.id = s.ai_coaching_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('ai_coaching', 'like_cnt')
+    op.drop_column('comment', 'like_cnt')
+    op.drop_column('post', 'comment_cnt')
+    op.drop_column('post', 'like_cnt')
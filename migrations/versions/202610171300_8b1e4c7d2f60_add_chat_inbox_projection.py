@@ -0,0 +1,62 @@
+"""Add chat inbox projection
+
+Revision ID: 8b1e4c7d2f60
+Revises: 6d0f3b2a9c51
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import app.models.guid
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e4c7d2f60'
+down_revision = '6d0f3b2a9c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_room', sa.Column('last_message_id', app.models.guid.GUID(), nullable=True))
+    op.add_column('chat_room', sa.Column('last_message_text', sa.String(length=300), nullable=True))
+    op.add_column('chat_room', sa.Column('last_message_created_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('chat_room_member', sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from the messages
+    op.execute(
+        """
+        UPDATE chat_room SET
+            last_message_id = m.id,
+            last_message_text = m.text,
+            last_message_created_at = m.created_at
+        FROM (
+            SELECT DISTINCT ON (chat_room_id) id, chat_room_id, text, created_at
+            FROM message
+            WHERE chat_room_id IS NOT NULL
+            ORDER BY chat_room_id, created_at DESC, id DESC
+        ) m
+        WHERE chat_room.id = m.chat_room_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE chat_room_member SET unread_count = s.cnt
+        FROM (
+            SELECT cm.id, count(*) AS cnt
+            FROM chat_room_member cm
+            JOIN message m ON m.chat_room_id = cm.chat_room_id
+            WHERE m.created_at > cm.last_read_at AND m.user_id IS DISTINCT FROM cm.user_id
+            GROUP BY cm.id
+        ) s
+        WHERE chat_room_member.id = s.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('chat_room_member', 'unread_count')
+    op.drop_column('chat_room', 'last_message_created_at')
+    op.drop_column('chat_room', 'last_message_text')
+    op.drop_column('chat_room', 'last_message_id')
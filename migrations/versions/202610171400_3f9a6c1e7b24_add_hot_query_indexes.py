@@ -0,0 +1,69 @@
+"""Add composite and partial indexes for hot queries
+
+Revision ID: 3f9a6c1e7b24
+Revises: 8b1e4c7d2f60
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a6c1e7b24'
+down_revision = '8b1e4c7d2f60'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial index predicate)
+INDEXES = [
+    ('ix_message_chat_room_id_created_at', 'message', ['chat_room_id', 'created_at', 'id'], None),
+    ('ix_chat_room_member_user_id_chat_room_id', 'chat_room_member', ['user_id', 'chat_room_id'], None),
+    ('ix_chat_room_public_created_at', 'chat_room', ['created_at', 'id'], 'is_private IS false'),
+    ('ix_workout_promise_public_created_at', 'workout_promise', ['created_at', 'id'], 'is_private IS false'),
+    (
+        'ix_workout_promise_public_status_created_at',
+        'workout_promise',
+        ['status', 'created_at', 'id'],
+        'is_private IS false',
+    ),
+    ('ix_workout_promise_admin_user_id_created_at', 'workout_promise', ['admin_user_id', 'created_at', 'id'], None),
+    ('ix_workout_participant_user_id_status', 'workout_participant', ['user_id', 'status'], None),
+    ('ix_workout_participant_workout_promise_id', 'workout_participant', ['workout_promise_id'], None),
+    ('ix_post_available_created_at', 'post', ['created_at', 'id'], 'available = true'),
+    ('ix_post_available_community_id_created_at', 'post', ['community_id', 'created_at', 'id'], 'available = true'),
+    ('ix_comment_post_id_created_at', 'comment', ['post_id', 'created_at', 'id'], None),
+    ('ix_notification_created_at', 'notification', ['created_at', 'id'], None),
+    ('ix_notification_workout_recipient_id', 'notification_workout', ['recipient_id'], None),
+]
+
+# leading columns of the composite indexes above
+REDUNDANT_INDEXES = [
+    ('ix_chat_room_member_user_id', 'chat_room_member', ['user_id']),
+    ('ix_comment_post_id', 'comment', ['post_id']),
+]
+
+
+def upgrade() -> None:
+    # built concurrently so writes to the tables are not blocked, which needs to run outside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        for name, table, _ in REDUNDANT_INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in REDUNDANT_INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,45 @@
+"""Add geohash of promise locations for proximity search
+
+Revision ID: c52d8e0a4f17
+Revises: 3f9a6c1e7b24
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import GEOHASH_PRECISION, geohash_encode
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d8e0a4f17'
+down_revision = '3f9a6c1e7b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'promise_location',
+        sa.Column('geohash', sa.String(length=GEOHASH_PRECISION, collation='C'), nullable=True),
+    )
+
+    # backfill, geohashes are computed by the application
+    conn = op.get_bind()
+    rows = conn.execute(sa.text('SELECT id, latitude, longitude FROM promise_location')).all()
+    if rows:
+        conn.execute(
+            sa.text('UPDATE promise_location SET geohash = :geohash WHERE id = :id'),
+            [{'id': row.id, 'geohash': geohash_encode(row.latitude, row.longitude)} for row in rows],
+        )
+
+    op.create_index(op.f('ix_promise_location_geohash'), 'promise_location', ['geohash'], unique=False)
+    op.create_index(
+        op.f('ix_workout_promise_promise_location_id'), 'workout_promise', ['promise_location_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_workout_promise_promise_location_id'), table_name='workout_promise')
+    op.drop_index(op.f('ix_promise_location_geohash'), table_name='promise_location')
+    op.drop_column('promise_location', 'geohash')
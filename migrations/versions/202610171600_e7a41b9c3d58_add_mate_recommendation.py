@@ -0,0 +1,44 @@
+"""Add precomputed workout-mate recommendations
+
+Revision ID: e7a41b9c3d58
+Revises: c52d8e0a4f17
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import app.models.guid
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a41b9c3d58'
+down_revision = 'c52d8e0a4f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'mate_recommendation',
+        sa.Column('user_id', app.models.guid.GUID(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('recommended_user_id', app.models.guid.GUID(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)"), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)"), nullable=False),
+        sa.ForeignKeyConstraint(['recommended_user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'rank'),
+    )
+    op.create_index(
+        op.f('ix_mate_recommendation_recommended_user_id'),
+        'mate_recommendation',
+        ['recommended_user_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_mate_recommendation_recommended_user_id'), table_name='mate_recommendation')
+    op.drop_table('mate_recommendation')
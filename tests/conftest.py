@@ -0,0 +1,81 @@
+"""
+Settings come from the `env` of [tool.pytest.ini_options] in pyproject.toml.
+
+Firebase is initialized when `app.services.fcm_service` is imported, with the service account
+file of the deployment. Tests never reach firebase, so it gets a placeholder credential.
+
+Tests using the `database` fixture run against the postgres of TEST_DATABASE_URL
+(postgresql+asyncpg://...) and are skipped without it. The schema is created from the models
+before each test and dropped after it, so the database must be one used only by tests.
+
+`redis` and `hub` replace the redis client and the pubsub hub of every app module with the fakes
+of tests/fake_redis.py.
+"""
+import os
+import sys
+
+import pytest
+from firebase_admin import credentials
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from tests.fake_redis import FakeHub, FakeRedis
+
+
+class PlaceholderCredential(credentials.Base):
+    def get_credential(self):
+        return None
+
+
+credentials.Certificate = lambda *args, **kwargs: PlaceholderCredential()
+
+
+def replace_in_app(monkeypatch, name: str, original, replacement) -> None:
+    """modules import singletons by name, every app module holding `original` as `name` gets `replacement`"""
+    for module in list(sys.modules.values()):
+        if module is None or not module.__name__.startswith("app."):
+            continue
+        if getattr(module, name, None) is original:
+            monkeypatch.setattr(module, name, replacement)
+
+
+@pytest.fixture
+def redis(monkeypatch) -> FakeRedis:
+    from app.core.helpers import redis as app_redis
+
+    fake = FakeRedis()
+    replace_in_app(monkeypatch, "redis", app_redis.redis, fake)
+    return fake
+
+
+@pytest.fixture
+def hub(monkeypatch) -> FakeHub:
+    from app.core.helpers import pubsub
+
+    fake = FakeHub()
+    replace_in_app(monkeypatch, "chat_hub", pubsub.chat_hub, fake)
+    return fake
+
+
+@pytest.fixture
+async def database(monkeypatch) -> AsyncEngine:
+    """engine of the test database, the session factory of the app is bound to it"""
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from app import session as app_session
+    from app.models import Base
+
+    engine = create_async_engine(url, pool_size=20, max_overflow=30)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    replace_in_app(monkeypatch, "transactional_session_factory", app_session.transactional_session_factory, factory)
+
+    yield engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
@@ -0,0 +1,192 @@
+import asyncio
+import fnmatch
+import time
+from typing import Any
+
+from coredis.response.types import ScoredMember
+from coredis.tokens import PureToken
+
+
+def _bytes(value: Any) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+def _score(value: float | str) -> float:
+    return {"-inf": float("-inf"), "+inf": float("inf")}.get(value, value)  # type: ignore
+
+
+class FakeHub:
+    """in-process stand-in for the pubsub hub, a publish reaches every queue subscribed to its channel"""
+
+    def __init__(self):
+        self.queues: dict[str, list[asyncio.Queue]] = {}
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.queues.setdefault(channel, []).append(queue)
+        return queue
+
+    async def unsubscribe(self, channel: str, queue: asyncio.Queue) -> None:
+        if queue in self.queues.get(channel, ()):
+            self.queues[channel].remove(queue)
+
+    async def publish(self, channel: str, message: str) -> None:
+        for queue in self.queues.get(channel, []):
+            queue.put_nowait(message)
+
+
+class FakePipeline:
+    """queues commands and runs them in order on execute, like a non-transactional coredis pipeline"""
+
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+    def __getattr__(self, name: str):
+        async def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the coredis client, only the commands the app uses, with the same
+    signatures and bytes responses. `down` makes every command raise like an unreachable node.
+    """
+
+    def __init__(self):
+        self.data: dict[bytes, Any] = {}
+        self.expires: dict[bytes, float] = {}
+        self.down = False
+        self.delay = 0.0
+        self.calls = 0
+        # keys visited by SCAN
+        self.scanned = 0
+
+    async def _call(self) -> None:
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("redis is down")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+    def _get(self, key, default=None):
+        key = _bytes(key)
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key, default)
+
+    async def get(self, key):
+        await self._call()
+        return self._get(key)
+
+    async def set(self, key, value, ex=None, px=None, condition=None, **kwargs):
+        await self._call()
+        if condition == PureToken.NX and self._get(key) is not None:
+            return False
+        self.data[_bytes(key)] = _bytes(value)
+        self.expires.pop(_bytes(key), None)
+        if ex or px:
+            self.expires[_bytes(key)] = time.monotonic() + (ex if ex else px / 1000)
+        return True
+
+    async def incr(self, key):
+        await self._call()
+        value = int(self._get(key, b"0")) + 1
+        self.data[_bytes(key)] = _bytes(value)
+        return value
+
+    async def delete(self, keys):
+        await self._call()
+        return sum(self.data.pop(_bytes(key), None) is not None for key in keys)
+
+    async def unlink(self, keys):
+        return await self.delete(keys)
+
+    async def expire(self, key, seconds, condition=None):
+        await self._call()
+        if self._get(key) is None:
+            return False
+        current = self.expires.get(_bytes(key))
+        expires_at = time.monotonic() + seconds
+        if condition == PureToken.NX and current is not None:
+            return False
+        if condition == PureToken.GT and (current is None or expires_at <= current):
+            return False
+        self.expires[_bytes(key)] = expires_at
+        return True
+
+    async def scan_iter(self, match=None):
+        await self._call()
+        for key in list(self.data):
+            self.scanned += 1
+            if match is None or fnmatch.fnmatchcase(key.decode(), match):
+                yield key
+
+    async def pipeline(self, transaction=None):
+        return FakePipeline(self)
+
+    async def hset(self, key, field_values):
+        await self._call()
+        fields = self.data.setdefault(_bytes(key), {})
+        fields.update({_bytes(f): _bytes(v) for f, v in field_values.items()})
+        return len(field_values)
+
+    async def hdel(self, key, fields):
+        await self._call()
+        hash_ = self._get(key, {})
+        return sum(hash_.pop(_bytes(f), None) is not None for f in fields)
+
+    async def hgetall(self, key):
+        await self._call()
+        return dict(self._get(key, {}))
+
+    async def hlen(self, key):
+        await self._call()
+        return len(self._get(key, {}))
+
+    async def zadd(self, key, member_scores, **kwargs):
+        await self._call()
+        zset = self.data.setdefault(_bytes(key), {})
+        zset.update({_bytes(m): float(s) for m, s in member_scores.items()})
+        return len(member_scores)
+
+    async def zrem(self, key, members):
+        await self._call()
+        zset = self._get(key, {})
+        return sum(zset.pop(_bytes(m), None) is not None for m in members)
+
+    async def zrange(self, key, start, stop):
+        await self._call()
+        members = [m for _, m in sorted((s, m) for m, s in self._get(key, {}).items())]
+        return tuple(members[start : None if stop == -1 else stop + 1])
+
+    async def zrangebyscore(self, key, min_, max_, withscores=None, **kwargs):
+        await self._call()
+        low, high = _score(min_), _score(max_)
+        members = sorted((s, m) for m, s in self._get(key, {}).items() if low <= s <= high)
+        if withscores:
+            return tuple(ScoredMember(m, s) for s, m in members)
+        return tuple(m for _, m in members)
+
+    async def zremrangebyscore(self, key, min_, max_):
+        await self._call()
+        zset = self._get(key, {})
+        low, high = _score(min_), _score(max_)
+        removed = [m for m, s in zset.items() if low <= s <= high]
+        for m in removed:
+            del zset[m]
+        return len(removed)
@@ -0,0 +1,163 @@
+"""
+MsgpackCodec against the ujson encoding it replaced.
+
+The benchmark encodes and decodes a page of chat rooms and a profile with both: run with `-s`
+to see the payload sizes and timings.
+"""
+import pickle
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import msgpack
+import pytest
+import ujson
+from fastapi.encoders import jsonable_encoder
+
+from app.core.helpers.cache import codec
+from app.core.helpers.cache.codec import COMPRESS_THRESHOLD, FORMAT_VERSION, NONE, ZLIB, MsgpackCodec
+from app.schemas.chat import ChatRoomList, ChatRoomRead
+from app.schemas.user import MyInfoRead
+from app.schemas.workout_promise import GymInfoRead
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def chat_room_list(count: int) -> ChatRoomList:
+    return ChatRoomList(
+        total=count,
+        next_cursor="cursor",
+        items=[
+            ChatRoomRead(
+                id=uuid.UUID(int=i, version=4),
+                name=f"room {i}",
+                description="오늘 저녁 같이 운동하실 분" if i % 2 else None,
+                created_at=NOW + timedelta(minutes=i),
+                updated_at=NOW + timedelta(minutes=i),
+                is_private=False,
+                is_group_chat=i % 3 == 0,
+                unread_count=i,
+            )
+            for i in range(count)
+        ],
+    )
+
+
+def my_info() -> MyInfoRead:
+    return MyInfoRead(
+        id=uuid.UUID(int=1, version=4),
+        username="민수",
+        profile_pic=None,
+        phone_number="01012345678",
+        age="30",
+        bio=None,
+        gender="male",
+        weight=70,
+        height=175,
+        workout_per_week=3,
+        workout_level="중급",
+        workout_goal="근육량 증가",
+        workout_time_per_day="1시간",
+        workout_time_period="evening",
+        address=None,
+        created_at=NOW,
+        updated_at=NOW,
+        gym_info=GymInfoRead(
+            id=uuid.UUID(int=2, version=4), name="gym", address="seoul", created_at=NOW, updated_at=NOW
+        ),
+        workout_style=None,
+        workout_routine=None,
+        workout_partner_gender=None,
+        city="seoul",
+        district=None,
+    )
+
+
+RESPONSES = {
+    "chat room page": chat_room_list(20),
+    "chat room list": chat_room_list(200),
+    "my info": my_info(),
+}
+
+
+@pytest.mark.parametrize("response", RESPONSES.values(), ids=RESPONSES.keys())
+def test_responses_round_trip_as_their_json(response):
+    data = MsgpackCodec().encode(response)
+
+    assert MsgpackCodec().decode(data) == jsonable_encoder(response)
+
+
+COMPRESSIONS = {"zlib": (ZLIB, None), "zstd": (codec.ZSTD, "zstandard"), "lz4": (codec.LZ4, "lz4.frame")}
+
+
+@pytest.mark.parametrize("compression, module", COMPRESSIONS.values(), ids=COMPRESSIONS.keys())
+def test_values_above_the_threshold_are_compressed(compression, module):
+    if module:
+        pytest.importorskip(module)
+    small, large = my_info(), chat_room_list(200)
+    encoder = MsgpackCodec(compression=compression)
+
+    small_data, large_data = encoder.encode(small), encoder.encode(large)
+
+    assert len(msgpack.packb(jsonable_encoder(small))) <= COMPRESS_THRESHOLD
+    assert small_data[:2] == bytes((FORMAT_VERSION, NONE))
+    assert large_data[:2] == bytes((FORMAT_VERSION, compression))
+    assert len(large_data) < len(msgpack.packb(jsonable_encoder(large)))
+    # any codec reads them, whatever it compresses with
+    assert MsgpackCodec(compression=NONE).decode(large_data) == jsonable_encoder(large)
+    assert MsgpackCodec().decode(small_data) == jsonable_encoder(small)
+
+
+def test_the_threshold_can_be_changed():
+    response = my_info()
+
+    assert MsgpackCodec(compression=ZLIB, compress_threshold=10).encode(response)[1] == ZLIB
+    assert MsgpackCodec(compression=NONE, compress_threshold=10).encode(response)[1] == NONE
+
+
+def test_the_default_compression_is_installed():
+    assert MsgpackCodec().compression in codec.COMPRESSORS
+
+
+def legacy_values() -> dict[str, bytes]:
+    response = jsonable_encoder(chat_room_list(2))
+    current = MsgpackCodec(compression=NONE).encode(response)
+    compressed = MsgpackCodec(compression=ZLIB, compress_threshold=0).encode(response)
+    return {
+        # what the previous backend stored
+        "ujson": ujson.dumps(response).encode(),
+        "pickle": pickle.dumps(response),
+        "ujson number": ujson.dumps(1).encode(),
+        "another format version": bytes((FORMAT_VERSION + 1,)) + current[1:],
+        "unknown compression": current[:1] + bytes((99,)) + current[2:],
+        "truncated": current[:-5],
+        "truncated compressed": compressed[:-5],
+        "header only": current[:2],
+        "one byte": current[:1],
+    }
+
+
+@pytest.mark.parametrize("data", legacy_values().values(), ids=legacy_values().keys())
+def test_values_in_another_format_decode_to_a_miss(data):
+    assert MsgpackCodec().decode(data) is None
+
+
+@pytest.mark.parametrize("name", RESPONSES)
+def test_codec_benchmark(name):
+    """payload size and encode / decode time against ujson, run with -s to see them"""
+    response = RESPONSES[name]
+    msgpack_codec = MsgpackCodec()
+    data = msgpack_codec.encode(response)
+    json_data = ujson.dumps(jsonable_encoder(response)).encode()
+
+    def timing(function) -> float:
+        number = 50
+        return min(timeit.repeat(function, number=number, repeat=3)) / number * 1e6
+
+    print(
+        f"\n{name}: msgpack {len(data)} B, encode {timing(lambda: msgpack_codec.encode(response)):.0f} us,"
+        f" decode {timing(lambda: msgpack_codec.decode(data)):.0f} us"
+        f" / ujson {len(json_data)} B, encode {timing(lambda: ujson.dumps(jsonable_encoder(response))):.0f} us,"
+        f" decode {timing(lambda: ujson.loads(json_data)):.0f} us"
+    )
+    assert len(data) <= len(json_data)
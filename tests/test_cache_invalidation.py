@@ -0,0 +1,88 @@
+"""
+Invalidation cost against the size of the keyspace.
+
+delete_startswith reads the index of the prefix instead of scanning the keyspace, so its cost
+depends on the number of keys under the prefix only. The benchmark compares it with the SCAN
+it replaced on keyspaces of growing size: run with `-s` to see the timings.
+"""
+import time
+
+from app.core.helpers.cache import redis_backend
+from app.core.helpers.cache.redis_backend import RedisBackend, index_key
+from tests.fake_redis import FakeRedis
+
+PREFIX = "get_chat_rooms"
+PREFIX_KEYS = 200
+KEYSPACE_SIZES = [1_000, 10_000, 100_000]
+
+
+async def scan_delete(redis: FakeRedis, prefix: str) -> None:
+    """delete_startswith before the index, for comparison"""
+    async for key in redis.scan_iter(f"{prefix}::*"):
+        await redis.delete([key])
+
+
+async def fill(redis: FakeRedis, backend: RedisBackend, keyspace_size: int) -> None:
+    # unrelated entries, written directly since only their number matters
+    redis.data.update({f"{{other-{i % 50}}}::{i}".encode(): b"value" for i in range(keyspace_size)})
+    for i in range(PREFIX_KEYS):
+        await backend.set({"page": i}, f"{{{PREFIX}}}::{i}", ttl=60)
+    # the keys of the SCAN baseline, which had no hash tag
+    redis.data.update({f"{PREFIX}::{i}".encode(): b"value" for i in range(PREFIX_KEYS)})
+
+
+async def test_delete_startswith_deletes_the_keys_of_the_prefix_and_its_index(redis):
+    backend = RedisBackend()
+    await backend.set({"page": 1}, f"{{{PREFIX}}}::1", ttl=60)
+    await backend.set({"page": 2}, f"{{{PREFIX}}}::2", ttl=60)
+    await backend.set({"other": 1}, "{get_user_info}::1", ttl=60)
+
+    await backend.delete_startswith(PREFIX)
+
+    assert await backend.get(f"{{{PREFIX}}}::1") is None
+    assert await backend.get(f"{{{PREFIX}}}::2") is None
+    assert await redis.get(index_key(PREFIX)) is None
+    assert await backend.get("{get_user_info}::1") == {"other": 1}
+
+
+async def test_delete_dependents_deletes_the_keys_of_every_dependency(redis):
+    backend = RedisBackend()
+    for key, dependencies in {"a": ["room:1"], "b": ["room:1", "user:1"], "c": ["user:2"]}.items():
+        await backend.set(key, key, ttl=60)
+        await backend.add_dependencies(key, dependencies, ttl=60)
+
+    assert sorted(await backend.delete_dependents(["room:1"])) == ["a", "b"]
+    assert await backend.get("a") is None
+    assert await backend.get("b") is None
+    assert await backend.get("c") == "c"
+
+
+async def test_invalidation_cost_does_not_grow_with_the_keyspace(monkeypatch):
+    commands, durations = [], []
+    for keyspace_size in KEYSPACE_SIZES:
+        redis = FakeRedis()
+        monkeypatch.setattr(redis_backend, "redis", redis)
+        backend = RedisBackend()
+        await fill(redis, backend, keyspace_size)
+
+        calls, start = redis.calls, time.perf_counter()
+        await backend.delete_startswith(PREFIX)
+        indexed = time.perf_counter() - start
+        commands.append(redis.calls - calls)
+
+        start = time.perf_counter()
+        await scan_delete(redis, PREFIX)
+        scanned = time.perf_counter() - start
+        durations.append((indexed, scanned))
+
+        assert redis.scanned == keyspace_size + PREFIX_KEYS
+        assert not [key for key in redis.data if key.startswith(f"{{{PREFIX}}}".encode())]
+        print(
+            f"\n{keyspace_size:>7} keys: index {indexed * 1000:8.3f} ms, "
+            f"scan {scanned * 1000:8.3f} ms ({redis.scanned} keys visited)"
+        )
+
+    # the same commands whatever the size of the keyspace, the scan visits all of it
+    assert len(set(commands)) == 1
+    indexed, scanned = durations[-1]
+    assert indexed < scanned
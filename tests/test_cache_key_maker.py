@@ -0,0 +1,132 @@
+import inspect
+import timeit
+import uuid
+from datetime import date, datetime, timezone
+from enum import Enum
+
+import pytest
+from fastapi import Request
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.helpers.cache import CustomKeyMaker
+
+
+class Status(str, Enum):
+    OPEN = "open"
+
+
+class Filter(BaseModel):
+    city: str
+    tags: list[str]
+
+
+async def endpoint(request: Request, session: AsyncSession, user_id: uuid.UUID, q, limit: int = 10, cursor=None):
+    ...
+
+
+def make_key(function=endpoint):
+    return CustomKeyMaker().compile("prefix", (), function)
+
+
+def request() -> Request:
+    return Request({"type": "http", "headers": [], "query_string": b""})
+
+
+USER_ID = uuid.UUID(int=1)
+
+# each pair differs, and each would have produced the same text in a naive encoding
+DISTINCT_ARGUMENTS = [
+    (["a,str:b"], ["a", "b"]),
+    (["a\x1fb"], ["a", "b"]),
+    ({"a": "b=c"}, {"a=b": "c"}),
+    ("1", 1),
+    (1, 1.0),
+    (1, True),
+    (None, "None"),
+    (str(USER_ID), USER_ID),
+    ("open", Status.OPEN),
+    ([1, [2, 3]], [[1, 2], 3]),
+    ({1: 2}, [1, 2]),
+    ({"a"}, ["a"]),
+    (["uuid", str(USER_ID)], USER_ID),
+    (date(2026, 1, 1), datetime(2026, 1, 1)),
+    (date(2026, 1, 1).isoformat(), date(2026, 1, 1)),
+    (2**64, str(2**64)),
+    (Filter(city="seoul", tags=[]), {"city": "seoul", "tags": []}),
+]
+
+
+@pytest.mark.parametrize("first, second", DISTINCT_ARGUMENTS)
+def test_different_arguments_make_different_keys(first, second):
+    key = make_key()
+
+    assert key(request=request(), session=None, user_id=USER_ID, q=first) != key(
+        request=request(), session=None, user_id=USER_ID, q=second
+    )
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ({"a": 1, "b": [1, 2]}, {"b": [1, 2], "a": 1}),
+        ({"b", "a", 1}, {1, "a", "b"}),
+        ([1, "a"], (1, "a")),
+        (datetime(2026, 1, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc)),
+        (Filter(city="seoul", tags=["a"]), Filter(city="seoul", tags=["a"])),
+    ],
+)
+def test_equal_arguments_make_the_same_key(first, second):
+    key = make_key()
+
+    assert key(request=request(), session=None, user_id=USER_ID, q=first) == key(
+        request=request(), session=None, user_id=USER_ID, q=second
+    )
+
+
+def test_positional_and_keyword_calls_make_the_same_key():
+    key = make_key()
+
+    assert key(request(), None, USER_ID, "q") == key(request=request(), session=None, user_id=USER_ID, q="q", limit=10)
+
+
+def test_arguments_are_ignored_by_the_type_of_their_value():
+    # FastAPI dependencies are often left unannotated
+    async def unannotated(request, session, q):
+        ...
+
+    key = make_key(unannotated)
+    first = key(request=request(), session=AsyncSession(), q="q")
+
+    assert first == key(request=request(), session=AsyncSession(), q="q")
+    assert first != key(request=request(), session=AsyncSession(), q="other")
+    # an argument of another type in the same position still counts
+    assert first != key(request=request(), session="session", q="q")
+
+
+def test_ignored_arguments_keep_the_position_of_the_others():
+    async def function(a, b):
+        ...
+
+    key = make_key(function)
+
+    assert key(a=AsyncSession(), b="x") != key(a="x", b=AsyncSession())
+
+
+def test_key_building_does_not_inspect_the_signature_per_call(monkeypatch):
+    key = make_key()
+    monkeypatch.setattr(inspect, "signature", lambda *args, **kwargs: pytest.fail("signature inspected"))
+
+    key(request=request(), session=None, user_id=USER_ID, q="q", limit=10, cursor=None)
+
+
+def test_key_building_microbenchmark(monkeypatch):
+    """per-key cost for the keyword call FastAPI makes, run with -s to see it"""
+    key = make_key()
+    kwargs = dict(request=request(), session=AsyncSession(), user_id=USER_ID, q="seoul", limit=20, cursor="abc")
+    # timings vary between machines, what keeps the cost low is not binding the arguments per call
+    monkeypatch.setattr(inspect.Signature, "bind", lambda *args, **kwargs: pytest.fail("arguments bound"))
+
+    number = 20000
+    seconds = min(timeit.repeat(lambda: key(**kwargs), number=number, repeat=3))
+    print(f"\n{seconds / number * 1e6:.2f} us per key")
@@ -0,0 +1,292 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi import Request
+
+from app.core.fastapi.schemas import CurrentUser
+from app.core.helpers.cache import CacheTag, CircuitBreaker, CustomKeyMaker, LocalCache, RedisBackend, Vary
+from app.core.helpers.cache.cache_manager import CacheManager
+from app.models import ChatRoom
+
+RESET_TIMEOUT = 0.2
+ROOM_ID = uuid.UUID(int=7)
+
+
+def new_cache() -> CacheManager:
+    manager = CacheManager()
+    manager.init(
+        backend=RedisBackend(),
+        key_maker=CustomKeyMaker(),
+        local=LocalCache(),
+        breaker=CircuitBreaker(timeout=0.05, failure_threshold=2, reset_timeout=RESET_TIMEOUT),
+    )
+    return manager
+
+
+@pytest.fixture
+async def cache(redis, hub):
+    manager = new_cache()
+    yield manager
+    await manager.close()
+
+
+@pytest.fixture
+async def workers(redis, hub):
+    """the cache of two workers sharing redis and the invalidation channel"""
+    managers = [new_cache(), new_cache()]
+    yield managers
+    for manager in managers:
+        await manager.close()
+
+
+class Origin:
+    """counts the calls that were not served from the cache"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def rooms(self, limit: int):
+        self.calls += 1
+        room = ChatRoom(id=ROOM_ID, name="room", is_private=False)
+        return {"total": 1, "owner_id": uuid.UUID(int=1), "items": [room]}
+
+
+def cached(cache: CacheManager, function, **kwargs):
+    return cache.cached(prefix="rooms", ttl=60, local_ttl=30, **kwargs)(function)
+
+
+EXPECTED = {
+    "total": 1,
+    "owner_id": str(uuid.UUID(int=1)),
+    "items": [{"id": str(ROOM_ID), "name": "room", "is_private": False}],
+}
+
+
+async def test_uuid_and_orm_responses_are_cached_in_both_tiers(cache, redis):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms)
+
+    first = await rooms(limit=10)
+    assert first["items"][0].id == ROOM_ID
+
+    (key,) = cache.local.entries
+    _, local_value, size = cache.local.entries[key]
+    # the local tier holds what redis holds, not the objects of the response
+    assert local_value == await redis.get(key)
+    assert size == len(local_value)
+
+    assert await rooms(limit=10) == EXPECTED
+    cache.local.clear()
+    assert await rooms(limit=10) == EXPECTED
+    assert origin.calls == 1
+
+
+async def test_stale_responses_with_orm_values_are_cached(cache):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms, stale_ttl=60)
+
+    assert (await rooms(limit=10))["items"][0].id == ROOM_ID
+    assert await rooms(limit=10) == EXPECTED
+    assert origin.calls == 1
+
+
+async def test_unencodable_responses_are_served_and_not_cached(cache):
+    calls = []
+
+    async def function(limit: int):
+        calls.append(limit)
+        return {"value": object.__new__(type("Opaque", (), {"__slots__": ()}))}
+
+    cached_function = cached(cache, function)
+    await cached_function(limit=1)
+    await cached_function(limit=1)
+
+    assert len(calls) == 2
+    assert len(cache.local) == 0
+
+
+async def test_the_origin_serves_misses_while_redis_is_down(cache, redis):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms)
+    redis.down = True
+
+    for limit in range(5):
+        assert (await rooms(limit=limit))["total"] == 1
+
+    assert origin.calls == 5
+    assert cache.breaker.state == "open"
+
+
+async def test_the_local_tier_serves_hits_while_redis_is_down(cache, redis):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms)
+    await rooms(limit=10)
+    redis.down = True
+
+    assert await rooms(limit=10) == EXPECTED
+    assert origin.calls == 1
+
+
+async def test_slow_redis_opens_the_circuit(cache, redis):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms)
+    redis.delay = 1
+
+    start = time.perf_counter()
+    for limit in range(3):
+        await rooms(limit=limit)
+    elapsed = time.perf_counter() - start
+
+    assert cache.breaker.state == "open"
+    assert origin.calls == 3
+    # timed out calls and then no calls at all, never the full delay
+    assert elapsed < 1
+
+
+async def test_an_open_circuit_does_not_call_redis_until_a_probe_succeeds(cache, redis):
+    origin = Origin()
+    rooms = cached(cache, origin.rooms)
+    redis.down = True
+    await rooms(limit=1)
+    await rooms(limit=2)
+    assert cache.breaker.state == "open"
+
+    calls = redis.calls
+    await rooms(limit=3)
+    assert redis.calls == calls
+
+    # a failed probe opens the circuit again
+    await asyncio.sleep(RESET_TIMEOUT)
+    await rooms(limit=4)
+    assert redis.calls == calls + 1
+    assert cache.breaker.state == "open"
+
+    redis.down = False
+    await asyncio.sleep(RESET_TIMEOUT)
+    await rooms(limit=5)
+    assert cache.breaker.state == "closed"
+    assert await rooms(limit=5) == EXPECTED
+    assert origin.calls == 5
+
+
+@pytest.mark.parametrize("moment", ["during the computation", "before the value is stored"])
+async def test_a_response_invalidated_while_it_is_computed_is_not_kept(cache, monkeypatch, moment):
+    dependency = CacheTag.CHAT_ROOM.of(ROOM_ID)
+    calls = []
+
+    async def rooms(limit: int):
+        calls.append(limit)
+        if moment == "during the computation" and len(calls) == 1:
+            # a write committed after the response was read
+            await cache.invalidate(dependency)
+        return {"total": len(calls)}
+
+    if moment == "before the value is stored":
+        set_encoded = cache.backend.set_encoded
+
+        async def invalidate_then_set(*args, **kwargs):
+            if len(calls) == 1:
+                await cache.invalidate(dependency)
+            await set_encoded(*args, **kwargs)
+
+        monkeypatch.setattr(cache.backend, "set_encoded", invalidate_then_set)
+    cached_rooms = cached(cache, rooms, depends_on=lambda arguments, response: [dependency])
+
+    assert await cached_rooms(limit=10) == {"total": 1}
+    assert await cached_rooms(limit=10) == {"total": 2}
+    assert await cached_rooms(limit=10) == {"total": 2}
+
+    await cache.invalidate(dependency)
+    assert await cached_rooms(limit=10) == {"total": 3}
+
+
+class SlowOrigin(Origin):
+    """an origin call that takes a while, so concurrent misses overlap"""
+
+    async def rooms(self, limit: int):
+        await asyncio.sleep(0.1)
+        return {**await super().rooms(limit), "total": self.calls}
+
+
+async def test_concurrent_misses_call_the_origin_once(cache):
+    origin = SlowOrigin()
+    rooms = cached(cache, origin.rooms)
+
+    responses = await asyncio.gather(*(rooms(limit=10) for _ in range(10)))
+
+    assert origin.calls == 1
+    assert all(response["total"] == 1 for response in responses)
+
+
+async def test_concurrent_misses_of_two_workers_call_the_origin_once(workers):
+    origin = SlowOrigin()
+    functions = [cached(cache, origin.rooms) for cache in workers]
+
+    responses = await asyncio.gather(*(function(limit=10) for function in functions for _ in range(5)))
+
+    assert origin.calls == 1
+    assert all(response["total"] == 1 for response in responses)
+
+
+async def test_stale_responses_are_served_while_one_request_refreshes_them(cache, monkeypatch):
+    origin = SlowOrigin()
+    rooms = cached(cache, origin.rooms, stale_ttl=60)
+    assert (await rooms(limit=10))["total"] == 1
+    clock = time.time
+    monkeypatch.setattr(time, "time", lambda: clock() + 61)
+
+    responses = await asyncio.gather(*(rooms(limit=10) for _ in range(10)))
+
+    # served at once, before the refresh finished
+    assert [response["total"] for response in responses] == [1] * 10
+    assert len(cache.background_tasks) == 1
+    await asyncio.gather(*cache.background_tasks)
+    assert origin.calls == 2
+    assert (await rooms(limit=10))["total"] == 2
+
+
+@pytest.mark.parametrize("invalidation", ["dependency", "prefix"])
+async def test_an_invalidation_clears_the_local_tier_of_every_worker(workers, invalidation):
+    origin = Origin()
+    dependency = CacheTag.CHAT_ROOM.of(ROOM_ID)
+    functions = [cached(cache, origin.rooms, depends_on=lambda arguments, response: [dependency]) for cache in workers]
+    for function in functions:
+        await function(limit=10)
+    # the listeners subscribe
+    await asyncio.sleep(0)
+    assert origin.calls == 1
+    assert all(len(cache.local) == 1 for cache in workers)
+
+    invalidator, other = workers
+    if invalidation == "dependency":
+        await invalidator.invalidate(dependency)
+    else:
+        await invalidator.remove_by_prefix("rooms")
+    await asyncio.sleep(0)
+
+    assert len(other.local) == 0
+    await functions[1](limit=10)
+    assert origin.calls == 2
+
+
+async def test_responses_varying_on_the_user_are_cached_per_user(cache):
+    calls = []
+
+    async def my_rooms(request: Request, limit: int):
+        calls.append(request.user.id)
+        return {"user_id": str(request.user.id), "limit": limit}
+
+    my_rooms = cached(cache, my_rooms, vary=[Vary.user])
+
+    def request(user_id):
+        return Request({"type": "http", "headers": [], "query_string": b"", "user": CurrentUser(id=user_id)})
+
+    users = [uuid.UUID(int=1), uuid.UUID(int=2), None]
+    for _ in range(2):
+        for user_id in users:
+            assert (await my_rooms(request(user_id), limit=10))["user_id"] == str(user_id)
+
+    assert calls == users
+    assert len(cache.local) == 3
@@ -0,0 +1,148 @@
+import time
+import uuid
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions.chat import InvalidChatMessage
+from app.models import ChatRoom, Message, User
+from app.services.chat_message_buffer import (
+    MESSAGE_MAX_LENGTH,
+    MESSAGE_WAL_OWNERS_KEY,
+    WAL_STALE_AFTER,
+    MessageWriteBuffer,
+)
+
+
+class RecordingBuffer(MessageWriteBuffer):
+    """writes to a list instead of postgres"""
+
+    def __init__(self, written: list[dict]):
+        super().__init__()
+        self.written = written
+
+    async def write(self, rows: list[dict]) -> None:
+        self.written.extend(rows)
+
+
+async def test_messages_are_logged_in_the_wal_of_their_worker(redis):
+    written: list[dict] = []
+    first, second = RecordingBuffer(written), RecordingBuffer(written)
+
+    message = await first.append(uuid.uuid4(), uuid.uuid4(), "hello")
+    await second.append(uuid.uuid4(), uuid.uuid4(), "hi")
+
+    assert first.wal_key != second.wal_key
+    assert list(await redis.hgetall(first.wal_key)) == [str(message.id).encode()]
+    owners = await redis.zrangebyscore(MESSAGE_WAL_OWNERS_KEY, "-inf", "+inf")
+    assert sorted(owners) == sorted([first.wal_key.encode(), second.wal_key.encode()])
+
+    await first.close()
+    assert [row["id"] for row in written] == [message.id]
+    assert await redis.hgetall(first.wal_key) == {}
+    await second.close()
+
+
+async def test_recover_replays_only_the_wals_of_dead_workers(redis):
+    written: list[dict] = []
+    crashed, alive, recovering = RecordingBuffer([]), RecordingBuffer([]), RecordingBuffer(written)
+    lost = await crashed.append(uuid.uuid4(), uuid.uuid4(), "lost")
+    pending = await alive.append(uuid.uuid4(), uuid.uuid4(), "still buffered")
+    # the crashed worker stopped heartbeating
+    await redis.zadd(MESSAGE_WAL_OWNERS_KEY, {crashed.wal_key: time.time() - WAL_STALE_AFTER - 1})
+
+    await recovering.recover()
+
+    assert [row["id"] for row in written] == [lost.id]
+    assert await redis.hlen(crashed.wal_key) == 0
+    assert await redis.hlen(alive.wal_key) == 1
+    owners = await redis.zrangebyscore(MESSAGE_WAL_OWNERS_KEY, "-inf", "+inf")
+    assert owners == (alive.wal_key.encode(),)
+    assert pending.id not in {row["id"] for row in written}
+
+
+async def test_messages_are_written_through_when_redis_is_down(redis):
+    written: list[dict] = []
+    buffer = RecordingBuffer(written)
+    redis.down = True
+
+    message = await buffer.append(uuid.uuid4(), uuid.uuid4(), "hello")
+
+    assert [row["id"] for row in written] == [message.id]
+    assert buffer.rows == []
+
+
+@pytest.mark.parametrize("text", ["a" * (MESSAGE_MAX_LENGTH + 1), 300, None, ["hello"]])
+async def test_invalid_texts_are_rejected_before_anything_is_recorded(redis, text):
+    written: list[dict] = []
+    buffer = RecordingBuffer(written)
+
+    with pytest.raises(InvalidChatMessage):
+        await buffer.append(uuid.uuid4(), uuid.uuid4(), text)
+
+    assert buffer.rows == []
+    assert await redis.hgetall(buffer.wal_key) == {}
+    await buffer.close()
+    assert written == []
+
+
+async def test_the_longest_valid_text_is_accepted(redis):
+    buffer = RecordingBuffer([])
+
+    message = await buffer.append(uuid.uuid4(), uuid.uuid4(), "가" * MESSAGE_MAX_LENGTH)
+
+    assert len(message.text) == MESSAGE_MAX_LENGTH
+    await buffer.close()
+
+
+async def test_rejected_rows_are_dropped_and_the_others_written(database, redis):
+    user, room = User(username="user", phone_number="010-0"), ChatRoom(name="room")
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all([user, room])
+        await session.commit()
+    buffer = MessageWriteBuffer()
+
+    # the room of the first message is deleted before the flush, alone and then within a batch
+    alone = await buffer.append(user.id, uuid.uuid4(), "deleted room")
+    await buffer.flush()
+    batch = [
+        await buffer.append(user.id, room.id, "first"),
+        await buffer.append(user.id, uuid.uuid4(), "deleted room"),
+        await buffer.append(user.id, room.id, "second"),
+    ]
+    await buffer.flush()
+
+    async with AsyncSession(database) as session:
+        stored = set((await session.scalars(select(Message.id))).all())
+    assert stored == {batch[0].id, batch[2].id}
+    assert alone.id not in stored
+    assert buffer.rows == []
+    assert await redis.hgetall(buffer.wal_key) == {}
+    await buffer.close()
+
+
+class UnreachableSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+async def test_rows_are_kept_when_postgres_is_unreachable(redis, monkeypatch):
+    buffer = MessageWriteBuffer()
+
+    async def insert_messages(session, rows):
+        raise ConnectionError("postgres is down")
+
+    monkeypatch.setattr("app.services.chat_message_buffer.insert_messages", insert_messages)
+    monkeypatch.setattr("app.services.chat_message_buffer.transactional_session_factory", UnreachableSession)
+    message = await buffer.append(uuid.uuid4(), uuid.uuid4(), "hello")
+
+    with pytest.raises(ConnectionError):
+        await buffer.flush()
+
+    assert [row["id"] for row in buffer.rows] == [message.id]
+    assert list(await redis.hgetall(buffer.wal_key)) == [str(message.id).encode()]
+    buffer.task.cancel()
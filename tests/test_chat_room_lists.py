@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ChatRoom, ChatRoomMember, User
+from app.services import chat_service
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+async def pages(database, list_rooms, limit: int) -> tuple[list[list[ChatRoom]], list[int | None]]:
+    """follow next_cursor from the first page to the last"""
+    pages, totals, cursor = [], [], None
+    while True:
+        async with AsyncSession(database, expire_on_commit=False) as session:
+            total, items, cursor = await list_rooms(session, limit, cursor=cursor)
+        pages.append(items)
+        totals.append(total)
+        if cursor is None:
+            return pages, totals
+
+
+def record_statements(engine) -> list[str]:
+    statements: list[str] = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    return statements
+
+
+async def test_public_chat_rooms_are_paged_with_a_cursor(database):
+    # rooms created in the same instant are ordered by id
+    rooms = [
+        ChatRoom(name=f"room-{i}", is_private=i % 3 == 0, created_at=START + timedelta(minutes=i // 2))
+        for i in range(25)
+    ]
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all(rooms)
+        await session.commit()
+    statements = record_statements(database)
+
+    result, totals = await pages(database, chat_service.get_public_chat_room_list, limit=4)
+
+    public = sorted((room for room in rooms if not room.is_private), key=lambda room: (room.created_at, room.id))
+    assert [room.id for page in result for room in page] == [room.id for room in reversed(public)]
+    assert [len(page) for page in result] == [4, 4, 4, 4]
+    assert totals == [len(public), None, None, None]
+    assert not any("OFFSET" in statement for statement in statements)
+
+
+async def test_my_chat_rooms_are_paged_by_last_activity(database):
+    user = User(username="me", phone_number="010-0")
+    rooms = [
+        ChatRoom(
+            name=f"room-{i}",
+            created_at=START + timedelta(minutes=i),
+            # a third of the rooms has no message yet and is placed by its creation
+            last_message_created_at=None if i % 3 == 0 else START + timedelta(hours=1, minutes=-i),
+        )
+        for i in range(10)
+    ]
+    other_room = ChatRoom(name="not mine", last_message_created_at=START + timedelta(days=1))
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all([user, other_room, *rooms])
+        await session.flush()
+        session.add_all([ChatRoomMember(user_id=user.id, chat_room_id=room.id, unread_count=1) for room in rooms])
+        await session.commit()
+    statements = record_statements(database)
+
+    def my_rooms(session, limit, cursor):
+        return chat_service.get_chat_room_list_by_user_id(session, user.id, limit, cursor=cursor)
+
+    result, totals = await pages(database, my_rooms, limit=3)
+
+    by_activity = sorted(rooms, key=lambda room: (room.last_message_created_at or room.created_at, room.id))
+    assert [room.id for page in result for room in page] == [room.id for room in reversed(by_activity)]
+    assert totals == [len(rooms), None, None, None]
+    assert all(room.unread_count == 1 and len(room.members) == 1 for page in result for room in page)
+    assert not any("OFFSET" in statement for statement in statements)
+
+
+async def test_offset_is_still_accepted_without_a_cursor(database):
+    rooms = [ChatRoom(name=f"room-{i}", is_private=False, created_at=START + timedelta(minutes=i)) for i in range(5)]
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all(rooms)
+        await session.commit()
+
+        total, items, next_cursor = await chat_service.get_public_chat_room_list(session, 2, offset=2)
+
+    assert total == 5
+    assert [room.name for room in items] == ["room-2", "room-1"]
+    assert next_cursor is not None
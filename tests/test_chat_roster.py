@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+
+from app.services import chat_roster_service
+from app.services.chat_roster_service import RoomRoster, get_room_roster, invalidate_room_rosters
+
+ROOM_ID = uuid.UUID(int=3)
+
+
+class Members:
+    """members of the room, with a hook run while a roster is loaded"""
+
+    def __init__(self):
+        self.member_ids = ["a"]
+        self.loads = 0
+        self.while_loading = None
+
+    async def load_room_roster(self, room_id, session) -> RoomRoster:
+        self.loads += 1
+        roster = RoomRoster(member_ids=list(self.member_ids))
+        if self.while_loading is not None:
+            hook, self.while_loading = self.while_loading, None
+            await hook()
+        return roster
+
+
+@pytest.fixture
+def members(monkeypatch) -> Members:
+    members = Members()
+    monkeypatch.setattr(chat_roster_service, "load_room_roster", members.load_room_roster)
+    monkeypatch.setattr(chat_roster_service, "_local_rosters", {})
+    return members
+
+
+async def test_the_roster_is_loaded_once(redis, members):
+    assert (await get_room_roster(ROOM_ID, session=object())).member_ids == ["a"]
+    chat_roster_service._local_rosters.clear()
+
+    assert (await get_room_roster(ROOM_ID, session=object())).member_ids == ["a"]
+    assert members.loads == 1
+
+
+async def test_a_roster_invalidated_while_it_is_loaded_is_not_kept(redis, members):
+    async def join():
+        # a member joins after the roster was read, before it is stored
+        members.member_ids.append("b")
+        await invalidate_room_rosters(ROOM_ID)
+
+    members.while_loading = join
+    assert (await get_room_roster(ROOM_ID, session=object())).member_ids == ["a"]
+
+    assert (await get_room_roster(ROOM_ID, session=object())).member_ids == ["a", "b"]
+    chat_roster_service._local_rosters.clear()
+    assert (await get_room_roster(ROOM_ID, session=object())).member_ids == ["a", "b"]
+    assert members.loads == 2
@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+
+import pytest
+import ujson
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.api.websockets import chat as chat_ws
+from app.core.exceptions.websocket import WSUserNotInChatRoom
+from app.models import ChatRoom, ChatRoomMember, User
+from app.services.chat_message_buffer import MESSAGE_MAX_LENGTH, message_buffer
+from app.services.chat_service import ChatService
+from app.services.chat_read_receipt_service import read_receipts
+
+IDLE_SOCKETS = 1000
+
+
+class IdleWebSocket:
+    """a client that connects and then says nothing until it hangs up"""
+
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTING
+        self.accepted = asyncio.Event()
+        self.hung_up = asyncio.Event()
+
+    async def accept(self):
+        self.client_state = WebSocketState.CONNECTED
+        self.accepted.set()
+
+    async def receive_text(self) -> str:
+        await self.hung_up.wait()
+        raise WebSocketDisconnect(1000)
+
+    async def send_json(self, data, mode="text"):
+        pass
+
+    async def close(self, code: int = 1000):
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+async def test_idle_websockets_hold_no_db_connections(database, hub, monkeypatch):
+    read = []
+
+    async def mark_read(chat_room_id, user_id, message_id=None, read_at=None):
+        read.append(user_id)
+
+    monkeypatch.setattr(read_receipts, "mark_read", mark_read)
+
+    room = ChatRoom(name="room", is_private=False)
+    users = [User(username=f"user-{i}", phone_number=f"010-{i}") for i in range(IDLE_SOCKETS)]
+    async with chat_ws.transactional_session_factory() as session:
+        session.add(room)
+        session.add_all(users)
+        await session.flush()
+        session.add_all([ChatRoomMember(user_id=user.id, chat_room_id=room.id) for user in users])
+        await session.commit()
+
+    sockets = [IdleWebSocket() for _ in users]
+    endpoints = [
+        asyncio.create_task(chat_ws.chat_websocket_endpoint(ws, room.id, user.id)) for ws, user in zip(sockets, users)
+    ]
+    await asyncio.wait_for(asyncio.gather(*(ws.accepted.wait() for ws in sockets)), timeout=60)
+    await asyncio.sleep(0.1)
+
+    assert sum(ws.client_state == WebSocketState.CONNECTED for ws in sockets) == IDLE_SOCKETS
+    assert database.pool.checkedout() == 0
+
+    for ws in sockets:
+        ws.hung_up.set()
+    await asyncio.wait_for(asyncio.gather(*endpoints), timeout=60)
+    assert len(read) == IDLE_SOCKETS
+    assert database.pool.checkedout() == 0
+
+
+async def test_non_members_are_rejected_without_holding_a_connection(database, hub):
+    ws = IdleWebSocket()
+
+    with pytest.raises(WSUserNotInChatRoom):
+        await chat_ws.chat_websocket_endpoint(ws, uuid.uuid4(), uuid.uuid4())
+    assert not ws.accepted.is_set()
+    assert database.pool.checkedout() == 0
+
+
+class ScriptedWebSocket(IdleWebSocket):
+    """sends the given frames, then hangs up"""
+
+    def __init__(self, frames: list[str]):
+        super().__init__()
+        self.client_state = WebSocketState.CONNECTED
+        self.frames = frames
+        self.sent: list[dict] = []
+
+    async def receive_text(self) -> str:
+        if not self.frames:
+            raise WebSocketDisconnect(1000)
+        return self.frames.pop(0)
+
+    async def send_json(self, data, mode="text"):
+        self.sent.append(data)
+
+
+@pytest.mark.parametrize("text", ["a" * (MESSAGE_MAX_LENGTH + 1), 12, None])
+async def test_invalid_messages_are_rejected_to_the_sender(redis, hub, text):
+    room_id = uuid.uuid4()
+    listener = await hub.subscribe(str(room_id))
+    ws = ScriptedWebSocket([ujson.dumps({"text": text})])
+
+    with pytest.raises(WebSocketDisconnect):
+        await ChatService(ws, room_id, uuid.uuid4()).publish_handler(hub)
+
+    assert [frame["type"] for frame in ws.sent] == ["error"]
+    assert ws.sent[0]["error_code"] == "CHAT__INVALID_MESSAGE"
+    assert listener.empty()
+    assert message_buffer.rows == []
+    assert await redis.hgetall(message_buffer.wal_key) == {}
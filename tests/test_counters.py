@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models import User
+from app.models.community import Comment, Community, Post
+from app.repository.community import comment as comment_repository
+from app.repository.community import post as post_repository
+from app.services.counter_service import reconcile_counters
+
+
+@pytest.fixture
+async def rows(database: AsyncEngine) -> SimpleNamespace:
+    users = [User(username=f"user-{i}", phone_number=f"010-{i}") for i in range(3)]
+    community = Community(name="community", description="community")
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all([*users, community])
+        await session.flush()
+        post = Post(title="post", content="post", user_id=users[0].id, community_id=community.id)
+        session.add(post)
+        await session.flush()
+        comment = Comment(content="comment", user_id=users[0].id, post_id=post.id)
+        session.add(comment)
+        await session.commit()
+    return SimpleNamespace(users=users, post=post, comment=comment)
+
+
+async def load(database: AsyncEngine, model, id: int):
+    async with AsyncSession(database) as session:
+        return (await session.execute(select(model).where(model.id == id))).scalar_one()
+
+
+# (model, fixture row, rate, delete the rating)
+RATED = [
+    (Post, "post", post_repository.create_or_update_like, post_repository.delete_like_where_post_id_and_user_id),
+    (
+        Comment,
+        "comment",
+        comment_repository.create_or_update_like,
+        comment_repository.delete_like_where_comment_id_and_user_id,
+    ),
+]
+
+
+@pytest.mark.parametrize("model, rated, rate, delete_like", RATED)
+async def test_likes_and_dislikes_are_counted(database, rows, model, rated, rate, delete_like):
+    id = getattr(rows, rated).id
+    first, second, third = (user.id for user in rows.users)
+    updated_at = (await load(database, model, id)).updated_at
+
+    for user_id, like, like_cnt in [
+        (first, 1, 1),
+        # the same rating twice
+        (first, 1, 1),
+        (second, 0, 1),
+        (third, 1, 2),
+        # toggles
+        (first, 0, 1),
+        (second, 1, 2),
+        (first, 1, 3),
+    ]:
+        await rate(id, user_id, like)
+        assert (await load(database, model, id)).like_cnt == like_cnt
+
+    # a rating does not mark the row as edited
+    assert (await load(database, model, id)).updated_at == updated_at
+
+
+@pytest.mark.parametrize("model, rated, rate, delete_like", RATED)
+async def test_deleting_a_like_decrements_the_counter(database, rows, model, rated, rate, delete_like):
+    id = getattr(rows, rated).id
+    liked, disliked, _ = (user.id for user in rows.users)
+    await rate(id, liked, 1)
+    await rate(id, disliked, 0)
+
+    await delete_like(id, disliked)
+    assert (await load(database, model, id)).like_cnt == 1
+    await delete_like(id, liked)
+    assert (await load(database, model, id)).like_cnt == 0
+    # nothing left to delete
+    await delete_like(id, liked)
+    assert (await load(database, model, id)).like_cnt == 0
+
+
+async def test_available_comments_are_counted(database, rows):
+    post_id, user_id = rows.post.id, rows.users[1].id
+
+    available = await comment_repository.create({"content": "a", "user_id": user_id, "post_id": post_id})
+    hidden = await comment_repository.create(
+        {"content": "b", "user_id": user_id, "post_id": post_id, "available": False}
+    )
+    assert (await load(database, Post, post_id)).comment_cnt == 1
+
+    await comment_repository.delete_where_id(hidden.id)
+    assert (await load(database, Post, post_id)).comment_cnt == 1
+    await comment_repository.delete_where_id(available.id)
+    assert (await load(database, Post, post_id)).comment_cnt == 0
+
+
+async def test_reconcile_counters_fixes_drifted_counters(database, rows):
+    post_id, comment_id = rows.post.id, rows.comment.id
+    await post_repository.create_or_update_like(post_id, rows.users[1].id, 1)
+    await comment_repository.create_or_update_like(comment_id, rows.users[1].id, 1)
+    # drift, as left by a write that bypassed the repositories
+    async with AsyncSession(database) as session:
+        await session.execute(update(Post).where(Post.id == post_id).values(like_cnt=7, comment_cnt=0))
+        await session.execute(update(Comment).where(Comment.id == comment_id).values(like_cnt=-1))
+        await session.commit()
+
+    fixed = await reconcile_counters()
+
+    assert fixed == {"post.like_cnt": 1, "post.comment_cnt": 1, "comment.like_cnt": 1, "ai_coaching.like_cnt": 0}
+    post = await load(database, Post, post_id)
+    assert (post.like_cnt, post.comment_cnt) == (1, 1)
+    assert (await load(database, Comment, comment_id)).like_cnt == 1
+    assert await reconcile_counters() == dict.fromkeys(fixed, 0)
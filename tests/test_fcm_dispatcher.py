@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+
+from firebase_admin import exceptions as firebase_exceptions
+
+from app.services.fcm_service import FCM_MULTICAST_LIMIT, FCMDispatcher
+
+
+@dataclass
+class SendResponse:
+    success: bool
+    exception: Exception | None = None
+
+
+@dataclass
+class BatchResponse:
+    responses: list[SendResponse]
+
+    @property
+    def success_count(self) -> int:
+        return sum(res.success for res in self.responses)
+
+    @property
+    def failure_count(self) -> int:
+        return len(self.responses) - self.success_count
+
+
+@dataclass
+class FakeMessaging:
+    """records multicasts, fails the tokens of `unavailable` the first `failures` times they are sent"""
+
+    delay: float = 0
+    unavailable: set[str] = field(default_factory=set)
+    failures: int = 1
+    sent: list = field(default_factory=list)
+    threads: set[str] = field(default_factory=set)
+
+    def send_multicast(self, message):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        self.sent.append(message)
+        responses = []
+        for token in message.tokens:
+            if token in self.unavailable and self.attempts(token) <= self.failures:
+                responses.append(SendResponse(False, firebase_exceptions.UnavailableError("unavailable")))
+            else:
+                responses.append(SendResponse(True))
+        return BatchResponse(responses)
+
+    def attempts(self, token: str) -> int:
+        return sum(token in message.tokens for message in self.sent)
+
+    def delivered(self) -> list[tuple[str, str]]:
+        """(token, body) of every push sent"""
+        return [(token, message.notification.body) for message in self.sent for token in message.tokens]
+
+
+async def test_enqueue_does_not_wait_for_firebase():
+    backend = FakeMessaging(delay=0.01)
+    dispatcher = FCMDispatcher(backend=backend)
+
+    start = time.perf_counter()
+    for i in range(50):
+        dispatcher.enqueue([f"token-{i}"], "title", "body")
+    elapsed = time.perf_counter() - start
+    await dispatcher.close()
+
+    assert elapsed < 0.05
+    assert len(backend.delivered()) == 50
+    assert threading.main_thread().name not in backend.threads
+
+
+async def test_pushes_are_coalesced_per_recipient_and_collapse_key():
+    backend = FakeMessaging()
+    dispatcher = FCMDispatcher(backend=backend, workers=1)
+    dispatcher.start()
+
+    # queued before the worker runs, so they are dispatched as one batch
+    dispatcher.enqueue(["a", "b"], "room 1", "first", collapse_key="room-1")
+    dispatcher.enqueue(["a"], "room 1", "second", collapse_key="room-1")
+    dispatcher.enqueue(["a"], "room 2", "other room", collapse_key="room-2")
+    dispatcher.enqueue(["a"], "notice", "no collapse key")
+    await dispatcher.close()
+
+    assert sorted(backend.delivered()) == [
+        ("a", "no collapse key"),
+        ("a", "other room"),
+        ("a", "second"),
+        ("b", "first"),
+    ]
+
+
+async def test_multicasts_are_split_at_the_limit():
+    backend = FakeMessaging()
+    dispatcher = FCMDispatcher(backend=backend)
+
+    dispatcher.enqueue([f"token-{i}" for i in range(FCM_MULTICAST_LIMIT * 2 + 1)], "title", "body")
+    await dispatcher.close()
+
+    assert [len(message.tokens) for message in backend.sent] == [FCM_MULTICAST_LIMIT, FCM_MULTICAST_LIMIT, 1]
+
+
+async def test_retryable_failures_are_retried_with_backoff():
+    backend = FakeMessaging(unavailable={"flaky"}, failures=2)
+    dispatcher = FCMDispatcher(backend=backend, backoff_base=0.01)
+
+    dispatcher.enqueue(["flaky", "fine"], "title", "body")
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if backend.attempts("flaky") == 3:
+            break
+    await dispatcher.close()
+
+    assert backend.attempts("flaky") == 3
+    assert backend.attempts("fine") == 1
+
+
+async def test_pushes_are_dropped_after_max_retries():
+    backend = FakeMessaging(unavailable={"down"}, failures=100)
+    dispatcher = FCMDispatcher(backend=backend, backoff_base=0.001, max_retries=2)
+
+    dispatcher.enqueue(["down"], "title", "body")
+    await asyncio.sleep(0.2)
+    await dispatcher.close()
+
+    assert backend.attempts("down") == 3
@@ -0,0 +1,135 @@
+import math
+import random
+
+import pytest
+
+from app.utils.geo import (
+    GeoGridIndex,
+    bounding_box,
+    covering_cells,
+    geohash_bbox,
+    geohash_encode,
+    haversine_m,
+)
+
+# (latitude, longitude, radius) of the searches, including the antimeridian, the poles and huge radii
+SEARCHES = [
+    (37.5665, 126.978, 3000),
+    (37.5665, 126.978, 50),
+    (0.0, 0.0, 20000),
+    (-33.8688, 151.2093, 150000),
+    (64.1466, -21.9426, 800),
+    (0.0, 179.999, 5000),
+    (-10.0, -179.9, 40000),
+    (89.99, 45.0, 5000),
+    (-89.5, 0.0, 100000),
+    (10.0, 10.0, 3000000),
+]
+
+
+def points_around(latitude: float, longitude: float, radius_m: float, count: int, rng: random.Random):
+    """points up to twice the radius away, in every direction"""
+    for _ in range(count):
+        distance = radius_m * 2 * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        yield destination(latitude, longitude, distance, bearing)
+
+
+def destination(latitude: float, longitude: float, distance_m: float, bearing: float) -> tuple[float, float]:
+    phi, lmb = math.radians(latitude), math.radians(longitude)
+    angle = distance_m / 6371008.8
+    phi2 = math.asin(math.sin(phi) * math.cos(angle) + math.cos(phi) * math.sin(angle) * math.cos(bearing))
+    lmb2 = lmb + math.atan2(
+        math.sin(bearing) * math.sin(angle) * math.cos(phi), math.cos(angle) - math.sin(phi) * math.sin(phi2)
+    )
+    return math.degrees(phi2), (math.degrees(lmb2) + 180) % 360 - 180
+
+
+@pytest.mark.parametrize(
+    "latitude, longitude, precision, geohash",
+    [
+        (57.64911, 10.40744, 11, "u4pruydqqvj"),
+        (42.6, -5.6, 5, "ezs42"),
+        (37.5665, 126.978, 6, "wydm9q"),
+        (-25.382708, -49.265506, 8, "6gkzwgjz"),
+        (0.0, 0.0, 4, "s000"),
+    ],
+)
+def test_geohash_encode(latitude, longitude, precision, geohash):
+    assert geohash_encode(latitude, longitude, precision) == geohash
+
+
+def test_geohash_bbox_contains_the_point_and_its_cells():
+    rng = random.Random(1)
+    for _ in range(1000):
+        latitude, longitude = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        geohash = geohash_encode(latitude, longitude, 8)
+        min_lat, max_lat, min_lng, max_lng = geohash_bbox(geohash)
+        assert min_lat <= latitude <= max_lat
+        assert min_lng <= longitude <= max_lng
+        assert geohash_encode((min_lat + max_lat) / 2, (min_lng + max_lng) / 2, 8) == geohash
+
+
+def test_haversine():
+    # seoul city hall to busan city hall, about 325 km
+    assert haversine_m(37.5665, 126.978, 35.1798, 129.0750) == pytest.approx(325_000, rel=0.01)
+    assert haversine_m(0, 179.9, 0, -179.9) == pytest.approx(0.2 * math.pi * 6371008.8 / 180)
+    assert haversine_m(10, 10, 10, 10) == 0
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_m", SEARCHES)
+def test_covering_cells_cover_the_circle(latitude, longitude, radius_m):
+    cells = covering_cells(latitude, longitude, radius_m)
+    rng = random.Random(2)
+
+    for lat, lng in points_around(latitude, longitude, radius_m / 2, 2000, rng):
+        if haversine_m(latitude, longitude, lat, lng) <= radius_m:
+            assert any(geohash_encode(lat, lng).startswith(cell) for cell in cells), (lat, lng)
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_m", SEARCHES)
+def test_bounding_box_contains_the_circle(latitude, longitude, radius_m):
+    box = bounding_box(latitude, longitude, radius_m)
+    if box is None:
+        return
+    min_lat, max_lat, min_lng, max_lng = box
+    for lat, lng in points_around(latitude, longitude, radius_m / 2, 2000, random.Random(3)):
+        if haversine_m(latitude, longitude, lat, lng) <= radius_m:
+            assert min_lat <= lat <= max_lat and min_lng <= lng <= max_lng, (lat, lng)
+
+
+@pytest.mark.parametrize("precision", [4, 6, 8])
+@pytest.mark.parametrize("latitude, longitude, radius_m", SEARCHES)
+def test_grid_index_finds_what_a_brute_force_search_finds(latitude, longitude, radius_m, precision):
+    rng = random.Random(4)
+    points = dict(enumerate(points_around(latitude, longitude, radius_m, 3000, rng)))
+    index = GeoGridIndex[int](precision)
+    for key, (lat, lng) in points.items():
+        index.add(key, lat, lng)
+
+    found = index.within(latitude, longitude, radius_m)
+
+    expected = {
+        key: haversine_m(latitude, longitude, lat, lng)
+        for key, (lat, lng) in points.items()
+        if haversine_m(latitude, longitude, lat, lng) <= radius_m
+    }
+    assert {key for key, _ in found} == set(expected)
+    assert [distance for _, distance in found] == sorted(expected.values())
+    assert index.nearest(latitude, longitude, 5, radius_m) == found[:5]
+
+
+def test_grid_index_moves_and_removes_points():
+    index = GeoGridIndex[str]()
+    index.add("gym", 37.5665, 126.978)
+    index.add("gym", 35.1798, 129.0750)
+    index.add("park", 37.5670, 126.979)
+
+    assert [key for key, _ in index.within(37.5665, 126.978, 1000)] == ["park"]
+    assert [key for key, _ in index.within(35.1798, 129.0750, 1000)] == ["gym"]
+
+    index.remove("gym")
+    index.remove("gym")
+    assert len(index) == 1
+    assert index.within(35.1798, 129.0750, 1000) == []
+    assert set(index.cells) == {geohash_encode(37.5670, 126.979, index.precision)}
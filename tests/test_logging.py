@@ -0,0 +1,169 @@
+import logging
+import queue
+import sys
+
+import pytest
+import ujson
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.db import query_log
+from app.core.db.query_log import install_query_log
+from app.utils.ecs_log import APP_LOGGER, DroppingQueueHandler, ECSFormatter, SamplingFilter
+
+
+def make_record(name: str = APP_LOGGER, level: int = logging.INFO, msg: str = "message", args=None, **extra):
+    return logging.getLogger(name).makeRecord(name, level, __file__, 10, msg, args, None, "function", extra)
+
+
+def test_ecs_formatter_writes_one_json_document_per_record():
+    record = make_record(msg="user %s logged in", args=("민수",), **{"event.duration": 1500})
+
+    document = ujson.loads(ECSFormatter().format(record))
+
+    assert document["message"] == "user 민수 logged in"
+    assert document["log.level"] == "info"
+    assert document["log"]["logger"] == APP_LOGGER
+    assert document["log"]["origin"] == {"file": {"name": "test_logging.py", "line": 10}, "function": "function"}
+    assert document["event.duration"] == 1500
+    assert document["@timestamp"].endswith("+00:00")
+    assert "error" not in document
+
+
+def test_ecs_formatter_adds_the_exception():
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        record = make_record(level=logging.ERROR)
+        record.exc_info = sys.exc_info()
+
+    error = ujson.loads(ECSFormatter().format(record))["error"]
+
+    assert error["type"] == "ValueError"
+    assert error["message"] == "bad value"
+    assert "raise ValueError" in error["stack_trace"]
+
+
+def test_ecs_formatter_writes_unserializable_extras_as_text():
+    record = make_record(user=object.__new__(type("User", (), {"__str__": lambda self: "user-1"})))
+
+    assert ujson.loads(ECSFormatter().format(record))["user"] == "user-1"
+
+
+def test_the_message_is_bound_when_the_record_is_queued():
+    handler = DroppingQueueHandler(queue.Queue())
+    items = ["a"]
+
+    handler.handle(make_record(msg="items %s", args=(items,)))
+    items.append("b")
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "items ['a']"
+    assert record.args is None
+
+
+def test_records_are_dropped_when_the_writer_falls_behind_and_the_drops_reported():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+
+    for i in range(5):
+        handler.handle(make_record(msg=f"record {i}"))
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().getMessage() for _ in range(2)] == ["record 0", "record 1"]
+
+    handler.handle(make_record(msg="record 5"))
+    warning = handler.queue.get_nowait()
+    assert warning.levelno == logging.WARNING
+    assert warning.getMessage() == "Dropped 3 log records, the log writer fell behind"
+    assert handler.queue.get_nowait().getMessage() == "record 5"
+    assert handler.dropped == 0
+
+
+@pytest.mark.parametrize(
+    "name, level, kept",
+    [
+        # the most specific rate applies
+        (f"{APP_LOGGER}.cache", logging.DEBUG, False),
+        (f"{APP_LOGGER}.cache.redis", logging.DEBUG, False),
+        (f"{APP_LOGGER}.cache.local", logging.DEBUG, True),
+        (APP_LOGGER, logging.DEBUG, True),
+        # only children, not names sharing a prefix
+        (f"{APP_LOGGER}.cachex", logging.DEBUG, True),
+        (f"{APP_LOGGER}.sql", logging.DEBUG, True),
+        # other levels are never sampled
+        (f"{APP_LOGGER}.cache", logging.INFO, True),
+        (f"{APP_LOGGER}.cache", logging.WARNING, True),
+    ],
+)
+def test_sampling_filter(name, level, kept):
+    sampling = SamplingFilter({APP_LOGGER: 1.0, f"{APP_LOGGER}.cache": 0.0, f"{APP_LOGGER}.cache.local": 1.0})
+
+    assert sampling.filter(make_record(name, level)) is kept
+
+
+def test_sampling_filter_keeps_a_share_of_the_records(monkeypatch):
+    sampling = SamplingFilter({f"{APP_LOGGER}.cache": 0.25})
+    monkeypatch.setattr("app.utils.ecs_log.random.random", iter([i / 100 for i in range(100)]).__next__)
+
+    kept = sum(sampling.filter(make_record(f"{APP_LOGGER}.cache", logging.DEBUG)) for _ in range(100))
+
+    assert kept == 25
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def sql_records(monkeypatch) -> list[logging.LogRecord]:
+    handler, level = Records(), query_log.sql_logger.level
+    monkeypatch.setattr(query_log.sql_logger, "handlers", [handler])
+    monkeypatch.setattr(query_log.sql_logger, "propagate", False)
+    query_log.sql_logger.setLevel(logging.DEBUG)
+    yield handler.records
+    query_log.sql_logger.setLevel(level)
+
+
+async def run_query(mode: str, slow_ms: int, statement: str = "SELECT :value") -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    install_query_log(engine, mode, slow_ms)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(statement), {"value": "secret-parameter"})
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "mode, slow_ms, level",
+    [
+        ("slow", 0, logging.WARNING),
+        ("slow", 60000, None),
+        ("all", 60000, logging.INFO),
+        ("all", 0, logging.WARNING),
+        ("off", 0, None),
+    ],
+)
+async def test_query_log_modes(sql_records, mode, slow_ms, level):
+    await run_query(mode, slow_ms)
+
+    records = [record for record in sql_records if "SELECT ?" in record.getMessage()]
+    if level is None:
+        assert records == []
+        return
+    (record,) = records
+    assert record.levelno == level
+    assert record.__dict__["event.duration"] > 0
+    assert "secret-parameter" not in record.getMessage()
+
+
+async def test_long_statements_are_cut(sql_records, monkeypatch):
+    monkeypatch.setattr(query_log, "MAX_STATEMENT_LENGTH", 20)
+
+    await run_query("slow", 0, "SELECT :value AS " + "a" * 100)
+
+    assert sql_records[-1].getMessage().endswith(": SELECT ? AS " + "a" * 8)
@@ -0,0 +1,203 @@
+import asyncio
+import random
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.models.user import MateRecommendation, User, user_block_list
+from app.services import mate_recommendation_service as service
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+GENDERS = ["male", "female"]
+
+# one row of service.load_profiles
+Profile = namedtuple(
+    "Profile", "id city district gym_info_id workout_level workout_time_period gender workout_partner_gender "
+    "last_active_at"
+)
+
+
+def random_profiles(count: int, rng: random.Random, cities=("seoul", "busan", None)) -> list[Profile]:
+    """few values per attribute so profile combinations repeat, every user active at a different time"""
+    gyms = [uuid.UUID(int=i) for i in range(1, 6)]
+    idle_days = rng.sample(range(count * 3), count)
+    return [
+        Profile(
+            id=uuid.UUID(int=1000 + i),
+            city=rng.choice(cities),
+            district=rng.choice(["a", "b", None]),
+            gym_info_id=rng.choice(gyms + [None] * 3),
+            workout_level=rng.choice(["low", "high", None]),
+            workout_time_period=rng.choice(["morning", "night"]),
+            gender=rng.choice(GENDERS),
+            workout_partner_gender=rng.choice(GENDERS + ["무관", None]),
+            last_active_at=NOW - timedelta(days=idle_days[i] / 10),
+        )
+        for i in range(count)
+    ]
+
+
+def brute_force_score(user: Profile, mate: Profile, genders: set[str]) -> float:
+    def same(a, b) -> bool:
+        return a is not None and a == b
+
+    def preference(wants, gender) -> float:
+        if wants not in genders:
+            return 0.0
+        return service.W_GENDER_MATCH if wants == gender else service.W_GENDER_MISMATCH
+
+    idle_days = (NOW - mate.last_active_at).total_seconds() / 86400
+    return (
+        service.W_GYM * same(user.gym_info_id, mate.gym_info_id)
+        + service.W_DISTRICT * same(user.district, mate.district)
+        + service.W_LEVEL * same(user.workout_level, mate.workout_level)
+        + service.W_TIME_PERIOD * same(user.workout_time_period, mate.workout_time_period)
+        + preference(user.workout_partner_gender, mate.gender)
+        + preference(mate.workout_partner_gender, user.gender)
+        + service.W_ACTIVE * 2 ** (-idle_days / service.ACTIVE_HALF_LIFE_DAYS)
+    )
+
+
+def brute_force_rank(profiles: list[Profile], blocks=(), top_n: int = service.TOP_N) -> dict:
+    """user id -> [(mate id, score)] best first, every pair of the same city scored"""
+    genders = {profile.gender for profile in profiles}
+    blocked = {(user_id, blocked_user_id) for user_id, blocked_user_id in blocks}
+    ranks = {}
+    for user in profiles:
+        scores = [
+            (mate.id, brute_force_score(user, mate, genders))
+            for mate in profiles
+            if mate.id != user.id and mate.city == user.city and (user.id, mate.id) not in blocked
+        ]
+        ranks[user.id] = sorted(scores, key=lambda pair: -pair[1])[:top_n]
+    return ranks
+
+
+def assert_same_ranks(ranks: dict, expected: dict) -> None:
+    assert ranks.keys() == expected.keys()
+    for user_id, mates in ranks.items():
+        assert [mate_id for mate_id, _ in mates] == [mate_id for mate_id, _ in expected[user_id]], user_id
+        assert [score for _, score in mates] == pytest.approx([score for _, score in expected[user_id]], abs=1e-4)
+
+
+@pytest.mark.parametrize("count, top_n", [(1, 5), (2, 5), (40, 30), (400, 5), (400, 30)])
+def test_rank_mates_matches_a_brute_force_ranking(count, top_n):
+    profiles = random_profiles(count, random.Random(count + top_n), cities=("seoul",))
+    f = service.build_features(profiles, NOW)
+
+    ranks = {
+        f.ids[user]: [(f.ids[c], score) for c, score in mates]
+        for user, mates in service.rank_mates(f, np.arange(count), top_n=top_n)
+    }
+
+    assert_same_ranks(ranks, brute_force_rank(profiles, top_n=top_n))
+
+
+def test_rank_all_only_pairs_users_of_the_same_city():
+    profiles = random_profiles(300, random.Random(1))
+
+    ranks = dict(service.rank_all(profiles, NOW))
+
+    assert_same_ranks(ranks, brute_force_rank(profiles))
+
+
+def test_blocked_users_are_not_ranked_and_the_rest_move_up():
+    rng = random.Random(2)
+    profiles = random_profiles(400, rng, cities=("seoul",))
+    best = brute_force_rank(profiles, top_n=5)
+    # the whole top 5 of some users, and random users of others, more than the pool would hold
+    blocks = [(user_id, mate_id) for user_id, mates in list(best.items())[:50] for mate_id, _ in mates]
+    blocks += [(profile.id, other.id) for profile in profiles[50:100] for other in rng.sample(profiles, 20)]
+
+    ranks = {user_id: mates for user_id, mates in service.rank_all(profiles, NOW, blocks)}
+
+    expected = brute_force_rank(profiles, blocks)
+    assert_same_ranks(ranks, expected)
+    assert all((user_id, mate_id) not in set(blocks) for user_id, mates in ranks.items() for mate_id, _ in mates)
+
+
+def test_one_user_is_ranked_as_in_the_full_ranking():
+    profiles = random_profiles(200, random.Random(3), cities=("seoul",))
+    user = profiles[17]
+    blocks = [(user.id, mate_id) for mate_id, _ in brute_force_rank(profiles)[user.id][:3]]
+    f = service.build_features(profiles, NOW)
+
+    blocked = service.blocked_indexes(f, blocks)
+    ((_, mates),) = service.rank_mates(f, np.arange(len(profiles)), np.asarray([17]), blocked=blocked)
+
+    expected = brute_force_rank(profiles, blocks)[user.id]
+    assert_same_ranks({user.id: [(f.ids[c], score) for c, score in mates]}, {user.id: expected})
+
+
+@pytest.fixture
+async def users(database: AsyncEngine) -> list[User]:
+    users = [
+        User(
+            username=f"user-{i}",
+            phone_number=f"010-{i}",
+            city="seoul",
+            gender=GENDERS[i % 2],
+            last_active_at=NOW - timedelta(hours=i),
+        )
+        for i in range(10)
+    ]
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all(users)
+        await session.commit()
+    return users
+
+
+async def stored_mates(engine: AsyncEngine, user_id) -> list:
+    async with AsyncSession(engine) as session:
+        stmt = (
+            select(MateRecommendation.recommended_user_id)
+            .where(MateRecommendation.user_id == user_id)
+            .order_by(MateRecommendation.rank)
+        )
+        return list((await session.execute(stmt)).scalars())
+
+
+async def test_concurrent_first_requests_do_not_conflict(database, users):
+    async def request():
+        async with AsyncSession(database) as session:
+            return [row["id"] for row in await service.get_recommended_mates(session, users[0].id)]
+
+    results = await asyncio.gather(*(request() for _ in range(10)))
+
+    assert all(result == results[0] for result in results)
+    assert results[0] == [user.id for user in users[1:4]]
+    assert await stored_mates(database, users[0].id) == [user.id for user in users[1:]]
+
+
+async def test_refresh_leaves_out_blocked_users(database, users):
+    async with AsyncSession(database) as session:
+        await session.execute(insert(user_block_list), [{"user_id": users[0].id, "blocked_user_id": users[1].id}])
+        await session.commit()
+
+    assert await service.refresh_recommendations() == len(users)
+
+    assert await stored_mates(database, users[0].id) == [user.id for user in users[2:]]
+    assert users[0].id in await stored_mates(database, users[1].id)
+
+
+async def test_no_recompute_when_every_recommended_mate_is_blocked(database, users, monkeypatch):
+    await service.refresh_recommendations()
+    async with AsyncSession(database) as session:
+        await session.execute(
+            insert(user_block_list), [{"user_id": users[0].id, "blocked_user_id": user.id} for user in users[1:]]
+        )
+        await session.commit()
+
+    async def refresh(*args):
+        pytest.fail("recommendations recomputed")
+
+    monkeypatch.setattr(service, "refresh_user_recommendations", refresh)
+    async with AsyncSession(database) as session:
+        assert await service.get_recommended_mates(session, users[0].id) == []
+        count = await session.scalar(select(func.count()).select_from(MateRecommendation))
+    assert count == len(users) * (len(users) - 1)
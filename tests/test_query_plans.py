@@ -0,0 +1,128 @@
+"""
+Query plan check of the hot read paths.
+
+Every hot path calls its service function against the test database, the SELECT statements
+it sends are captured and run again with EXPLAIN. Sequential scans are disabled for the check,
+so a `Seq Scan` left in a plan means no index can serve the statement and the path would scan
+the whole table once it grows. An empty database is enough.
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+
+import pytest
+import ujson
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.services import chat_service, notification_service, workout_promise_service
+from app.utils.keyset_pagination import encode_cursor
+
+SAMPLE_ID = uuid.UUID(int=1)
+SAMPLE_TIME = datetime(2023, 1, 1, tzinfo=timezone.utc)
+PAGE = 20
+
+HotPath = Callable[[AsyncSession], Awaitable[Any]]
+
+
+def community_service():
+    # needs the aws client of the app to import
+    return pytest.importorskip("app.services.community_service")
+
+
+# name -> call of the service function, both first and next (cursor) pages where they differ
+HOT_PATHS: dict[str, HotPath] = {
+    "chat messages": lambda db: chat_service.get_chat_messages(db, SAMPLE_ID, SAMPLE_TIME, PAGE),
+    "chat messages, next page": lambda db: chat_service.get_chat_messages(
+        db, SAMPLE_ID, SAMPLE_TIME, PAGE, cursor=encode_cursor(SAMPLE_TIME, SAMPLE_ID)
+    ),
+    "chat room list": lambda db: chat_service.get_chat_room_list_by_user_id(db, SAMPLE_ID, PAGE),
+    "chat room list, next page": lambda db: chat_service.get_chat_room_list_by_user_id(
+        db, SAMPLE_ID, PAGE, cursor=encode_cursor(SAMPLE_TIME, SAMPLE_ID)
+    ),
+    "public chat room list": lambda db: chat_service.get_public_chat_room_list(db, PAGE),
+    "public chat room list, next page": lambda db: chat_service.get_public_chat_room_list(
+        db, PAGE, cursor=encode_cursor(SAMPLE_TIME, SAMPLE_ID)
+    ),
+    "workout promises": lambda db: workout_promise_service.get_workout_promise_list(db, PAGE),
+    "workout promises, next page": lambda db: workout_promise_service.get_workout_promise_list(
+        db, PAGE, cursor=encode_cursor(SAMPLE_TIME, SAMPLE_ID)
+    ),
+    "recruiting workout promises": lambda db: workout_promise_service.get_recruiting_workout_promise_list(db, PAGE),
+    "workout promises written by me": lambda db: workout_promise_service.get_workout_promise_list_written_by_me(
+        db, SAMPLE_ID, PAGE
+    ),
+    "workout promises joined by me": lambda db: workout_promise_service.get_workout_promise_list_joined_by_me(
+        db, SAMPLE_ID, PAGE
+    ),
+    "workout promises near": lambda db: workout_promise_service.find_workout_promises_near(
+        db, workout_promise_service.WorkoutPromiseFilter(), 37.5665, 126.978, 3000, PAGE
+    ),
+    "workout notifications": lambda db: notification_service.get_notification_workout_list(db, SAMPLE_ID, PAGE),
+    "post feed": lambda db: community_service().get_posts_where_community_id(None, PAGE, 0, SAMPLE_ID),
+    "community posts": lambda db: community_service().get_posts_where_community_id(1, PAGE, 0, SAMPLE_ID),
+    "community posts, next page": lambda db: community_service().get_posts_where_community_id(
+        1, PAGE, 0, SAMPLE_ID, cursor=encode_cursor(SAMPLE_TIME, 1)
+    ),
+    "comments": lambda db: community_service().get_comments_where_post_id(1, SAMPLE_ID, PAGE, 0),
+}
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """relations read with a sequential scan anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def capture_statements(engine: AsyncEngine, path: HotPath) -> list[tuple[str, Any]]:
+    """run a hot path and return the SELECT statements it sent, with their parameters"""
+    statements: list[tuple[str, Any]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    # repository functions open their own sessions, so listen on the engine
+    event.listen(engine.sync_engine, "before_cursor_execute", _capture)
+    try:
+        async with AsyncSession(engine) as session:
+            await path(session)
+            await session.rollback()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _capture)
+    return statements
+
+
+def test_seq_scans_are_found_in_nested_plans():
+    plan = {
+        "Node Type": "Nested Loop",
+        "Plans": [
+            {"Node Type": "Index Scan", "Relation Name": "chat_room"},
+            {"Node Type": "Hash", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "message"}]},
+        ],
+    }
+
+    assert seq_scans(plan) == ["message"]
+
+
+@pytest.mark.parametrize("name", HOT_PATHS)
+async def test_hot_paths_use_indexes(database, name):
+    statements = await capture_statements(database, HOT_PATHS[name])
+    assert statements
+
+    regressions = []
+    async with database.connect() as conn:
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar_one()
+            if isinstance(plan, str):
+                plan = ujson.loads(plan)
+            relations = seq_scans(plan[0]["Plan"])
+            if relations:
+                regressions.append(f"sequential scan on {', '.join(relations)}:\n{statement}")
+        await conn.rollback()
+
+    assert not regressions, "\n\n".join(regressions)
@@ -0,0 +1,157 @@
+import asyncio
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.exceptions import UnauthorizedException
+from app.core.fastapi.dependencies import IsAdmin, PermissionDependency
+from app.core.fastapi.schemas import CurrentUser
+from app.models import User
+from app.services import role_service
+from app.services.role_service import ADMIN_ROLE, RoleRegistry, role_claims
+from app.session import Transactional
+
+
+def request(user_id=None, roles=()) -> SimpleNamespace:
+    return SimpleNamespace(user=CurrentUser(id=user_id, roles=list(roles)))
+
+
+@pytest.fixture
+def registry(monkeypatch) -> RoleRegistry:
+    registry = RoleRegistry()
+    monkeypatch.setattr(role_service, "role_registry", registry)
+    # the permission module imported the module-level registry by name
+    monkeypatch.setattr("app.core.fastapi.dependencies.premission.role_registry", registry)
+    return registry
+
+
+@pytest.fixture
+async def users(database: AsyncEngine) -> tuple[User, User]:
+    admin = User(username="admin", phone_number="010-0", is_superuser=True)
+    member = User(username="member", phone_number="010-1")
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all([admin, member])
+        await session.commit()
+    return admin, member
+
+
+def test_role_claims():
+    assert role_claims(User(is_superuser=True)) == {"roles": [ADMIN_ROLE]}
+    assert role_claims(User(is_superuser=False)) == {"roles": []}
+
+
+async def test_roles_come_from_the_database_until_the_first_load(database, users, registry):
+    admin, member = users
+
+    assert await registry.roles_of(admin.id) == [ADMIN_ROLE]
+    assert await registry.roles_of(str(member.id)) == []
+    assert await registry.roles_of(uuid.uuid4()) == []
+    assert registry.admins is None
+
+
+async def test_a_demoted_admin_loses_the_role_on_the_next_reload(database, users, registry):
+    admin, member = users
+    await registry.reload()
+    assert registry.admins == {str(admin.id)}
+
+    async with AsyncSession(database) as session:
+        await session.execute(update(User).where(User.id == admin.id).values(is_superuser=False))
+        await session.commit()
+    # the claim holds until the reload
+    assert await registry.has_role(admin.id, [ADMIN_ROLE], ADMIN_ROLE)
+
+    await registry.reload()
+    assert not await registry.has_role(admin.id, [ADMIN_ROLE], ADMIN_ROLE)
+
+
+async def test_a_role_needs_both_the_claim_and_the_registry(registry):
+    admin = uuid.uuid4()
+    registry.admins = frozenset({str(admin)})
+
+    assert await registry.has_role(admin, [ADMIN_ROLE], ADMIN_ROLE)
+    # tokens issued before the role was granted
+    assert not await registry.has_role(admin, [], ADMIN_ROLE)
+    # forged or stale claims of other users
+    assert not await registry.has_role(uuid.uuid4(), [ADMIN_ROLE], ADMIN_ROLE)
+
+
+async def test_a_failed_reload_keeps_the_loaded_roles(registry, monkeypatch):
+    admin = str(uuid.uuid4())
+    registry.admins = frozenset({admin})
+    registry.interval = 0.01
+
+    async def reload():
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(registry, "reload", reload)
+    registry.start()
+    await asyncio.sleep(0.05)
+
+    assert not registry.task.done()
+    assert registry.admins == {admin}
+    await registry.close()
+
+
+async def test_is_admin(registry):
+    admin, member = uuid.uuid4(), uuid.uuid4()
+    registry.admins = frozenset({str(admin)})
+    dependency = PermissionDependency([IsAdmin])
+
+    admin_request = request(admin, [ADMIN_ROLE])
+    await dependency(admin_request)
+    assert admin_request.user.is_superuser
+
+    for rejected in (request(), request(member), request(member, [ADMIN_ROLE]), request(admin)):
+        with pytest.raises(UnauthorizedException):
+            await dependency(rejected)
+        assert not rejected.user.is_superuser
+
+
+class PreviousIsAdmin(IsAdmin):
+    """IsAdmin before the role claims, one User row loaded per request"""
+
+    @Transactional()
+    async def is_superuser(self, user_id, session: AsyncSession) -> bool:
+        user = (await session.execute(select(User).where(User.id == user_id))).scalars().first()
+        return user is not None and user.is_superuser
+
+    async def has_permission(self, request) -> bool:
+        user_id = request.user.id
+        is_superuser = await self.is_superuser(user_id=user_id)
+        request.user.is_superuser = is_superuser
+        return user_id is not None and is_superuser
+
+
+async def time_permission(permission, admin_request, number: int) -> list[float]:
+    """microseconds of every check"""
+    dependency = PermissionDependency([permission])
+    timings = []
+    for _ in range(number):
+        start = time.perf_counter()
+        await dependency(admin_request)
+        timings.append((time.perf_counter() - start) * 1e6)
+    return timings
+
+
+async def test_admin_check_benchmark(database, users, registry):
+    """the role claims against a row load per request, run with -s to see both"""
+    admin, _ = users
+    await registry.reload()
+    admin_request = request(admin.id, [ADMIN_ROLE])
+
+    results = {}
+    for name, permission in (("row load per request", PreviousIsAdmin), ("claims + registry", IsAdmin)):
+        await time_permission(permission, admin_request, 50)
+        timings = sorted(await time_permission(permission, admin_request, 1000))
+        results[name] = statistics.mean(timings)
+        print(
+            f"\n{name}: mean {results[name]:.1f} / p50 {timings[len(timings) // 2]:.1f}"
+            f" / p99 {timings[int(len(timings) * 0.99)]:.1f} us"
+        )
+
+    assert results["claims + registry"] * 10 < results["row load per request"]
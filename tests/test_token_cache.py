@@ -0,0 +1,146 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from app.core.exceptions import RevokedTokenException
+from app.core.helpers import token_cache as token_cache_module
+from app.core.helpers.token_cache import REVOCATION_TTL, REVOKED_USERS_KEY, TokenCache
+from app.utils.token_helper import TokenHelper
+
+USER_ID = uuid.UUID(int=1)
+
+
+@pytest.fixture
+async def workers(redis, hub):
+    """two workers, listening to the broadcasts of each other"""
+    workers = [TokenCache(), TokenCache()]
+    for worker in workers:
+        worker.listener_task = asyncio.create_task(worker.listen())
+    await asyncio.sleep(0)
+    yield workers
+    for worker in workers:
+        await worker.close()
+
+
+async def issue(worker: TokenCache, user_id=USER_ID) -> str:
+    return TokenHelper.encode(payload={"user_id": str(user_id), "ver": await worker.token_version()})
+
+
+def skew_clock(monkeypatch, seconds: float) -> None:
+    clock = time.time
+    monkeypatch.setattr(token_cache_module.time, "time", lambda: clock() + seconds)
+
+
+async def test_tokens_issued_before_a_revocation_are_revoked_on_every_worker(workers):
+    issuer, revoker = workers
+    token = await issue(issuer)
+    assert issuer.verify(token)["user_id"] == str(USER_ID)
+
+    await revoker.revoke_user(USER_ID)
+    await asyncio.sleep(0)
+
+    for worker in workers:
+        with pytest.raises(RevokedTokenException):
+            worker.verify(token)
+
+
+async def test_tokens_issued_after_a_revocation_are_valid_on_every_worker(workers):
+    issuer, revoker = workers
+    await revoker.revoke_user(USER_ID)
+    await asyncio.sleep(0)
+
+    token = await issue(issuer)
+
+    assert all(worker.verify(token)["user_id"] == str(USER_ID) for worker in workers)
+
+
+@pytest.mark.parametrize("skew", [-3600, 3600])
+async def test_worker_clocks_do_not_order_tokens_and_revocations(workers, monkeypatch, skew):
+    issuer, revoker = workers
+    before = await issue(issuer)
+    # the revoking worker runs behind or ahead of the issuing one
+    skew_clock(monkeypatch, skew)
+    await revoker.revoke_user(USER_ID)
+    await asyncio.sleep(0)
+    after = await issue(issuer)
+
+    for worker in workers:
+        with pytest.raises(RevokedTokenException):
+            worker.verify(before)
+        assert worker.verify(after)
+
+
+async def test_a_missed_broadcast_is_applied_by_the_reload(redis, hub):
+    issuer, revoker = TokenCache(), TokenCache()
+    token = await issue(issuer)
+    issuer.verify(token)
+
+    await revoker.revoke_user(USER_ID)
+    assert issuer.verify(token)
+
+    await issuer.sync()
+    with pytest.raises(RevokedTokenException):
+        issuer.verify(token)
+
+
+async def test_other_users_are_not_revoked(workers):
+    issuer, revoker = workers
+    other = uuid.UUID(int=2)
+    token = await issue(issuer, other)
+
+    await revoker.revoke_user(USER_ID)
+    await asyncio.sleep(0)
+
+    assert issuer.verify(token)["user_id"] == str(other)
+
+
+async def test_a_revocation_that_failed_to_reach_redis_is_retried(redis, hub):
+    issuer, revoker = TokenCache(), TokenCache()
+    token = await issue(issuer)
+    redis.down = True
+
+    await revoker.revoke_user(USER_ID)
+    with pytest.raises(RevokedTokenException):
+        revoker.verify(token)
+
+    redis.down = False
+    await revoker.sync()
+    await issuer.sync()
+    with pytest.raises(RevokedTokenException):
+        issuer.verify(token)
+    assert revoker.verify(await issue(revoker))
+
+
+async def test_a_login_after_a_revocation_that_failed_to_reach_redis_is_valid(redis, hub):
+    worker = TokenCache()
+    before = await issue(worker)
+    redis.down = True
+    await worker.revoke_user(USER_ID)
+    redis.down = False
+
+    # issued before the reload retried the revocation
+    after = await issue(worker)
+
+    with pytest.raises(RevokedTokenException):
+        worker.verify(before)
+    assert worker.verify(after)
+    await worker.sync()
+    with pytest.raises(RevokedTokenException):
+        worker.verify(before)
+    assert worker.verify(after)
+
+
+async def test_old_revocations_are_dropped(redis, hub, monkeypatch):
+    worker = TokenCache()
+    token = await issue(worker)
+    await worker.revoke_user(USER_ID)
+    with pytest.raises(RevokedTokenException):
+        worker.verify(token)
+
+    skew_clock(monkeypatch, REVOCATION_TTL + 1)
+    await worker.sync()
+
+    assert worker.revoked_users == {}
+    assert await redis.zrangebyscore(REVOKED_USERS_KEY, "-inf", "+inf") == ()
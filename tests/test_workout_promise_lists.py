@@ -0,0 +1,151 @@
+"""
+Queries per page of the workout promise lists.
+
+Statements are counted on the engine while a page is loaded and serialized with
+WorkoutPromiseRead, which would lazy load (and fail, under asyncio) anything the eager-load
+plan missed. The plan of every list before WORKOUT_PROMISE_LIST_OPTIONS is kept here as
+the baseline: run with `-s` to see both.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models import ChatRoom, User, WorkoutParticipant, WorkoutPromise
+from app.models.workout_promise import PromiseLocation
+from app.schemas.workout_promise import ParticipantStatus, WorkoutPromiseRead, WorkoutPromiseStatus
+from app.services import workout_promise_service
+from app.services.workout_promise_service import WorkoutPromiseFilter, find_workout_promises
+from app.utils.keyset_pagination import paginate_stmt, split_page
+
+PROMISES = 25
+PARTICIPANTS = 3
+PAGE = 10
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+_user_columns = (User.id, User.username, User.profile_pic)
+PREVIOUS_LIST_OPTIONS = (
+    selectinload(WorkoutPromise.chat_room),
+    selectinload(WorkoutPromise.participants).options(selectinload(WorkoutParticipant.user).load_only(*_user_columns)),
+    selectinload(WorkoutPromise.promise_location),
+    selectinload(WorkoutPromise.admin_user).load_only(*_user_columns),
+)
+
+
+async def previous_workout_promise_list(db: AsyncSession, limit: int, cursor: str | None = None):
+    """get_workout_promise_list before the shared eager-load plan"""
+    stmt = select(WorkoutPromise).options(*PREVIOUS_LIST_OPTIONS).where(WorkoutPromise.is_private.is_(False))
+    stmt = paginate_stmt(stmt, WorkoutPromise.created_at, WorkoutPromise.id, limit, cursor)
+    total_stmt = select(func.count("*")).where(WorkoutPromise.is_private.is_(False)).select_from(WorkoutPromise)
+    total = (await db.execute(total_stmt)).scalar_one() if not cursor else None
+    result = await db.execute(stmt)
+    items, next_cursor = split_page(result.scalars().all(), limit)
+    return total, items, next_cursor
+
+
+@pytest.fixture
+async def users(database: AsyncEngine) -> list[User]:
+    """admin of every promise first, then its participants, every promise is joined by users[1]"""
+    users = [User(username=f"user-{i}", phone_number=f"010-{i}") for i in range(PARTICIPANTS + 1)]
+    async with AsyncSession(database, expire_on_commit=False) as session:
+        session.add_all(users)
+        await session.flush()
+        for i in range(PROMISES):
+            room = ChatRoom(name=f"promise-{i}")
+            location = PromiseLocation(place_name=f"gym-{i}", address=f"address-{i}", latitude=37.5, longitude=127.0)
+            promise = WorkoutPromise(
+                title=f"promise-{i}",
+                description="workout",
+                admin_user_id=users[0].id,
+                chat_room=room,
+                promise_location=location,
+                status=WorkoutPromiseStatus.RECRUITING if i % 2 else WorkoutPromiseStatus.FINISHED,
+                created_at=START + timedelta(minutes=i),
+            )
+            session.add(promise)
+            session.add_all(
+                WorkoutParticipant(
+                    name=user.username,
+                    user_id=user.id,
+                    workout_promise=promise,
+                    status=ParticipantStatus.ACCEPTED,
+                    is_admin=user is users[0],
+                )
+                for user in users
+            )
+        await session.commit()
+    return users
+
+
+async def load_pages(engine: AsyncEngine, list_page) -> list[tuple[int, list[dict]]]:
+    """(statements, serialized promises) of every page"""
+    pages, cursor = [], None
+    while True:
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        try:
+            async with AsyncSession(engine) as session:
+                _, items, cursor = await list_page(session, PAGE, cursor)
+                serialized = [WorkoutPromiseRead.model_validate(item).model_dump() for item in items]
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count)
+        pages.append((len(statements), serialized))
+        if cursor is None:
+            return pages
+
+
+# name -> (session, users, limit, cursor) -> page of the list
+LISTS = {
+    "all": lambda db, users, limit, cursor: workout_promise_service.get_workout_promise_list(db, limit, cursor=cursor),
+    "recruiting": lambda db, users, limit, cursor: workout_promise_service.get_recruiting_workout_promise_list(
+        db, limit, cursor=cursor
+    ),
+    "written by me": lambda db, users, limit, cursor: workout_promise_service.get_workout_promise_list_written_by_me(
+        db, users[0].id, limit, cursor=cursor
+    ),
+    "joined by me": lambda db, users, limit, cursor: workout_promise_service.get_workout_promise_list_joined_by_me(
+        db, users[1].id, limit, cursor=cursor
+    ),
+}
+
+
+@pytest.mark.parametrize("name", LISTS)
+async def test_a_page_takes_three_queries_and_a_next_page_two(database, users, name):
+    pages = await load_pages(database, lambda db, limit, cursor: LISTS[name](db, users, limit, cursor))
+
+    queries = [count for count, _ in pages]
+    assert queries[0] == 3
+    assert set(queries[1:]) <= {2}
+    promises = [promise for _, page in pages for promise in page]
+    assert promises
+    assert all(len(promise["participants"]) == PARTICIPANTS + 1 for promise in promises)
+    assert all(promise["admin_user"]["username"] == "user-0" for promise in promises)
+
+
+async def test_filters_are_combined(database, users):
+    filter = WorkoutPromiseFilter(status=WorkoutPromiseStatus.RECRUITING, participant_user_id=users[1].id)
+    async with AsyncSession(database) as session:
+        total, items, _ = await find_workout_promises(session, filter, limit=PROMISES)
+
+    assert total == len(items) == PROMISES // 2
+    assert {item.status for item in items} == {WorkoutPromiseStatus.RECRUITING}
+
+
+async def test_queries_per_page_against_the_previous_plan(database, users):
+    previous = await load_pages(database, previous_workout_promise_list)
+    current = await load_pages(database, lambda db, limit, cursor: LISTS["all"](db, users, limit, cursor))
+
+    print(
+        f"\nqueries per page of {PAGE} with {PARTICIPANTS + 1} participants each, first page / next pages:\n"
+        f"  previous plan: {previous[0][0]} / {previous[1][0]}\n"
+        f"  shared plan:   {current[0][0]} / {current[1][0]}"
+    )
+    assert [page for _, page in current] == [page for _, page in previous]
+    assert (previous[0][0], previous[1][0]) == (7, 6)
+    assert (current[0][0], current[1][0]) == (3, 2)